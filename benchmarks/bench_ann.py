@@ -0,0 +1,100 @@
+"""Recall@k and queries/sec of the int8 memory-mapped backend versus Chroma.
+
+Synthetic clustered embeddings stand in for chunk embeddings; ground truth
+is exact float32 cosine search. Chroma is skipped with --no-chroma or when
+chromadb is not installed.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_ann.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from vector.backends import ChromaBackend, LocalBackend
+
+
+def make_corpus(n: int, dim: int, seed: int = 0):
+    rng = np.random.RandomState(seed)
+    centers = rng.randn(max(n // 100, 1), dim).astype(np.float32)
+    vectors = centers[rng.randint(len(centers), size=n)] + 0.5 * rng.randn(n, dim).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    top = np.empty((len(queries), k), dtype=np.int64)
+    for i in range(0, len(queries), 64):
+        sims = queries[i:i + 64] @ corpus.T
+        top[i:i + 64] = np.argsort(-sims, axis=1)[:, :k]
+    return top
+
+
+def recall(found, truth) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def fill(collection, corpus: np.ndarray, batch: int = 5000):
+    for i in range(0, len(corpus), batch):
+        stop = min(i + batch, len(corpus))
+        collection.add(embeddings=corpus[i:stop].tolist(), documents=[""] * (stop - i),
+                       metadatas=[{"row": j} for j in range(i, stop)],
+                       ids=[str(j) for j in range(i, stop)])
+
+
+def bench(collection, queries: np.ndarray, k: int, truth: np.ndarray):
+    found = []
+    start = time.perf_counter()
+    for query in queries:
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k)
+        found.append([int(doc_id) for doc_id in result["ids"][0]])
+    elapsed = time.perf_counter() - start
+    return recall(found, truth), len(queries) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--no-chroma", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        import chromadb  # noqa: F401
+        use_chroma = not args.no_chroma
+    except ImportError:
+        use_chroma = False
+
+    for size in args.sizes:
+        corpus = make_corpus(size, args.dim)
+        queries = make_corpus(args.queries, args.dim, seed=1)
+        truth = exact_top_k(corpus, queries, args.k)
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            collection = LocalBackend(tmp).create_collection("bench")
+            fill(collection, corpus)
+            build = time.perf_counter() - start
+            size_mb = os.path.getsize(os.path.join(tmp, "bench", "vectors.i8")) / 2 ** 20
+            local_recall, local_qps = bench(collection, queries, args.k, truth)
+            print(f"n={size:<8} local-int8  recall@{args.k}={local_recall:.3f}  "
+                  f"qps={local_qps:8.1f}  build={build:.1f}s  vectors={size_mb:.1f} MiB")
+        if use_chroma:
+            start = time.perf_counter()
+            collection = ChromaBackend().create_collection("bench")
+            fill(collection, corpus)
+            build = time.perf_counter() - start
+            chroma_recall, chroma_qps = bench(collection, queries, args.k, truth)
+            print(f"n={size:<8} chroma      recall@{args.k}={chroma_recall:.3f}  "
+                  f"qps={chroma_qps:8.1f}  build={build:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Compare VectorStore's length-bucketed encoding with a single encode call.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_encode.py --chunks 5000 --batch-size 32
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from vector.store import VectorStore
+
+WORDS = ("Szent István az utolsó magyar fejedelem és az első magyar király "
+         "koronázták meg a Kárpát-medence vármegyerendszert egyházmegyét").split()
+
+
+def make_chunks(count: int, seed: int = 0):
+    """Chunks from short headings to long paragraphs."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.choice([3, 8, 20, 60, 150])))
+            for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    store = VectorStore(batch_size=args.batch_size, num_threads=args.threads)
+
+    start = time.perf_counter()
+    store.embedding_model.encode(chunks)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store.encode(chunks)
+    bucketed = time.perf_counter() - start
+
+    print(f"chunks={args.chunks} batch_size={args.batch_size} threads={args.threads}")
+    print(f"single encode call: {args.chunks / baseline:.1f} chunks/s")
+    print(f"bucketed:           {args.chunks / bucketed:.1f} chunks/s")
+    print(f"speedup:            {baseline / bucketed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Compare serial and page-parallel text extraction of PdfFileLoader.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_extract.py --pages 800 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from file.loader import PdfFileLoader
+
+SENTENCE = "Szent István az utolsó magyar fejedelem és az első magyar király. "
+
+
+def make_pdf(path: str, pages: int) -> None:
+    """Write a text-only PDF with ``pages`` pages."""
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (36, 36, -36, -36), f"{i}. oldal. " + SENTENCE * 40)
+    doc.save(path)
+    doc.close()
+
+
+def timed(loader: PdfFileLoader, workers: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        loader.extract_text_pymupdf(loader.filename, workers=workers)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "bench.pdf")
+        make_pdf(pdf_path, args.pages)
+        loader = PdfFileLoader(pdf_path)
+        serial = timed(loader, 1, args.repeat)
+        parallel = timed(loader, args.workers, args.repeat)
+
+    print(f"pages={args.pages} workers={args.workers}")
+    print(f"serial:   {serial:.3f}s ({args.pages / serial:.1f} pages/s)")
+    print(f"parallel: {parallel:.3f}s ({args.pages / parallel:.1f} pages/s)")
+    print(f"speedup:  {serial / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Compare torch, int8 and ONNX CPU inference: accuracy and latency on a local eval set.
+
+Each line of the eval file is {"question", "context", "answers"}; the default
+is a small Hungarian set taken from tests/resources. For every backend the
+QA model reports load time, per-question latency (p50 / p99), batched
+throughput, exact match and token F1 (SQuAD normalization, best over the
+answers). The embedding model reports encode throughput, the mean cosine
+similarity of its vectors to the torch vectors and how often the top-1
+context of each question agrees with torch and with the gold context.
+
+A backend that cannot be used falls back to torch; the "mode" column shows
+what actually ran.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_inference.py
+    PYTHONPATH=src python benchmarks/bench_inference.py --backends torch int8 --output inference.json
+    PYTHONPATH=src python benchmarks/bench_inference.py --onnx-dir /models/onnx --threads 4
+"""
+
+import argparse
+import collections
+import json
+import os
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import numpy as np
+
+from service import percentile
+from sml.inference import INFERENCE_MODES
+from sml.model import SmallLanguageModel
+from sml.registry import ModelRegistry
+from vector.store import VectorStore
+
+DEFAULT_EVAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "qa_eval.jsonl")
+
+
+def load_eval(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def normalize_answer(text):
+    """Lowercase, drop punctuation and articles (English and Hungarian), collapse spaces."""
+    text = "".join(ch for ch in text.lower() if ch not in string.punctuation)
+    text = re.sub(r"\b(a|an|the|az|egy)\b", " ", text)
+    return " ".join(text.split())
+
+
+def f1_score(prediction, answer):
+    predicted, gold = normalize_answer(prediction).split(), normalize_answer(answer).split()
+    common = sum((collections.Counter(predicted) & collections.Counter(gold)).values())
+    if common == 0:
+        return 0.0
+    precision, recall = common / len(predicted), common / len(gold)
+    return 2 * precision * recall / (precision + recall)
+
+
+def score(predictions, examples):
+    exact = f1 = 0.0
+    for prediction, example in zip(predictions, examples):
+        exact += max(normalize_answer(prediction) == normalize_answer(answer) for answer in example["answers"])
+        f1 += max(f1_score(prediction, answer) for answer in example["answers"])
+    return exact / len(examples), f1 / len(examples)
+
+
+def bench_qa(args, mode, examples):
+    onnx_path = os.path.join(args.onnx_dir, "qa") if args.onnx_dir and mode == "onnx" else None
+    llm = SmallLanguageModel(args.qa_model, batch_size=args.batch_size, registry=ModelRegistry(),
+                             inference=mode, onnx_path=onnx_path)
+    start = time.perf_counter()
+    llm.load_model()
+    load_seconds = time.perf_counter() - start
+
+    questions = [example["question"] for example in examples]
+    contexts = [example["context"] for example in examples]
+    llm.answer_question(questions[0], contexts[0])  # Warm up
+    latencies, predictions = [], []
+    for _ in range(args.repeat):
+        predictions = []
+        for question, context in zip(questions, contexts):
+            start = time.perf_counter()
+            predictions.append(llm.answer_question(question, context))
+            latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        llm.answer_questions(questions, contexts)
+    batched = time.perf_counter() - start
+    exact, f1 = score(predictions, examples)
+    result = {
+        "mode": llm.inference_used,
+        "load_seconds": round(load_seconds, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "batched_qps": round(len(questions) * args.repeat / batched, 1),
+        "exact_match": round(exact, 3),
+        "f1": round(f1, 3),
+    }
+    llm.close()
+    return result
+
+
+def bench_embedding(args, mode, examples, reference):
+    onnx_path = os.path.join(args.onnx_dir, "embedding") if args.onnx_dir and mode == "onnx" else None
+    store = VectorStore(args.embedding_model, registry=ModelRegistry(), inference=mode, onnx_path=onnx_path)
+    start = time.perf_counter()
+    model = store.embedding_model
+    load_seconds = time.perf_counter() - start
+
+    contexts = sorted({example["context"] for example in examples})
+    questions = [example["question"] for example in examples]
+    gold = np.array([contexts.index(example["context"]) for example in examples])
+    texts = contexts + questions
+    model.encode(texts[:1])  # Warm up
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        vectors = np.asarray(model.encode(texts, normalize_embeddings=True))
+    seconds = time.perf_counter() - start
+    top1 = np.argmax(vectors[len(contexts):] @ vectors[:len(contexts)].T, axis=1)
+    result = {
+        "mode": getattr(model, "inference_mode", mode),
+        "load_seconds": round(load_seconds, 3),
+        "texts_per_second": round(len(texts) * args.repeat / seconds, 1),
+        "top1_gold": round(float(np.mean(top1 == gold)), 3),
+    }
+    if reference is not None:
+        result["cosine_to_torch"] = round(float(np.mean(np.sum(vectors * reference["vectors"], axis=1))), 4)
+        result["top1_agreement"] = round(float(np.mean(top1 == reference["top1"])), 3)
+    store.close()
+    return result, {"vectors": vectors, "top1": top1}
+
+
+def print_table(title, rows):
+    columns = list(dict.fromkeys(column for row in rows.values() for column in row))
+    print(f"\n{title}")
+    print(f"{'backend':<8} " + " ".join(f"{column:>16}" for column in columns))
+    for backend, row in rows.items():
+        print(f"{backend:<8} " + " ".join(f"{str(row.get(column, '')):>16}" for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--eval", default=DEFAULT_EVAL, help="JSONL file of question/context/answers")
+    parser.add_argument("--backends", nargs="+", choices=INFERENCE_MODES, default=list(INFERENCE_MODES))
+    parser.add_argument("--qa-model", default="deepset/xlm-roberta-base-squad2")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--onnx-dir", help="local ONNX exports (qa/ and embedding/); exported there when missing")
+    parser.add_argument("--skip", choices=["qa", "embedding"], help="leave one of the models out")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, help="torch / ONNX Runtime CPU threads")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+        os.environ["OMP_NUM_THREADS"] = str(args.threads)
+
+    examples = load_eval(args.eval)
+    results = {"eval": args.eval, "examples": len(examples), "qa": {}, "embedding": {}}
+    if args.skip != "qa":
+        for mode in args.backends:
+            results["qa"][mode] = bench_qa(args, mode, examples)
+        print_table(f"QA ({args.qa_model}, {len(examples)} questions)", results["qa"])
+    if args.skip != "embedding":
+        # torch first: it is the reference of the other backends
+        reference = None
+        for mode in sorted(args.backends, key=lambda mode: mode != "torch"):
+            results["embedding"][mode], vectors = bench_embedding(args, mode, examples, reference)
+            if mode == "torch":
+                reference = vectors
+        print_table(f"Embedding ({args.embedding_model})", results["embedding"])
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
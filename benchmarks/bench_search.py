@@ -0,0 +1,63 @@
+"""Compare dense-only and hybrid (BM25 + dense) search: latency and precision@k.
+
+Each labelled query counts as a hit at rank r if the r-th result contains the
+expected phrase.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_search.py --pdf tests/resources/Hungary_short_history.pdf
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from file.loader import PdfFileLoader
+from vector.store import VectorStore
+
+# (question, phrase the relevant chunk contains)
+QUERIES = [
+    ("Mikor koronázták meg Szent Istvánt?", "1001 január"),
+    ("Mi történt 1046-ban?", "1046"),
+    ("Ki volt Szent László utódja?", "Könyves Kálmán"),
+    ("Mikor alakult meg az első felelős magyar kormány?", "1848 április"),
+    ("Kitől kapott koronát István?", "Szilveszter"),
+    ("Ki nevelte Istvánt?", "Adalbert"),
+    ("Mikor telepedtek le a honfoglaló törzsek?", "895"),
+    ("Kit győzött le István német segítséggel?", "legyőzte"),
+]
+
+
+def evaluate(store: VectorStore, k: int, repeat: int):
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for question, phrase in QUERIES:
+            results = store.search(question, n_results=k)
+            hits += sum(phrase in result["text"] for result in results[:k]) > 0
+    elapsed = time.perf_counter() - start
+    n = len(QUERIES) * repeat
+    return hits / n, elapsed / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", default="tests/resources/Hungary_short_history.pdf")
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    chunks = PdfFileLoader(args.pdf).extract_text().chunk_text()
+    for hybrid in (False, True):
+        store = VectorStore(hybrid=hybrid)
+        store.create_collection(f"bench_{'hybrid' if hybrid else 'dense'}")
+        store.add_documents(chunks)
+        precision, latency = evaluate(store, args.k, args.repeat)
+        print(f"{'hybrid' if hybrid else 'dense':<7} hit@{args.k}={precision:.2f}  "
+              f"latency={latency:.1f} ms/query  chunks={len(chunks)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare the regex split + clean_text chunking with the Segmenter: MB/s and chunk sizes.
+
+The previous chunker split on every ``[.!?]`` followed by whitespace and then
+ran four cleaning passes per chunk. The Segmenter normalizes and segments in
+one pass and merges short sentences when min/max chunk lengths are given.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_segment.py --pages 200
+    PYTHONPATH=src python benchmarks/bench_segment.py --pdf tests/resources/Hungary_short_history.pdf
+"""
+
+import argparse
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from corpus import make_pdf
+from file.loader import PdfFileLoader
+from file.segmenter import Segmenter
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+def previous_chunker(text):
+    """chunk_text() followed by clean_text() as they were before the Segmenter."""
+    chunks = [sentence.strip() for sentence in SENTENCE_SPLIT.split(text) if sentence.strip()]
+    cleaned = []
+    for chunk in chunks:
+        chunk = re.sub(r'[\x00-\x1F\x7F]+', ' ', chunk)
+        chunk = chunk.replace('\n', ' ').replace('\r', ' ')
+        chunk = re.sub(r'\s+', ' ', chunk).strip()
+        if chunk:
+            cleaned.append(chunk)
+    return cleaned
+
+
+def measure(name, chunker, text, repeat):
+    best = float("inf")
+    chunks = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = chunker(text)
+        best = min(best, time.perf_counter() - start)
+    lengths = sorted(len(chunk) for chunk in chunks)
+    megabytes = len(text.encode("utf-8")) / 1e6
+    print(f"{name:<28} {megabytes / best:8.1f} MB/s  chunks {len(chunks):6d}  "
+          f"median {statistics.median(lengths):6.0f}  "
+          f"<40 chars {sum(length < 40 for length in lengths):5d}  max {lengths[-1]:6d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="PDF to chunk (default: a synthetic Hungarian corpus)")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-chars", type=int, default=200)
+    parser.add_argument("--max-chars", type=int, default=800)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if pdf_path is None:
+            pdf_path = os.path.join(tmp, "hungarian.pdf")
+            make_pdf(pdf_path, "hungarian", args.pages)
+        text = "".join(PdfFileLoader(pdf_path).extract_pages_pymupdf(pdf_path))
+
+    print(f"{len(text.encode('utf-8')) / 1e6:.2f} MB of text")
+    measure("regex split + clean_text", previous_chunker, text, args.repeat)
+    measure("Segmenter", Segmenter().split, text, args.repeat)
+    measure(f"Segmenter {args.min_chars}-{args.max_chars}",
+            Segmenter(args.min_chars, args.max_chars).split, text, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
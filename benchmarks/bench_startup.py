@@ -0,0 +1,57 @@
+"""Measure startup cost: importing main and constructing the model wrappers.
+
+Each measurement runs in a fresh interpreter so import caches do not hide
+the cost. Model weights are not loaded; they load on first use.
+
+Usage:
+    python benchmarks/bench_startup.py --repeat 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+SNIPPETS = {
+    "import main": "import main",
+    "SmallLanguageModel()": "from sml.model import SmallLanguageModel; SmallLanguageModel()",
+    "VectorStore()": "from vector.store import VectorStore; VectorStore()",
+    "Topic()": "from file.topic import Topic; Topic()",
+}
+
+HEAVY = ("torch", "transformers", "sentence_transformers", "chromadb", "sklearn")
+
+TEMPLATE = """
+import sys, time
+start = time.perf_counter()
+{snippet}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+
+def run(snippet: str) -> tuple:
+    env = dict(os.environ, PYTHONPATH=SRC)
+    out = subprocess.run([sys.executable, "-c", TEMPLATE.format(snippet=snippet, heavy=HEAVY)],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    out = out.strip().splitlines()[-1].split()  # Ignore library warnings printed first
+    return float(out[0]), out[1] if len(out) > 1 else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, snippet in SNIPPETS.items():
+        timings = [run(snippet) for _ in range(args.repeat)]
+        best = min(t for t, _ in timings)
+        heavy = timings[-1][1] or "-"
+        print(f"{name:<22} {best * 1000:8.1f} ms   heavy modules imported: {heavy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Deterministic synthetic PDF corpus for the benchmark suite.
+
+Every PDF is generated offline from a seed, so two runs on different
+machines benchmark byte-identical inputs. Kinds:
+
+    text       dense English-like prose
+    hungarian  Hungarian UTF-8 prose with accents, dates, ordinals and abbreviations
+    images     short text plus several raster images per page
+    links      short text plus many URI and internal links per page
+
+Usage:
+    python benchmarks/corpus.py OUT_DIR [--pages 10 100] [--kinds text hungarian]
+"""
+
+from typing import Dict, List
+
+import argparse
+import os
+import random
+
+import fitz  # PyMuPDF
+
+KINDS = ("text", "hungarian", "images", "links")
+
+WORDS = (
+    "the of and to in is was for on that with as by at from his an were are which this be or "
+    "kingdom state church army war treaty crown council city river century trade law reform "
+    "people empire battle peace land court noble king queen bishop merchant"
+).split()
+
+HU_WORDS = (
+    "a az és hogy nem is meg volt egy király ország magyar fejedelem törzs szövetség "
+    "korona egyház püspök vármegye nemesség jobbágy háború béke város folyó század "
+    "törvény országgyűlés hódoltság szabadságharc kiegyezés őrség tűz szűk gyűlés ősi"
+).split()
+
+HU_PHRASES = [
+    "1001 január 1-én", "a 20. században", "Kr. e. 400 körül", "Kr. u. 896-ban",
+    "István kb. 30 évig uralkodott", "i. sz. 1526. augusztus 29-én", "dr. Kovács szerint",
+    "a 13. sz. közepén", "1848. március 15-én", "pl. Buda és Pest",
+]
+
+PAGE_MARGIN = (48, 48, -48, -48)
+
+
+def _sentence(rng: random.Random, words: List[str], extra: List[str] = ()) -> str:
+    parts = [rng.choice(words) for _ in range(rng.randint(6, 18))]
+    if extra and rng.random() < 0.4:
+        parts.insert(rng.randrange(len(parts)), rng.choice(extra))
+    text = " ".join(parts)
+    return text[0].upper() + text[1:] + rng.choice([".", ".", ".", "!", "?"])
+
+
+def _paragraph(rng: random.Random, kind: str, sentences: int) -> str:
+    if kind == "hungarian":
+        return " ".join(_sentence(rng, HU_WORDS, HU_PHRASES) for _ in range(sentences))
+    return " ".join(_sentence(rng, WORDS) for _ in range(sentences))
+
+
+def _image(rng: random.Random, width: int, height: int) -> bytes:
+    """PNG of random noise blocks; noise keeps the compressed size realistic."""
+    size = width * height * 3
+    block = bytes(rng.getrandbits(8) for _ in range(size // 16 + 1))
+    pixmap = fitz.Pixmap(fitz.csRGB, width, height, (block * 16)[:size], False)
+    return pixmap.tobytes("png")
+
+
+def make_pdf(path: str, kind: str, pages: int, seed: int = 0) -> Dict[str, int]:
+    """Write a synthetic PDF of ``kind`` with ``pages`` pages; returns what it contains."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind {kind!r}; use one of {KINDS}")
+    rng = random.Random(f"{kind}-{pages}-{seed}")
+    doc = fitz.open()
+    font = fitz.Font("tiro")  # Covers ő and ű, which the simple base-14 encoding drops
+    images = [_image(rng, 96, 96) for _ in range(4)] if kind == "images" else []
+    counts = {"pages": pages, "images": 0, "links": 0, "chars": 0}
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_font(fontname="body", fontbuffer=font.buffer)
+        box = page.rect + PAGE_MARGIN
+        sentences = 30 if kind in ("text", "hungarian") else 6
+        text = f"{number + 1}. oldal. " if kind == "hungarian" else f"Page {number + 1}. "
+        text += _paragraph(rng, kind, sentences)
+        if kind in ("images", "links"):
+            box = fitz.Rect(box.x0, box.y0, box.x1, box.y0 + 200)
+        page.insert_textbox(box, text, fontname="body", fontsize=10)
+        counts["chars"] += len(text)
+        if kind == "images":
+            for i in range(6):
+                x, y = 48 + (i % 3) * 170, 300 + (i // 3) * 170
+                # Shared images are stored once and referenced by xref from every page
+                page.insert_image(fitz.Rect(x, y, x + 150, y + 150), stream=images[rng.randrange(len(images))])
+                counts["images"] += 1
+        if kind == "links":
+            for i in range(40):
+                y = 280 + (i % 20) * 22
+                x = 48 if i < 20 else 300
+                rect = fitz.Rect(x, y, x + 220, y + 18)
+                if i % 4 == 3 and number > 0:
+                    link = {"kind": fitz.LINK_GOTO, "from": rect, "page": rng.randrange(number)}
+                else:
+                    link = {"kind": fitz.LINK_URI, "from": rect,
+                            "uri": f"https://example.org/{kind}/{number}/{i}?q={rng.getrandbits(32):x}"}
+                page.insert_text((x, y + 13), f"Link {number}.{i}", fontsize=9)
+                page.insert_link(link)
+                counts["links"] += 1
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    counts["bytes"] = os.path.getsize(path)
+    return counts
+
+
+def make_corpus(directory: str, kinds=KINDS, sizes=(10, 100), seed: int = 0) -> Dict[str, Dict[str, int]]:
+    """Write one PDF per (kind, page count) into ``directory``; returns {path: contents}."""
+    os.makedirs(directory, exist_ok=True)
+    corpus = {}
+    for kind in kinds:
+        for pages in sizes:
+            path = os.path.join(directory, f"{kind}-{pages}.pdf")
+            corpus[path] = make_pdf(path, kind, pages, seed)
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--pages", nargs="+", type=int, default=[10, 100])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for path, counts in make_corpus(args.directory, args.kinds, args.pages, args.seed).items():
+        print(path, counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Load-test a running query service (src/service.py) with concurrent clients.
+
+Each client keeps one connection open and sends requests back to back, so
+``--concurrency`` is the number of requests in flight. Reports throughput,
+client-side p50/p99 latency, and the server's batch-size statistics.
+
+Usage:
+    python src/service.py --store store/ &
+    python benchmarks/load_test.py --url http://localhost:5000 --endpoint ask --concurrency 32 --requests 2000
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import time
+from urllib.parse import urlparse
+
+QUESTIONS = [
+    "Mikor koronázták meg Szent Istvánt?",
+    "Mi történt 1046-ban?",
+    "Ki volt Szent László utódja?",
+    "Mikor alakult meg az első felelős magyar kormány?",
+    "Kitől kapott koronát István?",
+    "Ki nevelte Istvánt?",
+    "Mikor telepedtek le a honfoglaló törzsek?",
+    "Mi történt Mohácsnál 1526-ban?",
+]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1] if ordered else float("nan")
+
+
+async def send(reader, writer, host, method, path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                 f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, endpoint, counter, total, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    key = "question" if endpoint == "ask" else "query"
+    try:
+        while next(counter) < total:
+            question = QUESTIONS[len(latencies) % len(QUESTIONS)]
+            start = time.perf_counter()
+            status, _ = await send(reader, writer, host, "POST", f"/{endpoint}", {key: question})
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(args):
+    url = urlparse(args.url)
+    host, port = url.hostname, url.port or 80
+    counter = itertools.count()
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        client(host, port, args.endpoint, counter, args.requests, latencies, statuses)
+        for _ in range(args.concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, server_stats = await send(reader, writer, host, "GET", "/stats")
+    writer.close()
+
+    print(f"{len(latencies)} requests in {elapsed:.2f}s: {len(latencies) / elapsed:.1f} req/s, statuses {statuses}")
+    print(f"client p50 {percentile(latencies, 50) * 1000:.1f} ms, p99 {percentile(latencies, 99) * 1000:.1f} ms")
+    print(json.dumps(server_stats, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--endpoint", choices=["ask", "search"], default="ask")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Benchmark every pipeline stage on a synthetic corpus and catch regressions.
+
+For each (kind, page count) of the corpus (see corpus.py) a fresh process
+times extract_text, chunk_text, clean_text, parse_pdf_streams,
+add_documents and Topic.fit, reporting the best and median of
+``--repeat`` runs, throughput, and the process's peak RSS after the stage.
+Results are written as JSON together with the environment; comparing with
+an earlier result flags stages that got slower by more than
+``--threshold`` and exits with status 1.
+
+add_documents uses a deterministic hashing encoder by default, so the
+suite runs offline and measures the store rather than the model; pass
+``--encoder model`` to include SentenceTransformer.
+
+Usage:
+    python benchmarks/suite.py --pages 10 100 --output baseline.json
+    python benchmarks/suite.py --pages 10 100 --output current.json --compare baseline.json
+    python benchmarks/suite.py --compare baseline.json --current current.json  # compare only
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import numpy as np
+
+from corpus import KINDS, make_pdf
+
+STAGES = ("extract_text", "chunk_text", "clean_text", "parse_pdf_streams", "add_documents", "topic_fit")
+
+
+class HashingEncoder:
+    """Offline stand-in for SentenceTransformer: hashed bag of words, L2-normalized."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode("utf-8")) % self.dim] += 1
+        vectors += 1e-3
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _measure(fn: Callable[[], Any], repeat: int):
+    """(result of the last run, per-run seconds)."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, times
+
+
+def _record(times: List[float], items: int, unit: str, nbytes: Optional[int] = None) -> Dict[str, Any]:
+    from metrics import peak_rss_bytes
+
+    best = min(times)
+    record = {
+        "seconds": round(best, 6),
+        "median_seconds": round(statistics.median(times), 6),
+        "items": items,
+        "unit": unit,
+        "throughput": round(items / best, 2) if best else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+    if nbytes is not None:
+        record["mb_per_second"] = round(nbytes / best / 1e6, 3) if best else None
+    return record
+
+
+def run_case(pdf_path: str, repeat: int, encoder: str, stages: List[str]) -> Dict[str, Any]:
+    """Time the stages on one PDF; runs in its own process so peak RSS is per case."""
+    import logging
+    logging.disable(logging.INFO)
+
+    from file.loader import PdfFileLoader, clean_text
+    from file.topic import Topic
+    from vector.backends import LocalBackend
+    from vector.store import VectorStore
+
+    results = {}
+    loader = PdfFileLoader(pdf_path)
+    file_bytes = os.path.getsize(pdf_path)
+
+    _, times = _measure(loader.extract_text, repeat)
+    text = loader._text
+    pages = len(loader.extract_pages_pymupdf(pdf_path))
+    if "extract_text" in stages:
+        results["extract_text"] = _record(times, pages, "pages", file_bytes)
+
+    chunks, times = _measure(loader.chunk_text, repeat)
+    if "chunk_text" in stages:
+        results["chunk_text"] = _record(times, len(chunks), "chunks", len(text.encode("utf-8")))
+
+    cleaned, times = _measure(lambda: clean_text(chunks), repeat)
+    if "clean_text" in stages:
+        results["clean_text"] = _record(times, len(chunks), "chunks",
+                                        sum(len(chunk.encode("utf-8")) for chunk in chunks))
+
+    if "parse_pdf_streams" in stages:
+        _, times = _measure(loader.parse_pdf_streams, repeat)
+        results["parse_pdf_streams"] = _record(times, pages, "pages", file_bytes)
+
+    if "add_documents" in stages and cleaned:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorStore(backend=LocalBackend(tmp), batch_size=64)
+            if encoder == "hashing":
+                store.embedding_model = HashingEncoder()
+            runs = iter(range(repeat))
+
+            def add():
+                store.create_collection(f"bench{next(runs)}")
+                store.add_documents(cleaned)
+
+            _, times = _measure(add, repeat)
+            results["add_documents"] = _record(times, len(cleaned), "chunks")
+
+    if "topic_fit" in stages and len(cleaned) >= 20:
+        topic = Topic(topic_range=range(2, 6), n_jobs=1)
+        _, times = _measure(lambda: topic.fit(cleaned), repeat)
+        results["topic_fit"] = _record(times, len(cleaned), "documents")
+    return results
+
+
+def _run_case_in_child(args, output):
+    output.put(run_case(*args))
+
+
+def run_suite(directory: str, kinds: List[str], sizes: List[int], repeat: int,
+              encoder: str, stages: List[str], seed: int = 0) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    cases = {}
+    for kind in kinds:
+        for pages in sizes:
+            path = os.path.join(directory, f"{kind}-{pages}.pdf")
+            contents = make_pdf(path, kind, pages, seed)
+            output = context.Queue()
+            child = context.Process(target=_run_case_in_child,
+                                    args=((path, repeat, encoder, stages), output))
+            child.start()
+            stage_results = output.get()
+            child.join()
+            cases[f"{kind}-{pages}"] = {"corpus": contents, "stages": stage_results}
+            print(f"{kind}-{pages}: " + ", ".join(
+                f"{stage} {result['seconds'] * 1000:.1f}ms" for stage, result in stage_results.items()
+            ), flush=True)
+    return cases
+
+
+def environment() -> Dict[str, Any]:
+    import fitz
+    import sklearn
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pymupdf": fitz.VersionBind,
+        "numpy": np.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+            min_seconds: float = 0.001) -> List[Dict[str, Any]]:
+    """Stages present in both runs whose best time grew by more than ``threshold`` (0.2 = 20%).
+
+    Stages faster than ``min_seconds`` in the baseline are ignored as noise.
+    """
+    regressions = []
+    for case, result in current["cases"].items():
+        base_case = baseline["cases"].get(case)
+        if base_case is None:
+            continue
+        for stage, record in result["stages"].items():
+            base = base_case["stages"].get(stage)
+            if base is None or base["seconds"] < min_seconds:
+                continue
+            ratio = record["seconds"] / base["seconds"]
+            if ratio > 1 + threshold:
+                regressions.append({"case": case, "stage": stage, "baseline_seconds": base["seconds"],
+                                    "seconds": record["seconds"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--pages", nargs="+", type=int, default=[10, 100])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--encoder", choices=["hashing", "model"], default="hashing")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--current", help="compare this JSON file instead of running the suite")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown reported as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.current:
+        with open(args.current, encoding="utf-8") as f:
+            results = json.load(f)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = {
+                "environment": environment(),
+                "settings": {"repeat": args.repeat, "seed": args.seed, "encoder": args.encoder},
+                "cases": run_suite(tmp, args.kinds, args.pages, args.repeat, args.encoder,
+                                   args.stages, args.seed),
+            }
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['case']} {regression['stage']}: "
+                  f"{regression['baseline_seconds'] * 1000:.1f}ms -> {regression['seconds'] * 1000:.1f}ms "
+                  f"({regression['ratio']:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No stage slower than {1 + args.threshold:.2f}x the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+from typing import Any, Dict, Optional
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """Return a BLAKE2b content hash of the file at ``path``."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _to_json(obj):
+    """Serialize PyMuPDF geometry (Rect, Point) and other sequences as lists."""
+    if isinstance(obj, (bytes, bytearray)):
+        raise TypeError("Binary data is not cached")
+    return list(obj)
+
+
+class ExtractionCache:
+    """On-disk, content-addressed cache for PdfFileLoader results.
+
+    Every entry is one JSON file named ``<key>.<section>.json``, where the key
+    is derived from the file content hash and the extractor version and the
+    section names the cached result ("pages", "chunks", "streams"). Files are
+    written to a temporary name and renamed into place, so concurrent workers
+    can share a directory. The least recently used entries are evicted once
+    the directory grows beyond ``max_bytes``; the directory is scanned on the
+    first write and whenever a running total of written bytes crosses the
+    limit, not on every write (entries written by other processes are
+    counted at the next scan).
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._total_bytes: Optional[int] = None  # Size of the entries, known after the first scan
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, path: str, version: str) -> str:
+        """Cache key for the file at ``path`` produced by extractor ``version``."""
+        return f"{file_hash(path)}-{version}"
+
+    def _path(self, key: str, section: str) -> str:
+        return os.path.join(self.directory, f"{key}.{section}.json")
+
+    def get(self, key: str, section: str) -> Optional[Any]:
+        """Return the cached value or None, counting a hit or a miss."""
+        path = self._path(key, section)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.stats["misses"] += 1
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+        self.stats["hits"] += 1
+        return value
+
+    def put(self, key: str, section: str, value: Any):
+        """Atomically store ``value`` and evict old entries if over budget."""
+        path = self._path(key, section)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False, default=_to_json)
+                size = f.tell()
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Error writing cache entry {key}.{section}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self.stats["writes"] += 1
+        if self._total_bytes is not None:
+            self._total_bytes += size - replaced
+        if self._total_bytes is None or self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Removed by another worker
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.stats["evictions"] += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total_bytes = total
+
+    def clear(self):
+        """Remove every cached entry."""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                os.remove(entry.path)
+        self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
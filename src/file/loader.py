@@ -1,136 +1,390 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Tuple
 
+import itertools
 import logging
-import threading
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
 import PyPDF2
-import re
+
+from file.cache import ExtractionCache
+from file.segmenter import Segmenter, WHITESPACE
+from file.streams import STREAMS, ImageHandle, merge_page_ranges, parse_page_range
+from metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever extraction output changes, so cached results are not reused
+EXTRACTOR_VERSION = "1"
+
+# Longest unfinished sentence carried from page to page when no max_chunk_chars is set
+MAX_CARRY_CHARS = 16384
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Extract text of pages [start, stop) in a worker with its own fitz document."""
+    doc = fitz.open(pdf_path)
+    try:
+        return [doc[i].get_text() for i in range(start, stop)]
+    finally:
+        doc.close()
+
+
+def _split_pages(page_count: int, parts: int) -> List[tuple]:
+    """Split ``range(page_count)`` into at most ``parts`` contiguous (start, stop) ranges."""
+    parts = max(1, min(parts, page_count))
+    step, rest = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        stop = start + step + (1 if i < rest else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _has_text(pages: List[Dict[str, Any]]) -> bool:
+    """Whether any block of the parsed text pages holds text."""
+    return any(block["text"].strip() for page in pages for block in page["blocks"])
+
+
 class PdfFileLoader:
-    def __init__(self, filename, chunk_size=1024):
+    def __init__(self, filename, chunk_size=1024, workers=1,
+                 cache: Optional[ExtractionCache] = None, min_chunk_chars: int = 0,
+                 max_chunk_chars: Optional[int] = None):
+        """
+        filename: path of the PDF file
+        chunk_size: byte size of the chunks returned by load_in_chunks
+        workers: number of processes used for text extraction (1 = serial,
+                 None or 0 = os.cpu_count())
+        cache: optional ExtractionCache; on a hit PyMuPDF/PyPDF2 are skipped
+        min_chunk_chars, max_chunk_chars: bounds of the text chunks; short
+                 sentences are merged up to min_chunk_chars (see Segmenter)
+        """
         self.filename = filename
         self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache
+        self.segmenter = Segmenter(min_chunk_chars, max_chunk_chars)
         self.chunks = []
-        self.lock = threading.Lock()
+        self._mmap = None
+        self._buffer = None
+        self._documents = []  # Opened by open_document(); they read from the mapping
+        self._cache_key = None
         self._text = None  # Store extracted text
+        self._text_cached = False  # Whether _text belongs to the cache key
 
-    def _read_chunk(self, start, size):
+    def open_buffer(self) -> Optional[memoryview]:
+        """Memory-map the file read-only and return a view of its bytes.
+
+        The mapping is created once and shared by load_in_chunks() and
+        open_document(); call close() to release it.
+        """
+        if self._buffer is not None:
+            return self._buffer
         try:
             with open(self.filename, 'rb') as f:
-                f.seek(start)
-                data = f.read(size)
-                with self.lock:
-                    self.chunks.append(data)
+                if os.fstat(f.fileno()).st_size == 0:
+                    self._buffer = memoryview(b"")
+                else:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._buffer = memoryview(self._mmap)
         except FileNotFoundError:
             print(f"File not found: {self.filename}")
+            return None
+        return self._buffer
 
     def load_in_chunks(self, num_threads=4):
-        try:
-            with open(self.filename, 'rb') as f:
-                f.seek(0, 2)
-                file_size = f.tell()
-        except FileNotFoundError:
-            print(f"File not found: {self.filename}")
-            return []
+        """Return the file as ordered ``chunk_size`` memoryview slices.
 
-        threads = []
-        for i in range(0, file_size, self.chunk_size):
-            t = threading.Thread(target=self._read_chunk, args=(i, self.chunk_size))
-            threads.append(t)
-            t.start()
-            if len(threads) >= num_threads:
-                for t in threads:
-                    t.join()
-                threads = []
-        for t in threads:
-            t.join()
+        The slices reference the memory-mapped file, so no chunk is copied or
+        re-read. num_threads is accepted for backwards compatibility and ignored.
+        """
+        buffer = self.open_buffer()
+        if buffer is None:
+            return []
+        self.chunks = [buffer[i:i + self.chunk_size]
+                       for i in range(0, len(buffer), self.chunk_size)]
         return self.chunks
 
-    def extract_text_pymupdf(self, pdf_path: str) -> str:
-        """Extract text using PyMuPDF (better for complex layouts)"""
+    def open_document(self) -> "fitz.Document":
+        """Open the PDF with PyMuPDF from the memory-mapped buffer.
+
+        The document reads from the mapping, so close() closes it too.
+        """
+        buffer = self.open_buffer()
+        if buffer is None:
+            raise FileNotFoundError(self.filename)
+        doc = fitz.open(stream=buffer, filetype="pdf")
+        self._documents = [d for d in self._documents if not d.is_closed]
+        self._documents.append(doc)
+        return doc
+
+    def close(self):
+        """Close the documents of open_document(), release the chunk views and the memory mapping."""
+        for doc in self._documents:
+            if not doc.is_closed:
+                doc.close()
+        self._documents = []
+        for chunk in self.chunks:
+            chunk.release()
+        self.chunks = []
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def extract_pages_pymupdf(self, pdf_path: str, workers: Optional[int] = None) -> List[str]:
+        """Extract the text of every page using PyMuPDF (better for complex layouts).
+
+        With more than one worker the page range is split across a process
+        pool; every worker opens its own document and the pages come back in
+        page order.
+        """
+        workers = workers or self.workers
         try:
-            doc = fitz.open(pdf_path)
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            doc.close()
-            return text
+            with fitz.open(pdf_path) as doc:
+                page_count = doc.page_count
+                if workers <= 1 or page_count < 2:
+                    return [page.get_text() for page in doc]
+            ranges = _split_pages(page_count, workers)
+            with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+                futures = [pool.submit(_extract_page_range, pdf_path, start, stop)
+                           for start, stop in ranges]
+                return [text for future in futures for text in future.result()]
         except Exception as e:
             logger.error(f"Error extracting text with PyMuPDF: {e}")
-            return ""
-    
-    def extract_text_pypdf2(self, pdf_path: str) -> str:
-        """Fallback text extraction using PyPDF2"""
+            return []
+
+    def extract_text_pymupdf(self, pdf_path: str, workers: Optional[int] = None) -> str:
+        """Extract text using PyMuPDF (better for complex layouts)"""
+        return "".join(self.extract_pages_pymupdf(pdf_path, workers))
+
+    def extract_pages_pypdf2(self, pdf_path: str) -> List[str]:
+        """Fallback page text extraction using PyPDF2"""
         try:
             with open(pdf_path, 'rb') as file:
                 reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.get_text()
-            return text
+                return [page.extract_text() or "" for page in reader.pages]
         except Exception as e:
             logger.error(f"Error extracting text with PyPDF2: {e}")
-            return ""
+            return []
+
+    def extract_text_pypdf2(self, pdf_path: str) -> str:
+        """Fallback text extraction using PyPDF2"""
+        return "".join(self.extract_pages_pypdf2(pdf_path))
+
+    def cache_key(self) -> Optional[str]:
+        """Content hash key of the file in the extraction cache, if caching is on."""
+        if self.cache is None:
+            return None
+        if self._cache_key is None:
+            try:
+                self._cache_key = self.cache.key(self.filename, EXTRACTOR_VERSION)
+            except OSError:
+                return None
+        return self._cache_key
 
     def extract_text(self):
         """Extract text from PDF using best available method and store it."""
-        text = self.extract_text_pymupdf(self.filename)
-        if not text.strip():
-            text = self.extract_text_pypdf2(self.filename)
-        self._text = text
+        with metrics.span("loader.extract_text", file=self.filename):
+            key = self.cache_key()
+            pages = self.cache.get(key, "pages") if key else None
+            if key:
+                metrics.count("loader.cache_hits" if pages is not None else "loader.cache_misses")
+            cached = pages is not None
+            if pages is None:
+                with metrics.span("loader.pymupdf"):
+                    pages = self.extract_pages_pymupdf(self.filename)
+                if not "".join(pages).strip():
+                    with metrics.span("loader.pypdf2"):
+                        pages = self.extract_pages_pypdf2(self.filename)
+                # Empty or failed extractions are not cached, so they are retried
+                if key and "".join(pages).strip():
+                    self.cache.put(key, "pages", pages)
+                    cached = True
+            metrics.count("loader.pages", len(pages))
+        self._text = "".join(pages)
+        self._text_cached = key is not None and cached
         return self  # Enable chaining
 
     def chunk_text(self) -> List[str]:
-        """Split stored text into chunks by sentence."""
+        """Split stored text into normalized sentence chunks (see Segmenter)."""
         if self._text is None:
             raise ValueError("No text extracted. Call extract_text() first.")
-        # Split on sentence-ending punctuation followed by whitespace or end of string
-        sentences = re.split(r'(?<=[.!?])\s+', self._text)
-        chunks = [sentence.strip() for sentence in sentences if sentence.strip()]
+        key = self.cache_key() if self._text_cached else None
+        section = f"chunks-{self.segmenter.cache_tag}"
+        if key:
+            chunks = self.cache.get(key, section)
+            if chunks is not None:
+                metrics.count("loader.chunks", len(chunks))
+                return chunks
+        with metrics.span("loader.chunk_text"):
+            chunks = self.segmenter.split(self._text)
+        metrics.count("loader.chunks", len(chunks))
+        if key:
+            self.cache.put(key, section, chunks)
         return chunks
 
-    def parse_pdf_streams(self):
-        """Parse PDF into text, images, tables, and links streams."""
-        doc = fitz.open(self.filename)
-        text_stream = []
-        image_stream = []
-        link_stream = []
-
-        for page in doc:
-            # Extract text
-            text_stream.append(page.get_text())
-
-            # Extract images
-            for img in page.get_images(full=True):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                image_stream.append(base_image)
-
-            # Extract links
-            for link in page.get_links():
-                link_stream.append(link)
-
-        return {
-            "text": text_stream,
-            "images": image_stream,
-            "links": link_stream
-        }
+    def iter_pages(self) -> Iterator[str]:
+        """Yield the text of each page as it is decoded, without keeping the document text."""
+        try:
+            doc = fitz.open(self.filename)
+        except Exception as e:
+            logger.error(f"Error opening {self.filename} with PyMuPDF: {e}")
+            return
+        try:
+            for page in doc:
+                with metrics.span("loader.page"):
+                    text = page.get_text()
+                metrics.count("loader.pages")
+                yield text
+        finally:
+            doc.close()
+
+    def iter_chunks(self, pages: Optional[Iterable[str]] = None) -> Iterator[str]:
+        """Yield sentence chunks page by page.
+
+        The trailing, possibly unfinished sentence of a page is carried over
+        to the next one, so the output matches chunk_text() on the joined text.
+        Text without sentence boundaries (tables, lists, OCR output) is cut at
+        a space once the carry exceeds max_chunk_chars or MAX_CARRY_CHARS, so
+        memory stays flat.
+        """
+        for _, sentence in self.iter_page_chunks(pages):
+            yield sentence
+
+    def iter_page_chunks(self, pages: Optional[Iterable[str]] = None) -> Iterator[Tuple[int, str]]:
+        """Like iter_chunks(), yielding (page index, chunk) with the page the chunk starts on."""
+        return self.segmenter.merge(self._iter_page_sentences(pages))
+
+    def _iter_page_sentences(self, pages: Optional[Iterable[str]] = None) -> Iterator[Tuple[int, str]]:
+        if pages is None:
+            pages = self.iter_pages()
+        limit = self.segmenter.max_chars or MAX_CARRY_CHARS
+        carry = ""
+        carry_page = 0
+        for page_number, page_text in enumerate(pages):
+            if not carry.strip():
+                carry_page = page_number
+            text = carry + page_text
+            spans = list(self.segmenter.spans(text))
+            if len(spans) > 1 and WHITESPACE.search(text, spans[-1][0]) is None:
+                # A boundary before the last, possibly unfinished word depends on the next page
+                spans.pop()
+            start, _ = spans.pop()
+            carry = text[start:]
+            for i, (begin, end) in enumerate(spans):
+                sentence = WHITESPACE.sub(' ', text[begin:end]).strip()
+                if sentence:
+                    yield (carry_page if i == 0 else page_number), sentence
+            if spans:
+                carry_page = page_number
+            while len(carry) > limit:
+                cut = carry.rfind(' ', 0, limit + 1)
+                if cut <= 0:
+                    cut = limit
+                piece = WHITESPACE.sub(' ', carry[:cut]).strip()
+                if piece:
+                    yield carry_page, piece
+                carry = carry[cut:]
+                carry_page = page_number
+        # The boundary deferred at the end of the last page is final now
+        for i, (begin, end) in enumerate(self.segmenter.spans(carry)):
+            sentence = WHITESPACE.sub(' ', carry[begin:end]).strip()
+            if sentence:
+                yield (carry_page if i == 0 else page_number), sentence
+
+    def parse_pdf_streams(self, streams: Sequence[str] = STREAMS,
+                          workers: Optional[int] = None) -> Dict[str, List]:
+        """Parse the PDF into text, image and link streams.
+
+        streams: which of "text", "images" and "links" to parse; the others
+                 are skipped and missing from the result
+        workers: processes parsing page ranges in parallel (default: the loader's)
+
+        "text" holds one dict per page with its size and text blocks, each
+        with a bbox. "images" holds one ImageHandle per distinct image xref
+        with every page and bbox it is drawn at; no image is decoded until
+        its extract() is called. "links" holds the page links with their
+        bbox and source_page.
+
+        Each stream is cached separately, so a cache hit for one stream does
+        not require parsing the others. A cache hit returns the same values
+        as a parse; a text stream without any text is not cached.
+        """
+        unknown = set(streams) - set(STREAMS)
+        if unknown:
+            raise ValueError(f"Unknown streams {sorted(unknown)}; use {STREAMS}")
+        key = self.cache_key()
+        result = {}
+        if key:
+            for name in streams:
+                value = self.cache.get(key, f"streams-{name}")
+                metrics.count("loader.cache_hits" if value is not None else "loader.cache_misses")
+                if value is not None:
+                    result[name] = ([ImageHandle.from_dict(self.filename, image) for image in value]
+                                    if name == "images" else value)
+        missing = [name for name in streams if name not in result]
+        if missing:
+            with metrics.span("loader.parse_pdf_streams", file=self.filename, streams=",".join(missing)):
+                parsed = self._parse_streams(missing, workers or self.workers)
+            if "text" in parsed:
+                metrics.count("loader.pages", len(parsed["text"]))
+            if "images" in parsed:
+                metrics.count("loader.images", len(parsed["images"]))
+            for name, value in parsed.items():
+                if key and (name != "text" or _has_text(value)):
+                    self.cache.put(key, f"streams-{name}",
+                                   [image.as_dict() for image in value] if name == "images" else value)
+                result[name] = value
+        return {name: result[name] for name in streams}
+
+    def _parse_streams(self, streams: List[str], workers: int) -> Dict[str, List]:
+        with fitz.open(self.filename) as doc:
+            page_count = doc.page_count
+        if workers <= 1 or page_count < 2:
+            parts = [parse_page_range(self.filename, 0, page_count, streams)]
+        else:
+            ranges = _split_pages(page_count, workers)
+            with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+                futures = [pool.submit(parse_page_range, self.filename, start, stop, streams)
+                           for start, stop in ranges]
+                parts = [future.result() for future in futures]
+        return merge_page_ranges(self.filename, parts, streams)
+
+def iter_clean(text_iter: Iterable[str]) -> Iterator[str]:
+    """Lazily clean and normalize texts; see clean_text()."""
+    for text in text_iter:
+        # Control characters, newlines and whitespace runs become one space (UTF-8 is kept)
+        text = WHITESPACE.sub(' ', text).strip()
+        if text:
+            yield text
+
 
 def clean_text(text_list):
     """Clean and normalize extracted text for training.
     Removes non-printable/control characters and newlines, but keeps UTF-8 (accented) characters.
     """
-    cleaned = []
-    for text in text_list:
-        # Remove control characters except printable ones (keep UTF-8)
-        text = re.sub(r'[\x00-\x1F\x7F]+', ' ', text)
-        # Remove newlines
-        text = text.replace('\n', ' ').replace('\r', ' ')
-        # Collapse multiple spaces
-        text = re.sub(r'\s+', ' ', text)
-        text = text.strip()
-        if text:
-            cleaned.append(text)
-    return cleaned
\ No newline at end of file
+    return list(iter_clean(text_list))
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Yield lists of at most ``size`` items from ``iterable``."""
+    if size < 1:
+        raise ValueError("Batch size must be at least 1")
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
\ No newline at end of file
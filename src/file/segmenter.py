@@ -0,0 +1,179 @@
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+import hashlib
+import re
+
+# Control characters and whitespace runs (including newlines) become one space
+WHITESPACE = re.compile(r'[\s\x00-\x1F\x7F]+')
+
+# Candidate sentence ends: terminal punctuation, optional closing quotes or
+# brackets, then whitespace
+CANDIDATE = re.compile(r'[.!?]+["\'»”’)\]]*[\s\x00-\x1F\x7F]+')
+
+ROMAN_NUMERAL = re.compile(r'^[IVXLCDM]+$')
+
+# Lowercased, without the trailing period. A period after these does not end
+# a sentence even before a capitalized word ("dr. Kovács", "Szt. István").
+# Single letters ("Kr. e.", "i. sz.") match only in lowercase, so "vitamin E."
+# and "It was I." can still end one. "stb." and "etc." are left out on
+# purpose: they usually do end one, and so does the word "no".
+ABBREVIATIONS = frozenset("""
+    dr prof id ifj özv szt st kr e u i sz kb pl ill vö ún uo ld ker krt évf sk
+    jan febr márc ápr máj jún júl aug szept okt nov dec
+    mr mrs ms vs vol pp fig ca jr sr e.g i.e
+""".split())
+
+# Abbreviations that only hold before a number: "No. 5"
+NUMBER_ABBREVIATIONS = frozenset(["No", "Nr"])
+
+# Lowercased capitalized words that usually open a sentence. After a single
+# capital or a Roman numeral they mean the period ended one ("vitamin C. Next
+# one.") rather than an initial or a regnal number before a name.
+SENTENCE_STARTERS = frozenset("""
+    a az egy ez ezt ezek ezért de és is ha hogy mert majd nem itt ott ekkor akkor most
+    the an it its this that these those there then next in on at as by for from of to
+    he she we they you his her our their my but and or so if when while after what who
+""".split())
+
+_LEADING_PUNCTUATION = '("\'„«[‘“'
+
+
+class Segmenter:
+    """Normalizes text and splits it into sentence chunks.
+
+    Boundaries are found in one pass of a precompiled regex over the raw
+    text; each candidate is then checked against a few rules, so that
+    ordinals and dates ("a 20. században", "1848. március 15-én"),
+    abbreviations ("Kr. e. 400", "dr. Kovács"), and regnal numbers and
+    initials before a name ("IV. Béla", "J. R. Tolkien") do not end a
+    sentence. A period followed by a lowercase
+    letter never ends one.
+
+    Chunks are normalized like clean_text(). With min_chars, sentences are
+    merged until a chunk reaches that length; with max_chars, no chunk is
+    longer than that, merging stops early and long sentences are split at
+    spaces.
+    """
+
+    def __init__(self, min_chars: int = 0, max_chars: Optional[int] = None,
+                 abbreviations: Iterable[str] = ABBREVIATIONS):
+        """
+        min_chars: merge consecutive sentences until a chunk is at least this long
+        max_chars: upper bound of a chunk's length (None = unbounded)
+        abbreviations: lowercased abbreviations without their period
+        """
+        if max_chars is not None and max_chars < max(min_chars, 1):
+            raise ValueError("max_chars must be at least min_chars and positive")
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.abbreviations = frozenset(abbreviations)
+        digest = hashlib.blake2b(" ".join(sorted(self.abbreviations)).encode('utf-8'), digest_size=4)
+        self.cache_tag = f"seg3-{min_chars}-{max_chars}-{digest.hexdigest()}"
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse control characters and whitespace into single spaces and strip."""
+        return WHITESPACE.sub(' ', text).strip()
+
+    def _ends_sentence(self, text: str, punctuation_start: int, following_start: int) -> bool:
+        following = text[following_start:following_start + 1]
+        if not following:
+            return True
+        if following.islower():
+            return False
+        if text[punctuation_start] != '.':
+            return True
+        window = text[max(0, punctuation_start - 32):punctuation_start]
+        words = window.split() if window and not window[-1].isspace() else []
+        token = words[-1].lstrip(_LEADING_PUNCTUATION) if words else ""
+        if (token if len(token) == 1 else token.lower()) in self.abbreviations:
+            return False
+        if following.isdigit():
+            return token not in NUMBER_ABBREVIATIONS
+        # Regnal numbers and initials before a name: "IV. Béla", "J. R. Tolkien"
+        if not (ROMAN_NUMERAL.match(token) or (len(token) == 1 and token.isupper())):
+            return True
+        if not self._is_name_word(text, following_start):
+            return True  # "vitamin C. Next one."
+        # After a name a numeral is its last word: "World War II. Germany lost."
+        previous = words[-2].lstrip(_LEADING_PUNCTUATION) if len(words) > 1 else ""
+        return (len(token) > 1 and previous[:1].isupper() and previous[-1] not in '.!?:'
+                and previous.lower() not in SENTENCE_STARTERS)
+
+    @staticmethod
+    def _is_name_word(text: str, start: int) -> bool:
+        """Whether the word at ``start`` is capitalized and not a usual sentence opener."""
+        end = start
+        while end < len(text) and not text[end].isspace():
+            end += 1
+        word = text[start:end].lstrip(_LEADING_PUNCTUATION).rstrip(',;:!?"\'»”’)]')
+        return word[:1].isupper() and word.lower() not in SENTENCE_STARTERS
+
+    def spans(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(start, end) offsets of the raw sentences in ``text``, the last one possibly unfinished."""
+        start = 0
+        for match in CANDIDATE.finditer(text):
+            if self._ends_sentence(text, match.start(), match.end()):
+                yield start, match.end()
+                start = match.end()
+        yield start, len(text)
+
+    def sentences(self, text: str) -> List[str]:
+        """Normalized sentences of ``text``, without merging."""
+        sentences = []
+        for start, end in self.spans(text):
+            sentence = WHITESPACE.sub(' ', text[start:end]).strip()
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def split(self, text: str) -> List[str]:
+        """Normalized chunks of ``text``, merged and bounded by min_chars / max_chars."""
+        sentences = self.sentences(text)
+        if self.min_chars <= 0 and self.max_chars is None:
+            return sentences
+        return [chunk for _, chunk in self.merge((None, sentence) for sentence in sentences)]
+
+    def _pieces(self, sentence: str) -> Iterator[str]:
+        """The sentence, split at spaces into parts of at most max_chars."""
+        limit = self.max_chars
+        while limit is not None and len(sentence) > limit:
+            cut = sentence.rfind(' ', 0, limit + 1)
+            if cut <= 0:
+                cut = limit
+            yield sentence[:cut].rstrip()
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            yield sentence
+
+    def merge(self, items: Iterable[Tuple[Any, str]]) -> Iterator[Tuple[Any, str]]:
+        """Merge (key, sentence) pairs into (key of the first sentence, chunk) pairs.
+
+        A short trailing chunk is appended to the previous one when it fits.
+        """
+        if self.min_chars <= 0 and self.max_chars is None:
+            yield from items
+            return
+        limit = self.max_chars
+        ready: Optional[Tuple[Any, str]] = None
+        key, chunk = None, ""
+        for item_key, sentence in items:
+            for piece in self._pieces(sentence):
+                if chunk and (len(chunk) >= self.min_chars
+                              or (limit is not None and len(chunk) + 1 + len(piece) > limit)):
+                    if ready is not None:
+                        yield ready
+                    ready = (key, chunk)
+                    chunk = ""
+                if chunk:
+                    chunk += " " + piece
+                else:
+                    key, chunk = item_key, piece
+        if chunk and len(chunk) < self.min_chars and ready is not None \
+                and (limit is None or len(ready[1]) + 1 + len(chunk) <= limit):
+            ready = (ready[0], ready[1] + " " + chunk)
+            chunk = ""
+        if ready is not None:
+            yield ready
+        if chunk:
+            yield key, chunk
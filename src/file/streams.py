@@ -0,0 +1,127 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+
+STREAMS = ("text", "images", "links")
+
+
+def _bbox(rect) -> List[float]:
+    return [round(float(value), 2) for value in rect]
+
+
+class ImageHandle:
+    """An embedded image, decoded only when extract() is called.
+
+    One handle exists per image xref; ``placements`` lists every
+    (page, bbox) where it is drawn, and ``page`` / ``bbox`` are the first.
+    """
+
+    def __init__(self, filename: str, xref: int, width: int, height: int,
+                 placements: Optional[List[Tuple[int, List[float]]]] = None,
+                 colorspace: Optional[str] = None, bpc: Optional[int] = None,
+                 filter: Optional[str] = None):
+        self.filename = filename
+        self.xref = xref
+        self.width = width
+        self.height = height
+        self.placements = placements or []
+        self.colorspace = colorspace
+        self.bpc = bpc
+        self.filter = filter
+
+    @property
+    def page(self) -> Optional[int]:
+        return self.placements[0][0] if self.placements else None
+
+    @property
+    def bbox(self) -> Optional[List[float]]:
+        return self.placements[0][1] if self.placements else None
+
+    def extract(self, doc: Optional["fitz.Document"] = None) -> Dict[str, Any]:
+        """Decode the image: PyMuPDF's extract_image() dict with "image" bytes and "ext".
+
+        doc: an open document of the same file, to avoid reopening it per image
+        """
+        if doc is not None:
+            return doc.extract_image(self.xref)
+        with fitz.open(self.filename) as doc:
+            return doc.extract_image(self.xref)
+
+    @property
+    def data(self) -> bytes:
+        """The encoded image bytes (PNG, JPEG, ...), decoded now."""
+        return self.extract()["image"]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "xref": self.xref, "width": self.width, "height": self.height,
+            "placements": [[page, bbox] for page, bbox in self.placements],
+            "colorspace": self.colorspace, "bpc": self.bpc, "filter": self.filter,
+        }
+
+    @classmethod
+    def from_dict(cls, filename: str, value: Dict[str, Any]) -> "ImageHandle":
+        value = dict(value)
+        value["placements"] = [(page, bbox) for page, bbox in value.get("placements", [])]
+        return cls(filename, **value)
+
+    def __repr__(self):
+        return (f"ImageHandle(xref={self.xref}, {self.width}x{self.height}, "
+                f"page={self.page}, placements={len(self.placements)})")
+
+
+def parse_page_range(pdf_path: str, start: int, stop: int,
+                     streams: Sequence[str] = STREAMS) -> Dict[str, List]:
+    """Parse pages [start, stop) without decoding any image; runs in a worker process.
+
+    Returns plain data: text pages, image placements as
+    (xref, width, height, colorspace, bpc, filter, page, bbox) and links.
+    """
+    result = {name: [] for name in streams}
+    with fitz.open(pdf_path) as doc:
+        for number in range(start, stop):
+            page = doc[number]
+            if "text" in streams:
+                result["text"].append({
+                    "page": number,
+                    "width": round(page.rect.width, 2),
+                    "height": round(page.rect.height, 2),
+                    "blocks": [
+                        {"bbox": _bbox(block[:4]), "text": block[4]}
+                        for block in page.get_text("blocks") if block[6] == 0  # 1 = image block
+                    ],
+                })
+            if "images" in streams:
+                for xref, _, width, height, bpc, colorspace, _, _, filter_, _ in page.get_images(full=True):
+                    rects = page.get_image_rects(xref) or [None]
+                    for rect in rects:
+                        result["images"].append((xref, width, height, colorspace, bpc, filter_, number,
+                                                 _bbox(rect) if rect is not None else None))
+            if "links" in streams:
+                for link in page.get_links():
+                    link = {key: value for key, value in link.items() if key not in ("xref", "id")}
+                    link["from"] = _bbox(link["from"])
+                    if "to" in link:
+                        link["to"] = [float(link["to"].x), float(link["to"].y)]
+                    link["source_page"] = number
+                    result["links"].append(link)
+    return result
+
+
+def merge_page_ranges(filename: str, parts: Iterable[Dict[str, List]],
+                      streams: Sequence[str] = STREAMS) -> Dict[str, List]:
+    """Concatenate the results of parse_page_range() in page order, one ImageHandle per xref."""
+    merged = {name: [] for name in streams}
+    handles: Dict[int, ImageHandle] = {}
+    for part in parts:
+        for name in streams:
+            if name != "images":
+                merged[name].extend(part[name])
+        for xref, width, height, colorspace, bpc, filter_, page, bbox in part.get("images", []):
+            handle = handles.get(xref)
+            if handle is None:
+                handle = handles[xref] = ImageHandle(filename, xref, width, height,
+                                                     colorspace=colorspace, bpc=bpc, filter=filter_)
+                merged["images"].append(handle)
+            handle.placements.append((page, bbox))
+    return merged
@@ -1,36 +1,178 @@
-from typing import List, Dict
-from sklearn.decomposition import LatentDirichletAllocation, NMF
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.model_selection import GridSearchCV
+from typing import List, Dict, Any, Iterable, Optional
+import itertools
+import time
 import numpy as np
 
+from metrics import metrics
+
+# scikit-learn is imported inside the methods that need it, so importing this
+# module (and main) does not pay for it
+
+
+def _make_model(method: str, n_components: int, random_state: int):
+    from sklearn.decomposition import LatentDirichletAllocation, NMF
+
+    if method == "lda":
+        return LatentDirichletAllocation(n_components=n_components, random_state=random_state)
+    if method == "hdp":
+        return NMF(n_components=n_components, random_state=random_state)
+    raise ValueError("Unknown method. Use 'lda' or 'hdp'.")
+
+
+def _make_online_model(method: str, n_components: int, random_state: int):
+    """A model that supports partial_fit for incremental updates."""
+    from sklearn.decomposition import LatentDirichletAllocation, MiniBatchNMF
+
+    if method == "lda":
+        return LatentDirichletAllocation(n_components=n_components, learning_method="online",
+                                         random_state=random_state)
+    if method == "hdp":
+        return MiniBatchNMF(n_components=n_components, random_state=random_state)
+    raise ValueError("Unknown method. Use 'lda' or 'hdp'.")
+
+
+def _relative_reconstruction_error(X, W: np.ndarray, H: np.ndarray) -> float:
+    """||X - WH|| / ||X|| without forming a dense documents x vocabulary matrix.
+
+    ||X - WH||^2 = ||X||^2 - 2<X, WH> + ||WH||^2, where <X, WH> only needs
+    WH at X's non-zeros and ||WH||^2 = sum((W^T W) * (H H^T)).
+    """
+    from scipy import sparse
+
+    X = sparse.coo_matrix(X)
+    x_norm = float(np.dot(X.data, X.data))
+    cross = float(np.dot(X.data, np.einsum("ij,ji->i", W[X.row], H[:, X.col])))
+    wh_norm = float(np.sum((W.T @ W) * (H @ H.T)))
+    return float(np.sqrt(max(x_norm - 2 * cross + wh_norm, 0.0)) / max(np.sqrt(x_norm), 1e-12))
+
+
+def _heldout_score(model, X, criterion: str) -> float:
+    """Score a fitted model on held-out documents; lower is better."""
+    if criterion == "perplexity":
+        return float(model.perplexity(X))
+    if criterion == "reconstruction":
+        return _relative_reconstruction_error(X, model.transform(X), model.components_)
+    raise ValueError("Unknown criterion. Use 'perplexity' or 'reconstruction'.")
+
+
+def _fit_candidate(method: str, n_components: int, X_train, X_val,
+                   criterion: str, random_state: int) -> Dict[str, Any]:
+    """Fit one topic count and score it; runs in a worker process."""
+    start = time.perf_counter()
+    model = _make_model(method, n_components, random_state)
+    model.fit(X_train)
+    fit_time = time.perf_counter() - start
+    return {
+        "n_components": n_components,
+        "score": _heldout_score(model, X_val, criterion),
+        "fit_time": fit_time,
+        "model": model,
+    }
+
+
 class Topic:
-    def __init__(self, method: str = "lda", topic_range=range(2, 11)):
+    def __init__(self, method: str = "lda", topic_range=range(2, 11), n_jobs: Optional[int] = -1,
+                 criterion: str = "auto", holdout: float = 0.2, tol: float = 0.01,
+                 patience: int = 2, random_state: int = 42, vocabulary: str = "frozen",
+                 n_features: int = 2 ** 18, wave_size: int = 3):
         """
         method: "lda" for Latent Dirichlet Allocation, "hdp" for NMF (as HDP alternative)
         topic_range: range of topic numbers to search for best model
+        n_jobs: worker processes fitting candidates in parallel (-1 = all cores)
+        criterion: "perplexity" (LDA), "reconstruction" (NMF) or "auto" to pick by method
+        holdout: fraction of documents held out to score the candidates
+        tol: relative improvement below which a candidate counts as no better
+        patience: stop after this many candidates in a row without improvement
+        wave_size: candidates fitted in parallel before checking for a stop
+                   (at most n_jobs); small waves let the search stop early
+        vocabulary: vectorizer used by partial_fit when none is fitted yet: "frozen"
+                    learns the vocabulary from the first batch, "hashing" hashes
+                    every word into n_features columns so new words are kept
         """
         self.method = method.lower()
         self.topic_range = topic_range
-        self.vectorizer = CountVectorizer(stop_words='english')
+        self.n_jobs = n_jobs
+        if criterion == "auto":
+            criterion = "reconstruction" if self.method == "hdp" else "perplexity"
+        self.criterion = criterion
+        self.holdout = holdout
+        self.tol = tol
+        self.patience = patience
+        self.wave_size = wave_size
+        self.random_state = random_state
+        self.vocabulary = vocabulary
+        self.n_features = n_features
+        self.hashed_words = {}  # Column -> last word seen there, for hashing vocabularies
+        self.vectorizer = None
         self.model = None
         self.n_topics = None
+        self.search_results = []
+
+    def _split(self, X):
+        """Split rows into train and held-out sets; tiny corpora are scored on the training set."""
+        n_docs = X.shape[0]
+        n_val = int(round(n_docs * self.holdout))
+        if n_val < 1 or n_docs - n_val < 2:
+            return X, X
+        order = np.random.RandomState(self.random_state).permutation(n_docs)
+        return X[order[n_val:]], X[order[:n_val]]
+
+    def search(self, X) -> List[Dict[str, Any]]:
+        """Search topic counts on a vectorized matrix, in parallel with early stopping.
 
-    def fit(self, documents: List[str]):
+        Candidates are fitted in waves of wave_size (at most n_jobs), in
+        increasing topic count.
+        The search stops once ``patience`` candidates in a row fail to improve
+        the held-out score by more than ``tol``. Returns one dict per fitted
+        candidate with n_components, score, fit_time and the model.
+        """
+        from joblib import Parallel, delayed, effective_n_jobs
+
+        X_train, X_val = self._split(X)
+        candidates = list(self.topic_range)
+        wave_size = max(1, min(self.wave_size, effective_n_jobs(self.n_jobs)))
+        results = []
+        best = None
+        since_best = 0
+        with Parallel(n_jobs=self.n_jobs) as parallel:
+            for i in range(0, len(candidates), wave_size):
+                wave = parallel(
+                    delayed(_fit_candidate)(self.method, k, X_train, X_val,
+                                            self.criterion, self.random_state)
+                    for k in candidates[i:i + wave_size]
+                )
+                stop = False
+                for result in wave:
+                    results.append(result)
+                    if best is None or result["score"] < best * (1 - self.tol):
+                        best = result["score"]
+                        since_best = 0
+                    else:
+                        since_best += 1
+                        if since_best >= self.patience:
+                            stop = True
+                            break
+                if stop:
+                    break
+        return results
+
+    def fit(self, documents: List[str]) -> List[Dict[str, Any]]:
         """
         Fits the topic model to the given documents.
-        This method processes the documents through vectorization and fits either a Latent 
-        Dirichlet Allocation (LDA) or Non-negative Matrix Factorization (NMF) model. It uses
-        grid search with cross-validation to find the optimal number of topics within the
-        specified topic range.
+        This method processes the documents through vectorization once and fits either a
+        Latent Dirichlet Allocation (LDA) or Non-negative Matrix Factorization (NMF) model
+        for the topic counts in the specified topic range, in parallel, scoring each on
+        held-out documents and stopping early once the score plateaus.
         Parameters
         ----------
         documents : List[str]
             A list of document strings to be processed and fitted to the topic model.
         Returns
         -------
-        None
-            The method updates the instance variables self.model and self.n_topics in place.
+        List[Dict[str, Any]]
+            Per-candidate n_components, held-out score and fit_time (seconds), also
+            stored in self.search_results. The instance variables self.model and
+            self.n_topics are updated in place.
         Raises
         ------
         ValueError
@@ -39,24 +181,120 @@ class Topic:
         -----
         The method performs the following steps:
         1. Vectorizes the input documents
-        2. Initializes either LDA or NMF model based on self.method
-        3. Performs grid search over different numbers of topics
-        4. Selects the best model and stores it in self.model
+        2. Fits candidates on a training split and scores them with held-out perplexity
+           (LDA) or relative reconstruction error (NMF)
+        3. Stops once `patience` candidates in a row do not improve the score by `tol`
+        4. Refits the best topic count on all documents and stores it in self.model
         5. Updates self.n_topics with the optimal number of components
         """
-        X = self.vectorizer.fit_transform(documents)
-        if self.method == "lda":
-            model = LatentDirichletAllocation(random_state=42)
-        elif self.method == "hdp":
-            model = NMF(random_state=42)
-        else:
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        if self.method not in ("lda", "hdp"):
             raise ValueError("Unknown method. Use 'lda' or 'hdp'.")
 
-        param_grid = {'n_components': list(self.topic_range)}
-        grid = GridSearchCV(model, param_grid, cv=3)
-        grid.fit(X)
-        self.model = grid.best_estimator_
+        metrics.count("topic.documents", len(documents))
+        with metrics.span("topic.fit", documents=len(documents)):
+            with metrics.span("topic.vectorize"):
+                self.vectorizer = CountVectorizer(stop_words='english')
+                X = self.vectorizer.fit_transform(documents)
+            with metrics.span("topic.search"):
+                results = self.search(X)
+            metrics.count("topic.candidates", len(results))
+            best = min(results, key=lambda result: result["score"])
+
+            with metrics.span("topic.refit", n_components=best["n_components"]):
+                self.model = _make_model(self.method, best["n_components"], self.random_state)
+                self.model.fit(X)
         self.n_topics = self.model.n_components
+        self.search_results = [
+            {key: value for key, value in result.items() if key != "model"}
+            for result in results
+        ]
+        return self.search_results
+
+    def _make_incremental_vectorizer(self, first_batch: List[str]):
+        from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+
+        if self.vocabulary == "hashing":
+            return HashingVectorizer(stop_words='english', n_features=self.n_features,
+                                     alternate_sign=False, norm=None)
+        if self.vocabulary == "frozen":
+            return CountVectorizer(stop_words='english').fit(first_batch)
+        raise ValueError("Unknown vocabulary. Use 'frozen' or 'hashing'.")
+
+    def _remember_hashed_words(self, documents: List[str]):
+        from sklearn.utils import murmurhash3_32
+
+        analyzer = self.vectorizer.build_analyzer()
+        for document in documents:
+            for word in analyzer(document):
+                self.hashed_words[abs(murmurhash3_32(word, seed=0)) % self.n_features] = word
+
+    def partial_fit(self, documents: Iterable[str], batch_size: int = 256,
+                    n_topics: Optional[int] = None):
+        """
+        Update the topic model incrementally with new documents.
+
+        Documents are consumed in mini-batches of ``batch_size``, so any iterator
+        (for example PdfFileLoader.iter_chunks()) can be streamed in, and the
+        cost depends only on the new documents. The vocabulary is never refit:
+        a model trained with fit() keeps its vectorizer, otherwise one is
+        created according to ``self.vocabulary``. A model trained with fit() is
+        updated in place for LDA; NMF models from fit() cannot be updated.
+
+        Args:
+            documents (Iterable[str]): New documents.
+            batch_size (int, optional): Documents per partial_fit step. Defaults to 256.
+            n_topics (int, optional): Topic count of a new model. Defaults to the
+                first value of topic_range.
+        """
+        if self.method not in ("lda", "hdp"):
+            raise ValueError("Unknown method. Use 'lda' or 'hdp'.")
+        if self.model is not None and not hasattr(self.model, "partial_fit"):
+            raise ValueError("The fitted model does not support incremental updates; "
+                             "start from partial_fit() instead of fit().")
+
+        iterator = iter(documents)
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                break
+            if self.vectorizer is None:
+                self.vectorizer = self._make_incremental_vectorizer(batch)
+            if self.model is None:
+                self.model = _make_online_model(
+                    self.method, n_topics or self.n_topics or list(self.topic_range)[0],
+                    self.random_state
+                )
+            with metrics.span("topic.partial_fit_batch", documents=len(batch)):
+                if self.vocabulary == "hashing" and not hasattr(self.vectorizer, "vocabulary_"):
+                    self._remember_hashed_words(batch)
+                self.model.partial_fit(self.vectorizer.transform(batch))
+            metrics.count("topic.documents", len(batch))
+        if self.model is not None:
+            self.n_topics = self.model.n_components
+        return self
+
+    def save(self, path: str):
+        """Save the vectorizer, model and settings so training can resume later."""
+        import joblib
+
+        joblib.dump(self.__dict__, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Topic":
+        """Restore a Topic saved with save()."""
+        import joblib
+
+        topic = cls.__new__(cls)
+        topic.__dict__.update(joblib.load(path))
+        return topic
+
+    def _feature_names(self, indices) -> List[str]:
+        if hasattr(self.vectorizer, "vocabulary_"):
+            feature_names = self.vectorizer.get_feature_names_out()
+            return [feature_names[i] for i in indices]
+        return [self.hashed_words.get(i, f"#{i}") for i in indices]
 
     def get_topics(self, n_words: int = 10) -> List[List[str]]:
         """
@@ -77,10 +315,9 @@ class Topic:
             [['word1', 'word2', 'word3', 'word4', 'word5'],
              ['topic2_word1', 'topic2_word2', 'topic2_word3', 'topic2_word4', 'topic2_word5']]
         """
-        feature_names = self.vectorizer.get_feature_names_out()
         topics = []
         for topic_idx, topic in enumerate(self.model.components_):
-            top_features = [feature_names[i] for i in topic.argsort()[:-n_words - 1:-1]]
+            top_features = self._feature_names(topic.argsort()[:-n_words - 1:-1])
             topics.append(top_features)
         return topics
 
@@ -101,6 +338,7 @@ class Topic:
             >>> topic_model.classify(documents)
             [0, 2]  # Where 0 might represent 'sports' topic and 2 'politics' topic
         """
-        X = self.vectorizer.transform(documents)
-        topic_distributions = self.model.transform(X)
+        with metrics.span("topic.classify", documents=len(documents)):
+            X = self.vectorizer.transform(documents)
+            topic_distributions = self.model.transform(X)
         return np.argmax(topic_distributions, axis=1).tolist()
\ No newline at end of file
@@ -0,0 +1,328 @@
+"""Batch ingestion of PDF directories into a persistent vector store.
+
+The stages run concurrently and are linked by bounded queues, so a slow
+stage holds back the ones before it instead of letting work pile up:
+
+    extract + chunk + clean (process pool) -> embed (batched) -> write (single writer)
+
+Finished documents are appended to a manifest, so an interrupted run can be
+restarted and skips what was already written.
+
+Usage:
+    python src/ingest.py DIRECTORY --store STORE_DIR [--workers 4] [--batch-size 64]
+                         [--trace trace.json] [--metrics metrics.prom] [--profile run.prof]
+"""
+
+from typing import List, Dict, Any, Iterable, Optional
+
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from file.cache import file_hash
+from file.loader import PdfFileLoader
+from metrics import metrics
+from sml.inference import INFERENCE_MODES
+from vector.backends import ChromaBackend, LocalBackend
+from vector.store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # End-of-stream marker passed between stages
+
+
+def extract_document(path: str, min_chunk_chars: int = 0,
+                     max_chunk_chars: Optional[int] = None) -> Dict[str, Any]:
+    """Extract and chunk one PDF into normalized chunks; runs in a worker process."""
+    start = time.perf_counter()
+    loader = PdfFileLoader(path, min_chunk_chars=min_chunk_chars, max_chunk_chars=max_chunk_chars)
+    chunks = []
+    pages = []
+    for page, chunk in loader.iter_page_chunks():
+        chunks.append(chunk)
+        pages.append(page)
+    return {"path": path, "doc_id": file_hash(path), "chunks": chunks, "pages": pages,
+            "seconds": time.perf_counter() - start}
+
+
+def find_pdfs(directory: str) -> List[str]:
+    """All PDF files under ``directory``, sorted."""
+    found = []
+    for root, _, files in os.walk(directory):
+        found.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+    return sorted(found)
+
+
+class StageStats:
+    """Items processed and time spent working (not waiting) in one stage.
+
+    Extraction time is summed over the worker processes, so its throughput
+    is per worker.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.chunks = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float, items: int = 1, chunks: int = 0):
+        with self.lock:
+            self.busy += seconds
+            self.items += items
+            self.chunks += chunks
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "chunks": self.chunks,
+            "busy_seconds": round(self.busy, 3),
+            "chunks_per_second": round(self.chunks / self.busy, 1) if self.busy else None,
+        }
+
+
+class IngestPipeline:
+    """Pipelined ingestion of many PDFs into a VectorStore collection."""
+
+    def __init__(self, store: VectorStore, workers: int = 4, batch_size: int = 64,
+                 queue_size: int = 16, manifest_path: Optional[str] = None,
+                 min_chunk_chars: int = 0, max_chunk_chars: Optional[int] = None):
+        """
+        store: vector store with an open collection; only the writer stage touches it
+        workers: extraction processes
+        batch_size: chunks per embedding call; small documents are batched together
+        queue_size: maximum documents waiting between two stages
+        manifest_path: JSON-lines file of finished documents, used to resume
+        min_chunk_chars, max_chunk_chars: chunk length bounds, see PdfFileLoader
+        """
+        self.store = store
+        self.min_chunk_chars = min_chunk_chars
+        self.max_chunk_chars = max_chunk_chars
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.manifest_path = manifest_path
+        self.stats = {name: StageStats(name) for name in ("extract", "embed", "write")}
+        self.failed: List[str] = []
+        self._abort = threading.Event()
+
+    def _put(self, q: queue.Queue, item):
+        """Blocking put that gives up once another stage has failed."""
+        while True:
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self._abort.is_set():
+                    raise RuntimeError("Ingestion aborted")
+
+    def _get(self, q: queue.Queue):
+        """Blocking get that gives up once another stage has failed."""
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self._abort.is_set():
+                    raise RuntimeError("Ingestion aborted")
+
+    def done_documents(self) -> set:
+        """(path, file hash) pairs recorded in the manifest by earlier runs."""
+        if not self.manifest_path or not os.path.exists(self.manifest_path):
+            return set()
+        done = set()
+        with open(self.manifest_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    done.add((record["path"], record["doc_id"]))
+                except (ValueError, KeyError):
+                    continue  # Torn last line after a crash
+        return done
+
+    def run(self, paths: Iterable[str]) -> Dict[str, Any]:
+        """Ingest ``paths`` and return per-stage statistics.
+
+        A path in the manifest is skipped only while its content hash is
+        unchanged; an edited file is ingested again and replaces its chunks.
+        """
+        done = self.done_documents()
+        done_paths = {path for path, _ in done}
+        paths = list(paths)
+        n_given = len(paths)
+        paths = [path for path in paths
+                 if path not in done_paths or (path, file_hash(path)) not in done]
+        self.stats = {name: StageStats(name) for name in ("extract", "embed", "write")}
+        self.failed = []
+        extracted = queue.Queue(maxsize=self.queue_size)
+        embedded = queue.Queue(maxsize=self.queue_size)
+        errors = []
+
+        self._abort.clear()
+
+        def guarded(stage):
+            def run_stage():
+                try:
+                    stage()
+                except BaseException as e:
+                    if not self._abort.is_set():  # The first failure, not the aborts it causes
+                        errors.append(e)
+                        logger.exception(f"Ingestion stage failed: {e}")
+                    self._abort.set()
+            return run_stage
+
+        threads = [
+            threading.Thread(target=guarded(lambda: self._embed(extracted, embedded)), name="ingest-embed"),
+            threading.Thread(target=guarded(lambda: self._write(embedded)), name="ingest-write"),
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        guarded(lambda: self._extract(paths, extracted))()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return {
+            "documents": len(paths),
+            "skipped": n_given - len(paths),
+            "failed": list(self.failed),
+            "seconds": round(time.perf_counter() - start, 3),
+            "stages": {name: stats.as_dict() for name, stats in self.stats.items()},
+        }
+
+    def _extract(self, paths: List[str], out: queue.Queue):
+        """Run extraction in the process pool, keeping at most queue_size results in flight.
+
+        Results are handed on from this thread as they complete, so a full
+        queue holds back new submissions, never the pool's result delivery.
+        """
+        remaining = iter(paths)
+        pending = {}
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                for path in remaining:
+                    future = pool.submit(extract_document, path, self.min_chunk_chars, self.max_chunk_chars)
+                    pending[future] = path
+                    if len(pending) >= self.queue_size:
+                        break
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._extracted(future, pending.pop(future), out)
+        self._put(out, _DONE)
+
+    def _extracted(self, future, path: str, out: queue.Queue):
+        try:
+            document = future.result()
+        except Exception as e:
+            logger.error(f"Error extracting {path}: {e}")
+            self.failed.append(path)
+            return
+        self.stats["extract"].record(document["seconds"], chunks=len(document["chunks"]))
+        self._put(out, document)
+
+    def _embed(self, documents: queue.Queue, out: queue.Queue):
+        """Embed chunks of several documents per model call."""
+        batch = []
+        n_chunks = 0
+        while True:
+            document = self._get(documents)
+            if document is _DONE:
+                break
+            batch.append(document)
+            n_chunks += len(document["chunks"])
+            if n_chunks >= self.batch_size:
+                self._embed_batch(batch, out)
+                batch = []
+                n_chunks = 0
+        if batch:
+            self._embed_batch(batch, out)
+        self._put(out, _DONE)
+
+    def _embed_batch(self, documents: List[Dict[str, Any]], out: queue.Queue):
+        start = time.perf_counter()
+        chunks = [chunk for document in documents for chunk in document["chunks"]]
+        embeddings = self.store.encode(chunks) if chunks else None
+        self.stats["embed"].record(time.perf_counter() - start, items=len(documents), chunks=len(chunks))
+        offset = 0
+        for document in documents:
+            count = len(document["chunks"])
+            document["embeddings"] = embeddings[offset:offset + count] if count else None
+            offset += count
+            self._put(out, document)
+
+    def _write(self, documents: queue.Queue):
+        """The single writer: upsert each document and record it in the manifest."""
+        while True:
+            document = self._get(documents)
+            if document is _DONE:
+                return
+            start = time.perf_counter()
+            if document["chunks"]:
+                # force: chunks of a document interrupted by a crash are replaced
+                self.store.upsert_document(document["chunks"], document["path"],
+                                           pages=document["pages"], doc_id=document["doc_id"],
+                                           force=True, embeddings=document["embeddings"])
+            if self.manifest_path:
+                with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"path": document["path"], "doc_id": document["doc_id"],
+                                        "chunks": len(document["chunks"])}) + "\n")
+            self.stats["write"].record(time.perf_counter() - start, chunks=len(document["chunks"]))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Ingest a directory of PDFs into a persistent vector store.")
+    parser.add_argument("directory", help="directory searched recursively for PDF files")
+    parser.add_argument("--store", required=True, help="directory of the persistent store")
+    parser.add_argument("--backend", choices=["chroma", "local"], default="chroma")
+    parser.add_argument("--collection", default="documents")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--min-chunk-chars", type=int, default=0,
+                        help="merge short sentences into chunks of at least this length (default: one chunk per sentence)")
+    parser.add_argument("--max-chunk-chars", type=int, default=None,
+                        help="longest chunk; keep it within the embedding model's sequence length (default: unbounded)")
+    parser.add_argument("--inference", choices=INFERENCE_MODES, default="torch",
+                        help="CPU inference mode of the embedding model (falls back to torch)")
+    parser.add_argument("--onnx-path", help="local ONNX export of the embedding model for --inference onnx")
+    parser.add_argument("--trace", help="write a Chrome trace of the stage spans to this JSON file")
+    parser.add_argument("--metrics", help="write the metrics in Prometheus text format to this file")
+    parser.add_argument("--profile", help="dump cProfile stats of the run to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(args.store, exist_ok=True)
+    if args.backend == "local":
+        backend = LocalBackend(args.store)
+    else:
+        backend = ChromaBackend(path=args.store)
+    store = VectorStore(backend=backend, batch_size=args.batch_size, inference=args.inference,
+                        onnx_path=args.onnx_path)
+    store.open_collection(args.collection)
+
+    pipeline = IngestPipeline(store, workers=args.workers, batch_size=args.batch_size,
+                              queue_size=args.queue_size, min_chunk_chars=args.min_chunk_chars,
+                              max_chunk_chars=args.max_chunk_chars,
+                              manifest_path=os.path.join(args.store, f"{args.collection}.ingested.jsonl"))
+    if args.trace:
+        metrics.start_trace()
+    with metrics.profile(args.profile):
+        stats = pipeline.run(find_pdfs(args.directory))
+    if args.trace:
+        metrics.write_trace(args.trace)
+    if args.metrics:
+        with open(args.metrics, 'w', encoding='utf-8') as f:
+            f.write(metrics.to_prometheus())
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,11 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from file.loader import PdfFileLoader, clean_text
 from file.topic  import Topic
-from sml.model import SmallLanguageModel
+from sml.answers import AnswerCache, answer_cache, dedupe_chunks
+from sml.model import FAILED_ANSWERS, SmallLanguageModel
+from vector.backends import ChromaBackend
 from vector.store import VectorStore
-from datetime import datetime
 
 def parse_pdf_file(filename: str) -> List[str]:
     """Parse the content of a file and return cleaned text."""
@@ -12,8 +13,12 @@ def parse_pdf_file(filename: str) -> List[str]:
     text = loader.extract_text().chunk_text()
     return text
 
-def ask_question(question: str, store: VectorStore, llm: SmallLanguageModel, n_results: int = 3) -> Dict[str, Any]:
-    """Answer a natural language question about the PDF"""
+def ask_question(question: str, store: VectorStore, llm: SmallLanguageModel, n_results: int = 3,
+                 cache: Optional[AnswerCache] = answer_cache) -> Dict[str, Any]:
+    """Answer a natural language question about the PDF
+
+    cache: answers of earlier questions over the same chunks (None = no caching)
+    """
     try:
         # Search for relevant chunks
         results = store.search(question, n_results=n_results)
@@ -21,11 +26,15 @@ def ask_question(question: str, store: VectorStore, llm: SmallLanguageModel, n_r
         if not results:
             return {"answer": "No relevant content found", "sources": []}
         
-        # Combine top results as context
-        context = " ".join([result["text"] for result in results[:n_results]])
-        
-        # Get answer from language model
-        answer = llm.answer_question(question, context)
+        # Combine the distinct top results as context
+        chunks = dedupe_chunks(results[:n_results])
+        key = AnswerCache.key(question, chunks, llm.cache_tag)
+        answer = cache.get(key) if cache is not None else None
+        if answer is None:
+            context = llm.build_context(question, [chunk["text"] for chunk in chunks])
+            answer = llm.answer_question(question, context)
+            if cache is not None and answer not in FAILED_ANSWERS:
+                cache.put(key, answer)
         
         return {
             "answer": answer,
@@ -41,14 +50,75 @@ def ask_question(question: str, store: VectorStore, llm: SmallLanguageModel, n_r
     except Exception as e:
         return {"error": str(e)}
 
-def q_and_a(text: List[str], filename: str) -> None:
+def ask_questions(questions: List[str], store: VectorStore, llm: SmallLanguageModel,
+                  n_results: int = 3, batch_size: int = 8,
+                  cache: Optional[AnswerCache] = answer_cache) -> List[Dict[str, Any]]:
+    """Answer many questions with one retrieval query and one batched QA call
+
+    Cached and repeated (question, chunks) pairs are answered once.
+    """
+    try:
+        all_results = store.search_many(questions, n_results=n_results)
+        
+        answer_by_question = {}
+        pending: Dict[Any, List[int]] = {}  # Uncached key -> questions asking it
+        pending_chunks = {}
+        for i, results in enumerate(all_results):
+            if not results:
+                continue
+            chunks = dedupe_chunks(results[:n_results])
+            key = AnswerCache.key(questions[i], chunks, llm.cache_tag)
+            answer = cache.get(key) if cache is not None and key not in pending else None
+            if answer is not None:
+                answer_by_question[i] = answer
+            else:
+                pending.setdefault(key, []).append(i)
+                pending_chunks[key] = chunks
+
+        keys = list(pending)
+        first = [pending[key][0] for key in keys]
+        contexts = [
+            llm.build_context(questions[i], [chunk["text"] for chunk in pending_chunks[key]])
+            for i, key in zip(first, keys)
+        ]
+        answers = llm.answer_questions(
+            [questions[i] for i in first], contexts, batch_size=batch_size
+        )
+        for key, answer in zip(keys, answers):
+            if cache is not None and answer not in FAILED_ANSWERS:
+                cache.put(key, answer)
+            for i in pending[key]:
+                answer_by_question[i] = answer
+        
+        return [
+            {
+                "answer": answer_by_question[i],
+                "sources": [
+                    {
+                        "text": result["text"],
+                        "score": result["score"]
+                    }
+                    for result in results
+                ]
+            }
+            if results else {"answer": "No relevant content found", "sources": []}
+            for i, results in enumerate(all_results)
+        ]
+        
+    except Exception as e:
+        return [{"error": str(e)} for _ in questions]
+
+def q_and_a(text: List[str], filename: str, store_dir: Optional[str] = None) -> None:
+    """Index the document and answer questions from stdin.
+
+    store_dir: directory of a persistent store; documents indexed by earlier
+               runs are reused instead of being embedded again
+    """
     llm = SmallLanguageModel()
     
-    vector_store = VectorStore()
-    collection_name = f"doc_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    vector_store.create_collection(collection_name)
-    metadata = [{"chunk_id": i, "filename": filename} for i in range(len(text))]
-    vector_store.add_documents(text, metadata)
+    vector_store = VectorStore(hybrid=True, backend=ChromaBackend(path=store_dir))
+    vector_store.open_collection("documents")
+    vector_store.upsert_document(text, filename)
 
     while True:
         question = input("\nAsk a question (or 'quit' to exit): ")
@@ -0,0 +1,207 @@
+"""Lightweight instrumentation: timing spans, counters and peak memory.
+
+The loader, vector store, topic model and QA model record into the
+process-wide ``metrics`` instance:
+
+    with metrics.span("store.encode", texts=len(chunks)):
+        ...
+    metrics.count("store.chunks_encoded", len(chunks))
+
+Span timings and counters are always aggregated (a span costs about a
+microsecond). Individual spans are kept for the JSON trace only after
+start_trace(), and Python allocations are only measured after
+start_memory_tracing(), since tracemalloc slows allocation down
+noticeably. A nested span resets the allocation peak, so the peak of the
+enclosing span only covers what follows it.
+
+Exports: to_prometheus() in the Prometheus text format, write_trace() as
+a Chrome trace (open in chrome://tracing or Perfetto), and profile() to
+dump cProfile stats for a single run.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import collections
+import contextlib
+import cProfile
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+
+class _SpanStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.peak_alloc_bytes = 0
+
+
+class Metrics:
+    """Thread-safe registry of span timings, counters and trace events."""
+
+    def __init__(self, prefix: str = "pdf_parser", max_trace_events: int = 100000):
+        """
+        prefix: prefix of the exported Prometheus metric names
+        max_trace_events: spans kept for the trace; the oldest are dropped first
+        """
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._spans: Dict[str, _SpanStats] = collections.defaultdict(_SpanStats)
+        self._counters: Dict[str, float] = collections.defaultdict(float)
+        self._events = collections.deque(maxlen=max_trace_events)
+        self._tracing = False
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        """Time the enclosed block under ``name``; attributes go into the trace event."""
+        tracing_memory = tracemalloc.is_tracing()
+        if tracing_memory:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak_alloc = tracemalloc.get_traced_memory()[1] - before if tracing_memory else 0
+            with self._lock:
+                stats = self._spans[name]
+                stats.count += 1
+                stats.seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+                stats.peak_alloc_bytes = max(stats.peak_alloc_bytes, peak_alloc)
+                if self._tracing:
+                    args = dict(attributes)
+                    if tracing_memory:
+                        args["peak_alloc_bytes"] = peak_alloc
+                    self._events.append({
+                        "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                        "ts": round((start - self._origin) * 1e6, 1), "dur": round(elapsed * 1e6, 1),
+                        "args": args,
+                    })
+
+    def count(self, name: str, value: float = 1):
+        """Add ``value`` to the counter ``name``."""
+        with self._lock:
+            self._counters[name] += value
+
+    def start_trace(self):
+        """Keep every span from now on for write_trace()."""
+        self._tracing = True
+
+    def stop_trace(self):
+        self._tracing = False
+
+    def start_memory_tracing(self):
+        """Measure the peak Python allocation of every span (uses tracemalloc)."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop_memory_tracing(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self._events.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current aggregates as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "spans": {
+                    name: {
+                        "count": stats.count,
+                        "seconds": round(stats.seconds, 6),
+                        "max_seconds": round(stats.max_seconds, 6),
+                        "peak_alloc_bytes": stats.peak_alloc_bytes,
+                    }
+                    for name, stats in self._spans.items()
+                },
+                "counters": dict(self._counters),
+                "peak_rss_bytes": peak_rss_bytes(),
+            }
+
+    def _metric_name(self, name: str) -> str:
+        return f"{self.prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+
+    def to_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        span_metric = self._metric_name("span_seconds")
+        lines = [f"# TYPE {span_metric} summary"]
+        for name, stats in sorted(snapshot["spans"].items()):
+            lines.append(f'{span_metric}_count{{span="{name}"}} {stats["count"]}')
+            lines.append(f'{span_metric}_sum{{span="{name}"}} {stats["seconds"]}')
+        max_metric = self._metric_name("span_max_seconds")
+        lines.append(f"# TYPE {max_metric} gauge")
+        for name, stats in sorted(snapshot["spans"].items()):
+            lines.append(f'{max_metric}{{span="{name}"}} {stats["max_seconds"]}')
+        if tracemalloc.is_tracing():
+            alloc_metric = self._metric_name("span_peak_alloc_bytes")
+            lines.append(f"# TYPE {alloc_metric} gauge")
+            for name, stats in sorted(snapshot["spans"].items()):
+                lines.append(f'{alloc_metric}{{span="{name}"}} {stats["peak_alloc_bytes"]}')
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = self._metric_name(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value:g}")
+        if snapshot["peak_rss_bytes"] is not None:
+            rss_metric = self._metric_name("peak_rss_bytes")
+            lines.append(f"# TYPE {rss_metric} gauge")
+            lines.append(f"{rss_metric} {snapshot['peak_rss_bytes']}")
+        return "\n".join(lines) + "\n"
+
+    def trace_events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._events)
+
+    def write_trace(self, path: str):
+        """Write the recorded spans as a Chrome trace JSON file, with the aggregates as metadata."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": self.trace_events(), "otherData": self.snapshot()}, f)
+
+    @contextlib.contextmanager
+    def profile(self, path: Optional[str]):
+        """Run the enclosed block under cProfile and dump the stats to ``path``.
+
+        A None path disables profiling, so callers can pass an optional
+        command-line flag straight through. Inspect the output with
+        ``python -m pstats PATH`` or snakeviz.
+        """
+        if path is None:
+            yield
+            return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+            logger.info(f"Wrote profile to {path}")
+
+
+# The metrics shared by the loader, vector store, topic and QA model in this process
+metrics = Metrics()
@@ -0,0 +1,449 @@
+"""Asynchronous HTTP query service over a persistent vector store.
+
+Concurrent requests are collected into micro-batches: a batch is flushed
+when it reaches ``max_batch_size`` or when its oldest request has waited
+``max_wait`` seconds. Query embedding (search) and the QA pipeline batch
+independently, and both run on a bounded thread pool so the event loop
+never blocks on inference.
+
+Endpoints (JSON in, JSON out):
+    POST /search  {"query": str, "n_results": int, "filename": str, "page": int}
+    POST /ask     {"question": str, "n_results": int, "filename": str, "page": int}
+    GET  /stats   latency percentiles and batch sizes
+    GET  /metrics stage timings and counters in the Prometheus text format
+    GET  /health
+
+Usage:
+    python src/service.py --store STORE_DIR [--port 5000] [--max-batch-size 16] [--max-wait-ms 5]
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+from sml.answers import AnswerCache, dedupe_chunks
+from sml.inference import INFERENCE_MODES
+from sml.model import FAILED_ANSWERS, SmallLanguageModel
+from vector.backends import ChromaBackend, LocalBackend
+from vector.store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of ``values`` (q in 0..100), None when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class LatencyStats:
+    """Latencies and batch sizes over a sliding window of recent requests."""
+
+    def __init__(self, window: int = 10000):
+        self.latencies: Dict[str, collections.deque] = collections.defaultdict(
+            lambda: collections.deque(maxlen=window))
+        self.batch_sizes: Dict[str, collections.deque] = collections.defaultdict(
+            lambda: collections.deque(maxlen=window))
+        self.requests: Dict[str, int] = collections.Counter()
+        self.errors: Dict[str, int] = collections.Counter()
+
+    def record_request(self, endpoint: str, seconds: float, ok: bool = True):
+        self.requests[endpoint] += 1
+        if not ok:
+            self.errors[endpoint] += 1
+        self.latencies[endpoint].append(seconds)
+
+    def record_batch(self, name: str, size: int):
+        self.batch_sizes[name].append(size)
+
+    def as_dict(self) -> Dict[str, Any]:
+        def ms(value):
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "requests": {
+                endpoint: {
+                    "count": self.requests[endpoint],
+                    "errors": self.errors[endpoint],
+                    "p50_ms": ms(percentile(list(latencies), 50)),
+                    "p99_ms": ms(percentile(list(latencies), 99)),
+                }
+                for endpoint, latencies in self.latencies.items()
+            },
+            "batches": {
+                name: {
+                    "count": len(sizes),
+                    "mean_size": round(sum(sizes) / len(sizes), 2),
+                    "max_size": max(sizes),
+                }
+                for name, sizes in self.batch_sizes.items() if sizes
+            },
+        }
+
+
+class MicroBatcher:
+    """Collects concurrent submit() calls into batches for one blocking function.
+
+    ``fn`` takes a list of items and returns a list of results in the same
+    order; it runs on ``executor``, at most ``max_concurrency`` batches at a
+    time. While all slots are busy new items keep queueing, so batches grow
+    with load instead of the executor's queue.
+    """
+
+    def __init__(self, name: str, fn: Callable[[List[Any]], List[Any]], executor: ThreadPoolExecutor,
+                 max_batch_size: int = 16, max_wait: float = 0.005, max_concurrency: int = 1,
+                 stats: Optional[LatencyStats] = None):
+        """
+        name: label of the batch-size statistics
+        max_batch_size: flush as soon as this many items are waiting
+        max_wait: seconds the oldest item may wait for the batch to fill
+        max_concurrency: batches of this batcher running on the executor at once
+        """
+        self.name = name
+        self.fn = fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = stats
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._max_concurrency = max_concurrency
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._slots is None:  # Created lazily so it binds to the running loop
+            self._slots = asyncio.Semaphore(self._max_concurrency)
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            items = [item for item, _ in batch]
+            if self.stats is not None:
+                self.stats.record_batch(self.name, len(items))
+            try:
+                results = await loop.run_in_executor(self.executor, self.fn, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        for (_, future), result in zip(batch, results):
+            if not future.done():  # The client may have gone away
+                future.set_result(result)
+
+
+def _format_sources(results: List[Dict]) -> List[Dict[str, Any]]:
+    return [{"text": result["text"], "score": result["score"]} for result in results]
+
+
+class QueryService:
+    """Micro-batched search and question answering over a VectorStore."""
+
+    def __init__(self, store: VectorStore, llm: Optional[SmallLanguageModel] = None,
+                 n_results: int = 3, max_batch_size: int = 16, max_wait: float = 0.005,
+                 workers: int = 2, max_pending: int = 1024, answer_cache_size: int = 1024,
+                 max_results: int = 100):
+        """
+        store: vector store with an open collection
+        llm: question answering model; /ask is unavailable without one
+        n_results: default number of chunks per query
+        max_batch_size, max_wait: micro-batching limits of both batchers
+        workers: threads running inference; batches beyond this wait in line
+        max_pending: requests in progress before new ones are refused with 503
+        answer_cache_size: answers kept for repeated questions over the same chunks
+        max_results: largest n_results a request may ask for
+        """
+        self.store = store
+        self.llm = llm
+        self.n_results = n_results
+        self.max_pending = max_pending
+        self.max_results = max_results
+        self.stats = LatencyStats()
+        self.answer_cache = AnswerCache(answer_cache_size)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self.searcher = MicroBatcher("search", self._search_batch, self.executor,
+                                     max_batch_size, max_wait, max_concurrency=workers, stats=self.stats)
+        self.answerer = MicroBatcher("qa", self._answer_batch, self.executor,
+                                     max_batch_size, max_wait, max_concurrency=workers, stats=self.stats)
+        self._in_progress = 0
+        self._answering: Dict[Tuple, "asyncio.Future[str]"] = {}  # Cache key -> answer in progress
+
+    def _search_batch(self, requests: List[Tuple[str, int, Optional[str], Optional[int]]]) -> List[List[Dict]]:
+        """One search_many call per distinct filter, with the largest n_results of its requests."""
+        groups: Dict[Tuple[Optional[str], Optional[int]], List[int]] = collections.defaultdict(list)
+        for i, (_, _, filename, page) in enumerate(requests):
+            groups[(filename, page)].append(i)
+        results: List[List[Dict]] = [[] for _ in requests]
+        for (filename, page), members in groups.items():
+            n_results = max(requests[i][1] for i in members)
+            found = self.store.search_many([requests[i][0] for i in members], n_results=n_results,
+                                           filename=filename, page=page)
+            for i, hits in zip(members, found):
+                results[i] = hits[:requests[i][1]]
+        return results
+
+    def _answer_batch(self, pairs: List[Tuple[str, List[str]]]) -> List[str]:
+        """Answer (question, chunk texts) pairs; contexts are built here, off the event loop."""
+        return self.llm.answer_questions([question for question, _ in pairs],
+                                         [self.llm.build_context(question, texts) for question, texts in pairs])
+
+    async def search(self, query: str, n_results: Optional[int] = None,
+                     filename: Optional[str] = None, page: Optional[int] = None) -> List[Dict]:
+        return await self.searcher.submit((query, n_results or self.n_results, filename, page))
+
+    async def ask(self, question: str, n_results: Optional[int] = None,
+                  filename: Optional[str] = None, page: Optional[int] = None) -> Dict[str, Any]:
+        """Same result as main.ask_question, with retrieval and QA batched across requests."""
+        results = await self.search(question, n_results, filename, page)
+        if not results:
+            return {"answer": "No relevant content found", "sources": []}
+        chunks = dedupe_chunks(results)
+        key = AnswerCache.key(question, chunks, self.llm.cache_tag)
+        answer = self.answer_cache.get(key)
+        if answer is None:
+            task = self._answering.get(key)
+            if task is None:
+                # Identical questions arriving before the answer is cached share one QA call
+                task = asyncio.ensure_future(self.answerer.submit((question, [chunk["text"] for chunk in chunks])))
+                self._answering[key] = task
+                task.add_done_callback(lambda task, key=key: self._answered(key, task))
+            # shield: a client that goes away does not cancel the answer for the others
+            answer = await asyncio.shield(task)
+        return {"answer": answer, "sources": _format_sources(results)}
+
+    def _answered(self, key: Tuple, task: "asyncio.Future[str]"):
+        self._answering.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        if task.result() not in FAILED_ANSWERS:
+            self.answer_cache.put(key, task.result())
+
+    def _parse_query(self, path: str, body: bytes) -> Tuple[str, int, Optional[str], Optional[int]]:
+        """(text, n_results, filename, page) of a /search or /ask body.
+
+        Checked here, before the request joins a micro-batch, so one bad
+        request cannot fail the others batched with it.
+        """
+        request = json.loads(body or b"{}")
+        if not isinstance(request, dict):
+            raise ValueError("the body must be a JSON object")
+        field = "query" if path == "/search" else "question"
+        text = request[field]
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError(f"{field} must be a non-empty string")
+        n_results = request.get("n_results")
+        if n_results is None:
+            n_results = self.n_results
+        elif isinstance(n_results, bool) or not isinstance(n_results, int) or not 1 <= n_results <= self.max_results:
+            raise ValueError(f"n_results must be an integer from 1 to {self.max_results}")
+        filename = request.get("filename")
+        if filename is not None and not isinstance(filename, str):
+            raise ValueError("filename must be a string")
+        page = request.get("page")
+        if page is not None and (isinstance(page, bool) or not isinstance(page, int) or page < 0):
+            raise ValueError("page must be a non-negative integer")
+        return text, n_results, filename, page
+
+    async def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        """Route one request to (status, JSON-serializable payload or plain text)."""
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/stats":
+            return 200, dict(self.stats.as_dict(), answer_cache=dict(self.answer_cache.stats,
+                                                                     size=len(self.answer_cache)))
+        if path == "/metrics":
+            return 200, metrics.to_prometheus()
+        if path not in ("/search", "/ask"):
+            return 404, {"error": f"Unknown path {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        try:
+            text, n_results, filename, page = self._parse_query(path, body)
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": f"Invalid request: {e}"}
+        if path == "/ask" and self.llm is None:
+            return 503, {"error": "No question answering model loaded"}
+        if self._in_progress >= self.max_pending:
+            return 503, {"error": "Too many requests in progress"}
+        self._in_progress += 1
+        try:
+            if path == "/search":
+                results = await self.search(text, n_results, filename, page)
+                return 200, {"results": _format_sources(results)}
+            return 200, await self.ask(text, n_results, filename, page)
+        except Exception as e:
+            logger.exception(f"Error handling {path}: {e}")
+            return 500, {"error": str(e)}
+        finally:
+            self._in_progress -= 1
+
+    async def serve(self, host: str = "0.0.0.0", port: int = 5000) -> asyncio.AbstractServer:
+        """Start listening; the returned server runs until closed."""
+        server = await asyncio.start_server(self._connection, host, port)
+        logger.info(f"Serving on {host}:{port}")
+        return server
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Minimal HTTP/1.1 with keep-alive, enough for JSON clients and load tests."""
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                start = time.perf_counter()
+                if body is None:
+                    status, payload = 413, {"error": "Request body too large"}
+                else:
+                    status, payload = await self.handle(method, path, body)
+                if path in ("/search", "/ask"):
+                    self.stats.record_request(path, time.perf_counter() - start, ok=status == 200)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except _BadRequest as e:
+            writer.write(_response(400, {"error": f"Bad request: {e}"}, keep_alive=False))
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            logger.exception("Error serving connection")
+        finally:
+            writer.close()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class _BadRequest(ValueError):
+    """A request that cannot be parsed; answered with 400 and the connection closed."""
+
+
+async def _read_request(reader: asyncio.StreamReader, max_body: int = 1 << 20):
+    """(method, path, headers, body) of the next request, or None at end of stream.
+
+    body is None when it exceeds ``max_body`` bytes. Raises _BadRequest for
+    a malformed request line or Content-Length.
+    """
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise _BadRequest("malformed request line")
+    method, path, _ = parts
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise _BadRequest("invalid Content-Length") from None
+    if length < 0:
+        raise _BadRequest("invalid Content-Length")
+    if length > max_body:
+        return method, path.split("?", 1)[0], {"connection": "close"}, None
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?", 1)[0], headers, body
+
+
+def _response(status: int, payload: Any, keep_alive: bool = True) -> bytes:
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+        content_type = "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        content_type = "application/json; charset=utf-8"
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve search and question answering over HTTP.")
+    parser.add_argument("--store", required=True, help="directory of the persistent store")
+    parser.add_argument("--backend", choices=["chroma", "local"], default="chroma")
+    parser.add_argument("--collection", default="documents")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--no-qa", action="store_true", help="serve /search only")
+    parser.add_argument("--answer-cache-size", type=int, default=1024, help="0 disables the answer cache")
+    parser.add_argument("--inference", choices=INFERENCE_MODES, default="torch",
+                        help="CPU inference mode of both models (falls back to torch)")
+    parser.add_argument("--onnx-dir", help="keep the ONNX exports here (qa/ and embedding/) across restarts")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    backend = LocalBackend(args.store) if args.backend == "local" else ChromaBackend(path=args.store)
+    store = VectorStore(hybrid=True, backend=backend, inference=args.inference,
+                        onnx_path=args.onnx_dir and os.path.join(args.onnx_dir, "embedding"))
+    store.open_collection(args.collection)
+    store.embedding_model  # Load the models now rather than on the first request
+    llm = None
+    if not args.no_qa:
+        llm = SmallLanguageModel(inference=args.inference,
+                                 onnx_path=args.onnx_dir and os.path.join(args.onnx_dir, "qa"))
+        llm.qa_pipeline
+
+    service = QueryService(store, llm, max_batch_size=args.max_batch_size,
+                           max_wait=args.max_wait_ms / 1000, workers=args.workers,
+                           answer_cache_size=args.answer_cache_size)
+
+    async def run():
+        server = await service.serve(args.host, args.port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
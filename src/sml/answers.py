@@ -0,0 +1,91 @@
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import collections
+import hashlib
+import threading
+
+from metrics import metrics
+
+
+def normalize_question(question: str) -> str:
+    """Lowercased question with collapsed whitespace and no surrounding punctuation."""
+    return " ".join(question.lower().split()).strip(" ?!.,;:")
+
+
+def dedupe_chunks(results: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Search results without duplicate chunks or chunks contained in another one.
+
+    Rank order is kept; a chunk that contains higher-ranked chunks takes the
+    place of the first of them. Texts are compared case-insensitively with
+    whitespace collapsed.
+    """
+    kept: List[Tuple[str, Dict[str, Any]]] = []
+    for result in results:
+        text = " ".join(result["text"].lower().split())
+        if not text or any(text in other for other, _ in kept):
+            continue
+        contained = [i for i, (other, _) in enumerate(kept) if other in text]
+        if contained:
+            kept[contained[0]] = (text, result)
+            kept = [item for i, item in enumerate(kept) if i not in contained[1:]]
+        else:
+            kept.append((text, result))
+    return [result for _, result in kept]
+
+
+class AnswerCache:
+    """Thread-safe LRU cache of QA answers.
+
+    Answers are keyed by (normalized question, ordered ids and text hashes of
+    the context chunks, model), so a repeated question over the same
+    retrieved chunks skips the transformer. The text hash keeps a reused id
+    (such as the default "chunk_<i>" of a re-created collection) from
+    serving the answer of its old text.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """
+        max_size: number of answers kept; the least recently used are dropped
+        """
+        self.max_size = max_size
+        self.stats = {"hits": 0, "misses": 0}
+        self._answers: "collections.OrderedDict[Hashable, str]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(question: str, results: Sequence[Dict[str, Any]],
+            model: str) -> Tuple[str, Tuple[Tuple[str, str], ...], str]:
+        return (normalize_question(question),
+                tuple((result.get("id", ""),
+                       hashlib.blake2b(result["text"].encode('utf-8'), digest_size=8).hexdigest())
+                      for result in results),
+                model)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            answer = self._answers.get(key)
+            if answer is not None:
+                self._answers.move_to_end(key)
+            self.stats["hits" if answer is not None else "misses"] += 1
+        metrics.count("answer_cache.hits" if answer is not None else "answer_cache.misses")
+        return answer
+
+    def put(self, key: Hashable, answer: str):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._answers[key] = answer
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.max_size:
+                self._answers.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._answers.clear()
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+
+# Process-wide cache used by main.ask_question / ask_questions
+answer_cache = AnswerCache()
@@ -0,0 +1,89 @@
+"""Optional optimized CPU inference for the QA and embedding models.
+
+Modes, selectable per SmallLanguageModel / VectorStore instance:
+
+    torch  the fp32 PyTorch model (default)
+    int8   PyTorch with dynamic int8 quantization of every nn.Linear;
+           weights shrink about 4x and matrix multiplications use int8 kernels
+    onnx   an ONNX Runtime graph; either a local export (onnx_path, a
+           directory or a single .onnx file such as an int8-quantized
+           export) or one exported from the PyTorch weights on first load
+
+int8 and onnx run on CPU only. When a mode cannot be used (missing
+optimum / onnxruntime, no CPU quantization engine, a GPU device) the model
+is loaded with plain PyTorch and a warning is logged.
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import logging
+import os
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_MODES = ("torch", "int8", "onnx")
+
+
+def check_inference(inference: str):
+    if inference not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode {inference!r}; use one of {INFERENCE_MODES}")
+
+
+def quantize_int8(model):
+    """Dynamically quantize the nn.Linear layers of a PyTorch model to int8 (a new model)."""
+    import torch
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+ONNX_SUBFOLDER = "onnx"  # Where sentence-transformers' save_pretrained puts the graph
+
+
+def _onnx_file(directory: str) -> Optional[str]:
+    """Path of the ONNX graph in an export directory, relative to it: top level or onnx/."""
+    for folder in ("", ONNX_SUBFOLDER):
+        path = os.path.join(directory, folder)
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if name.endswith(".onnx"))
+            if names:
+                return os.path.join(folder, names[0]) if folder else names[0]
+    return None
+
+
+def onnx_location(onnx_path: str) -> Tuple[str, Dict[str, Any]]:
+    """(directory, extra from_pretrained kwargs) of a local ONNX export directory or .onnx file."""
+    if onnx_path.endswith(".onnx"):
+        return os.path.dirname(onnx_path) or ".", {"file_name": os.path.basename(onnx_path)}
+    name = _onnx_file(onnx_path)
+    if name and os.path.dirname(name):
+        return onnx_path, {"subfolder": os.path.dirname(name), "file_name": os.path.basename(name)}
+    return onnx_path, {}
+
+
+def has_onnx_export(onnx_path: Optional[str]) -> bool:
+    if not onnx_path:
+        return False
+    if onnx_path.endswith(".onnx"):
+        return os.path.isfile(onnx_path)
+    return _onnx_file(onnx_path) is not None
+
+
+def load_with_fallback(kind: str, inference: str, cpu: bool,
+                       load_optimized: Callable[[], Any], load_torch: Callable[[], Any]) -> Tuple[Any, str]:
+    """Load with ``load_optimized`` for int8/onnx, falling back to ``load_torch``.
+
+    Returns (model, mode actually used).
+    """
+    check_inference(inference)
+    if inference == "torch":
+        return load_torch(), "torch"
+    try:
+        if not cpu:
+            raise ValueError("only supported on CPU")
+        return load_optimized(), inference
+    except Exception as e:
+        logger.warning(f"{kind}: {inference} inference unavailable ({e}); falling back to PyTorch")
+        metrics.count(f"{kind}.inference_fallbacks")
+        return load_torch(), "torch"
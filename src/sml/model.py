@@ -1,58 +1,218 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 import logging
 
-from transformers import pipeline, AutoTokenizer, AutoModelForQuestionAnswering
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from metrics import metrics
+from sml.inference import check_inference, has_onnx_export, load_with_fallback, onnx_location, quantize_int8
+from sml.registry import ModelRegistry, registry as default_registry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Answers returned when the model could not answer; these are never cached
+FAILED_ANSWERS = ("Model not loaded", "Unable to answer question")
+
+
+
+def _load_qa_model(model_path: str, device: int, inference: str = "torch",
+                   onnx_path: Optional[str] = None) -> Tuple[Any, Any, Any]:
+    """Load (model, tokenizer, pipeline) for the model registry.
+
+    transformers is imported here so that importing this module stays cheap.
+    The model's ``inference_mode`` attribute records the mode actually used
+    (see sml.inference).
+    """
+    from transformers import pipeline, AutoTokenizer, AutoModelForQuestionAnswering
+
+    def load_torch():
+        return AutoModelForQuestionAnswering.from_pretrained(model_path)
+
+    def load_optimized():
+        if inference == "int8":
+            return quantize_int8(load_torch())
+        from optimum.onnxruntime import ORTModelForQuestionAnswering
+        if has_onnx_export(onnx_path):
+            directory, kwargs = onnx_location(onnx_path)
+            return ORTModelForQuestionAnswering.from_pretrained(directory, **kwargs)
+        model = ORTModelForQuestionAnswering.from_pretrained(model_path, export=True)
+        if onnx_path:  # Export once, reuse on the next start
+            model.save_pretrained(onnx_path)
+        return model
+
+    model, mode = load_with_fallback("qa", inference, device == -1, load_optimized, load_torch)
+    model.inference_mode = mode
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    # Build the pipeline from the loaded objects so the weights are read only once
+    qa_pipeline = pipeline(
+        "question-answering",
+        model=model,
+        tokenizer=tokenizer,
+        device=device
+    )
+    return model, tokenizer, qa_pipeline
+
+
 class SmallLanguageModel:
-    """Wrapper for small language models optimized for limited resources"""
+    """Wrapper for small language models optimized for limited resources.
+
+    The model is loaded on first use through the process-wide model registry
+    and shared by every instance with the same model_path and device; pass
+    lazy=False to load it immediately and call close() to give it back.
+
+    inference selects "torch", "int8" (dynamic quantization) or "onnx"
+    (ONNX Runtime, from onnx_path when it holds an export) on CPU; see
+    sml.inference. Unavailable modes fall back to PyTorch.
+
+    build_context() trims a context to max_seq_len tokens together with the
+    question, so the pipeline answers from one window instead of several
+    strided ones.
+    """
     
-    def __init__(self, model_path: str = "deepset/xlm-roberta-base-squad2"):
+    def __init__(self, model_path: str = "deepset/xlm-roberta-base-squad2", batch_size: int = 8,
+                 lazy: bool = True, device: int = -1, registry: Optional[ModelRegistry] = None,
+                 inference: str = "torch", onnx_path: Optional[str] = None, max_seq_len: int = 384):
+        check_inference(inference)
         self.model_path = model_path
+        self.batch_size = batch_size
+        self.device = device  # -1 = CPU
+        self.inference = inference
+        self.onnx_path = onnx_path
+        self.max_seq_len = max_seq_len  # Window of the pipeline and budget of build_context()
+        self.registry = registry or default_registry
         self.tokenizer = None
         self.model = None
-        self.qa_pipeline = None
-        self.load_model()
+        self._qa_pipeline = None
+        self._handle = None
+        self._load_failed = False
+        if not lazy:
+            self.load_model()
+
+    @classmethod
+    def registry_key(cls, model_path: str, device: int = -1, inference: str = "torch") -> Tuple[str, str, int, str]:
+        return ("qa", model_path, device, inference)
+
+    @classmethod
+    def preload(cls, model_path: str = "deepset/xlm-roberta-base-squad2", device: int = -1,
+                registry: Optional[ModelRegistry] = None, inference: str = "torch",
+                onnx_path: Optional[str] = None):
+        """Load the model in this (parent) process so forked workers share it"""
+        (registry or default_registry).preload(
+            cls.registry_key(model_path, device, inference),
+            lambda: _load_qa_model(model_path, device, inference, onnx_path)
+        )
+
+    @property
+    def inference_used(self) -> str:
+        """The inference mode of the loaded model, after any fallback"""
+        return getattr(self.model, "inference_mode", self.inference)
+
+    @property
+    def cache_tag(self) -> str:
+        """Identifies the answers of this model in an AnswerCache"""
+        return f"{self.model_path}:{self.inference}:{self.max_seq_len}"
+
+    @property
+    def qa_pipeline(self):
+        """The question-answering pipeline, loaded on first access"""
+        if self._qa_pipeline is None and not self._load_failed:
+            self.load_model()
+        return self._qa_pipeline
+
+    @qa_pipeline.setter
+    def qa_pipeline(self, value):
+        self._qa_pipeline = value
     
     def load_model(self):
         """Load the best available small Hungarian language model"""
+        if self._qa_pipeline is not None:
+            return
         try:
             logger.info(f"Loading multilingual QA model from {self.model_path}")
 
             # Use a multilingual QA model that supports Hungarian (small and efficient)
-            self.qa_pipeline = pipeline(
-                "question-answering",
-                model=self.model_path,
-                tokenizer=self.model_path,
-                device=-1  # Use CPU
-            )
-
-            self.model = AutoModelForQuestionAnswering.from_pretrained(self.model_path)
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            with metrics.span("qa.load_model", model=self.model_path, inference=self.inference):
+                self._handle = self.registry.acquire(
+                    self.registry_key(self.model_path, self.device, self.inference),
+                    lambda: _load_qa_model(self.model_path, self.device, self.inference, self.onnx_path)
+                )
+            self.model, self.tokenizer, self._qa_pipeline = self._handle.value
 
             logger.info("Multilingual (including Hungarian) QA model loaded successfully")
         except Exception as e:
+            self._load_failed = True
             logger.error(f"Error loading models: {e}")
+
+    def close(self):
+        """Release this instance's reference to the shared model"""
+        if self._handle is not None:
+            self._handle.release()
+            self._handle = None
+        self.model = self.tokenizer = self._qa_pipeline = None
     
+    def build_context(self, question: str, texts: List[str]) -> str:
+        """Join the texts, cut where question + context exceed max_seq_len tokens.
+
+        The joined text is tokenized once, so tokens spanning the joins are
+        counted as the QA pipeline will count them.
+
+        Needs a fast tokenizer for the token offsets; without a loaded
+        tokenizer the texts are joined as they are.
+        """
+        if not self.qa_pipeline or self.tokenizer is None:
+            return " ".join(texts)
+        tokenizer = self.tokenizer
+        budget = (min(tokenizer.model_max_length, self.max_seq_len)
+                  - tokenizer.num_special_tokens_to_add(pair=True)
+                  - len(tokenizer(question, add_special_tokens=False)["input_ids"]))
+        context = " ".join(texts)
+        offsets = tokenizer(context, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        if len(offsets) <= budget:
+            return context
+        metrics.count("qa.contexts_trimmed")
+        return context[:offsets[budget - 1][1]] if budget > 0 else ""
+
     def answer_question(self, question: str, context: str) -> str:
         """Answer a question based on provided context"""
         try:
             if not self.qa_pipeline:
                 return "Model not loaded"
                      
-            result = self.qa_pipeline(question, context)
-            print(f"Question: {question}, Result: {result}")
+            with metrics.span("qa.answer", questions=1):
+                result = self.qa_pipeline(question=question, context=context, max_seq_len=self.max_seq_len)
+            metrics.count("qa.questions")
+            metrics.count("qa.context_chars", len(context))
+            logger.debug(f"Question: {question}, Result: {result}")
             return result.get('answer', 'No answer found')
         except Exception as e:
             logger.error(f"Error answering question: {e}")
             return "Unable to answer question"
     
+    def answer_questions(self, questions: List[str], contexts: List[str],
+                         batch_size: Optional[int] = None) -> List[str]:
+        """Answer (question, context) pairs with one batched pipeline call"""
+        if not questions:
+            return []
+        try:
+            if not self.qa_pipeline:
+                return ["Model not loaded"] * len(questions)
+
+            with metrics.span("qa.answer", questions=len(questions)):
+                results = self.qa_pipeline(
+                    question=questions,
+                    context=contexts,
+                    batch_size=batch_size or self.batch_size,
+                    max_seq_len=self.max_seq_len
+                )
+            metrics.count("qa.questions", len(questions))
+            metrics.count("qa.context_chars", sum(len(context) for context in contexts))
+            if isinstance(results, dict):  # The pipeline unwraps single results
+                results = [results]
+            return [result.get('answer', 'No answer found') for result in results]
+        except Exception as e:
+            logger.error(f"Error answering questions: {e}")
+            return ["Unable to answer question"] * len(questions)
+    
     def generate_quiz_questions(self, content: str, num_questions: int = 5) -> List[Dict]:
         """Generate quiz questions from content"""
         quiz_questions = []
@@ -0,0 +1,230 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import contextlib
+import gc
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _param_bytes(value: Any) -> int:
+    """Bytes held by the parameters of any torch modules in ``value``."""
+    objects = value if isinstance(value, (tuple, list)) else [value]
+    seen = set()
+    total = 0
+    for obj in objects:
+        parameters = getattr(obj, "parameters", None)
+        if not callable(parameters):
+            continue
+        try:
+            for param in parameters():
+                if id(param) not in seen:
+                    seen.add(id(param))
+                    total += param.numel() * param.element_size()
+        except Exception:
+            continue
+    return total
+
+
+class _Entry:
+    def __init__(self, value: Any, rss_bytes: Optional[int], param_bytes: int):
+        self.value = value
+        self.refcount = 0
+        self.pinned = False
+        self.last_used = time.monotonic()
+        self.rss_bytes = rss_bytes
+        self.param_bytes = param_bytes
+
+
+class ModelHandle:
+    """A reference to a shared model; release() it when done."""
+
+    def __init__(self, registry: "ModelRegistry", key: Hashable, value: Any):
+        self._registry = registry
+        self.key = key
+        self.value = value
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.value = None
+            self._registry._release(self.key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class ModelRegistry:
+    """Process-wide registry of loaded models shared between workers.
+
+    Models are keyed by (kind, model path, device) and loaded once; every
+    acquire() returns a handle to the same object and increments its
+    reference count. A model nobody holds is unloaded after ``idle_timeout``
+    seconds (None keeps it loaded until unload() is called).
+
+    For forked workers, preload() the models in the parent before forking:
+    the children inherit the weights copy-on-write and acquire() returns
+    them without loading again.
+    """
+
+    def __init__(self, idle_timeout: Optional[float] = None, sweep_interval: float = 30.0):
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._janitor = None
+        self._janitor_pid = None
+
+    def acquire(self, key: Hashable, loader: Callable[[], Any]) -> ModelHandle:
+        """Return a handle to the model for ``key``, calling ``loader`` only on first use."""
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refcount += 1
+                    entry.last_used = time.monotonic()
+            if entry is None:
+                rss_before = _rss_bytes()
+                start = time.perf_counter()
+                value = loader()
+                rss_after = _rss_bytes()
+                rss = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+                entry = _Entry(value, rss, _param_bytes(value))
+                logger.info(f"Loaded {key} in {time.perf_counter() - start:.1f}s")
+                with self._lock:
+                    entry.refcount += 1
+                    self._entries[key] = entry
+        self._ensure_janitor()
+        return ModelHandle(self, key, entry.value)
+
+    @contextlib.contextmanager
+    def _key_lock(self, key: Hashable):
+        """Hold the lock of one key; only loads and unloads of the same key wait for each other.
+
+        A key's lock is dropped when its model is unloaded, so a thread that
+        got a lock which was dropped meanwhile retries with the current one.
+        """
+        while True:
+            with self._lock:
+                key_lock = self._key_locks.setdefault(key, threading.Lock())
+            with key_lock:
+                with self._lock:
+                    current = self._key_locks.get(key) is key_lock
+                if current:
+                    yield
+                    return
+
+    def _drop(self, key: Hashable, idle_before: Optional[float] = None) -> bool:
+        """Remove an entry under its key lock; with idle_before, only if it is still idle."""
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None or (idle_before is not None and (
+                        entry.refcount or entry.pinned or entry.last_used > idle_before)):
+                    return False
+                del self._entries[key]
+                self._key_locks.pop(key, None)
+                return True
+
+    def _release(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refcount = max(0, entry.refcount - 1)
+            entry.last_used = time.monotonic()
+
+    def preload(self, key: Hashable, loader: Callable[[], Any], freeze: bool = True):
+        """Load and pin a model so it is never unloaded as idle.
+
+        freeze: move all objects allocated so far out of the garbage
+                collector's reach (gc.freeze), so forked children do not
+                touch, and thereby copy, the pages holding them
+        """
+        handle = self.acquire(key, loader)
+        with self._lock:
+            self._entries[key].pinned = True
+        handle.release()
+        if freeze and hasattr(gc, "freeze"):
+            gc.collect()
+            gc.freeze()
+
+    def sweep(self, now: Optional[float] = None) -> List[Hashable]:
+        """Unload models that nobody has held for longer than idle_timeout."""
+        if self.idle_timeout is None:
+            return []
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            candidates = [key for key, entry in self._entries.items()
+                          if entry.refcount == 0 and not entry.pinned
+                          and now - entry.last_used >= self.idle_timeout]
+        # Re-checked under the key lock: an acquire() may have taken the model since
+        idle = [key for key in candidates if self._drop(key, idle_before=now - self.idle_timeout)]
+        for key in idle:
+            logger.info(f"Unloaded idle model {key}")
+        if idle:
+            gc.collect()
+        return idle
+
+    def unload(self, key: Hashable) -> bool:
+        """Drop the registry's reference to a model regardless of its handles."""
+        removed = self._drop(key)
+        if removed:
+            gc.collect()
+        return removed
+
+    def memory(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model memory: RSS growth while loading, parameter bytes, and handle count."""
+        with self._lock:
+            return {
+                str(key): {
+                    "rss_bytes": entry.rss_bytes,
+                    "param_bytes": entry.param_bytes,
+                    "refcount": entry.refcount,
+                    "pinned": entry.pinned,
+                }
+                for key, entry in self._entries.items()
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def _ensure_janitor(self):
+        """Start the background sweeper (once per process) when idle_timeout is set."""
+        if self.idle_timeout is None:
+            return
+        with self._lock:
+            # Threads do not survive fork, so a child starts its own
+            if self._janitor is not None and self._janitor_pid == os.getpid():
+                return
+            self._janitor = threading.Thread(target=self._sweep_forever, daemon=True,
+                                             name="model-registry-janitor")
+            self._janitor_pid = os.getpid()
+        self._janitor.start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            self.sweep()
+
+
+# The registry shared by SmallLanguageModel and VectorStore in this process
+registry = ModelRegistry()
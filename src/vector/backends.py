@@ -0,0 +1,416 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the subset of Chroma's ``where`` syntax used by VectorStore.
+
+    Supports ``{"key": value}``, ``{"key": {"$eq"|"$ne"|"$in"|"$nin": ...}}``
+    and ``{"$and"|"$or": [...]}``.
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+                if op not in ("$eq", "$ne", "$in", "$nin"):
+                    raise ValueError(f"Unsupported where operator {op}")
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class ChromaBackend:
+    """VectorStore backend on a ChromaDB client.
+
+    path: directory of a persistent client; None keeps the collections in memory
+    """
+
+    def __init__(self, client=None, path: Optional[str] = None):
+        self._client = client
+        self.path = path
+
+    @property
+    def client(self):
+        """The ChromaDB client, created on first access"""
+        if self._client is None:
+            import chromadb
+            if self.path:
+                self._client = chromadb.PersistentClient(path=self.path)
+            else:
+                self._client = chromadb.Client()
+        return self._client
+
+    def create_collection(self, name: str):
+        """Create a new collection, deleting any existing one with the same name."""
+        try:
+            self.client.delete_collection(name)
+        except Exception:
+            pass
+        return self.client.create_collection(name=name, metadata={"hnsw:space": "cosine"})
+
+    def get_collection(self, name: str):
+        return self.client.get_collection(name=name)
+
+    def get_or_create_collection(self, name: str):
+        return self.client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+
+
+class LocalBackend:
+    """VectorStore backend keeping int8-quantized embeddings in memory-mapped files.
+
+    Each collection is a directory under ``directory``. Any number of reader
+    processes can open it with get_collection(); they map the same files, so
+    there is no load step and the vectors stay off the Python heap.
+    """
+
+    def __init__(self, directory: str, block_rows: int = 65536):
+        self.directory = directory
+        self.block_rows = block_rows
+        os.makedirs(directory, exist_ok=True)
+
+    def create_collection(self, name: str) -> "MmapCollection":
+        """Create an empty collection, deleting any existing one with the same name."""
+        path = os.path.join(self.directory, name)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        return MmapCollection(path, self.block_rows)
+
+    def get_collection(self, name: str) -> "MmapCollection":
+        path = os.path.join(self.directory, name)
+        if not os.path.isdir(path):
+            raise ValueError(f"Collection {name} does not exist")
+        return MmapCollection(path, self.block_rows)
+
+    def get_or_create_collection(self, name: str) -> "MmapCollection":
+        path = os.path.join(self.directory, name)
+        os.makedirs(path, exist_ok=True)
+        return MmapCollection(path, self.block_rows)
+
+
+# Metadata keys kept as per-row columns of MmapCollection, after the row id
+COLUMN_KEYS = ("doc_id", "filename", "page")
+
+_MISSING = 0
+
+
+def value_hash(value: Any) -> int:
+    """64-bit hash of a JSON-serializable value, never 0 (0 marks a missing key)."""
+    digest = hashlib.blake2b(json.dumps(value, ensure_ascii=False).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True) or 1
+
+
+def quantize_int8(embeddings: np.ndarray):
+    """Normalize rows to unit length and quantize them symmetrically to int8.
+
+    Returns (codes, scales) with ``row ~= codes * scale``.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = embeddings / np.maximum(norms, 1e-12)
+    scales = np.maximum(np.abs(unit).max(axis=1), 1e-12) / 127.0
+    codes = np.clip(np.rint(unit / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class MmapCollection:
+    """A collection of int8 vectors with the add/query/count API of a Chroma collection.
+
+    Files: ``vectors.i8`` (rows of int8 codes), ``scales.f32`` (one float32
+    per row), ``docs.jsonl`` (id, document, metadata per row),
+    ``offsets.i64`` (byte offset of each row in docs.jsonl) and
+    ``columns.i64`` (hashes of the id and of the COLUMN_KEYS metadata per
+    row, see value_hash). Rows are appended, and a row becomes visible to
+    readers once its vector is written, which happens last. Deleted rows
+    are listed in ``deleted.i64`` and skipped by get() and query().
+
+    Filters on ids and COLUMN_KEYS are numpy masks over the mapped columns;
+    other metadata keys are matched by reading the rows' metadata.
+    Queries may run from several threads; remapping is serialized by a lock.
+    """
+
+    def __init__(self, path: str, block_rows: int = 65536):
+        self.path = path
+        self.block_rows = block_rows
+        self._meta_path = os.path.join(path, "meta.json")
+        self._vectors_path = os.path.join(path, "vectors.i8")
+        self._scales_path = os.path.join(path, "scales.f32")
+        self._docs_path = os.path.join(path, "docs.jsonl")
+        self._offsets_path = os.path.join(path, "offsets.i64")
+        self._columns_path = os.path.join(path, "columns.i64")
+        self._deleted_path = os.path.join(path, "deleted.i64")
+        self.dim = None
+        self._mapped_size = -1
+        self._vectors = None
+        self._scales = None
+        self._offsets = None
+        self._columns = None
+        self._deleted_size = -1
+        self._alive = None
+        self._lock = threading.Lock()
+        self._load_meta()
+
+    def _load_meta(self):
+        if self.dim is None and os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.dim = json.load(f)["dim"]
+
+    def count(self) -> int:
+        self._load_meta()  # A reader may open the collection before the first add
+        if self.dim is None or not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // self.dim
+
+    def add(self, embeddings: Sequence[Sequence[float]], documents: Sequence[str],
+            metadatas: Optional[Sequence[Dict[str, Any]]] = None, ids: Optional[Sequence[str]] = None):
+        """Append rows; ids, documents, metadatas and embeddings must have the same length."""
+        metadatas = metadatas if metadatas is not None else [{} for _ in documents]
+        if ids is None:
+            raise ValueError("ids are required")
+        if not len(ids) == len(documents) == len(metadatas) == len(embeddings):
+            raise ValueError(f"Got {len(ids)} ids, {len(documents)} documents, {len(metadatas)} "
+                             f"metadatas and {len(embeddings)} embeddings")
+        if not len(ids):
+            return
+        codes, scales = quantize_int8(np.asarray(embeddings, dtype=np.float32))
+        if self.dim is None:
+            self.dim = codes.shape[1]
+            with open(self._meta_path, 'w') as f:
+                json.dump({"dim": self.dim}, f)
+        elif codes.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {codes.shape[1]} does not match {self.dim}")
+
+        self._truncate_uncommitted()
+
+        offsets = np.empty(len(documents), dtype=np.int64)
+        columns = np.array([[value_hash(doc_id)] + [value_hash(metadata[key]) if key in metadata else _MISSING
+                                                    for key in COLUMN_KEYS]
+                            for doc_id, metadata in zip(ids, metadatas)], dtype=np.int64)
+        with open(self._docs_path, 'ab') as f:
+            for i, (doc_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+                offsets[i] = f.tell()
+                line = json.dumps({"id": doc_id, "document": document, "metadata": metadata},
+                                  ensure_ascii=False)
+                f.write(line.encode('utf-8') + b"\n")
+        with open(self._offsets_path, 'ab') as f:
+            f.write(offsets.tobytes())
+        with open(self._columns_path, 'ab') as f:
+            f.write(columns.tobytes())
+        with open(self._scales_path, 'ab') as f:
+            f.write(scales.tobytes())
+        with open(self._vectors_path, 'ab') as f:
+            f.write(codes.tobytes())
+
+    def _truncate_uncommitted(self):
+        """Cut every file back to the rows whose vector was written.
+
+        A crash in add() can leave documents, offsets, columns and scales of
+        rows without a vector; appending after them would pair every later
+        row with the orphaned record.
+        """
+        n_rows = self.count()
+        sizes = {
+            self._vectors_path: n_rows * self.dim,
+            self._scales_path: n_rows * 4,
+            self._offsets_path: n_rows * 8,
+            self._columns_path: n_rows * 8 * (1 + len(COLUMN_KEYS)),
+            self._docs_path: self._docs_end(n_rows),
+        }
+        for path, size in sizes.items():
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                logger.warning(f"Dropping an incomplete append from {path}")
+                os.truncate(path, size)
+
+    def _docs_end(self, n_rows: int) -> int:
+        """Byte length of the first ``n_rows`` lines of docs.jsonl."""
+        if n_rows == 0:
+            return 0
+        offsets = np.fromfile(self._offsets_path, dtype=np.int64, count=n_rows + 1)
+        if len(offsets) > n_rows:
+            return int(offsets[n_rows])
+        with open(self._docs_path, 'rb') as f:
+            f.seek(int(offsets[n_rows - 1]))
+            return int(offsets[n_rows - 1]) + len(f.readline())
+
+    def _refresh(self) -> int:
+        """(Re)map the files if rows were appended since the last query."""
+        with self._lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> int:
+        n_rows = self.count()
+        if n_rows != self._mapped_size:
+            if n_rows:
+                self._vectors = np.memmap(self._vectors_path, dtype=np.int8, mode='r',
+                                          shape=(n_rows, self.dim))
+                self._scales = np.memmap(self._scales_path, dtype=np.float32, mode='r',
+                                         shape=(n_rows,))
+                self._offsets = np.memmap(self._offsets_path, dtype=np.int64, mode='r',
+                                          shape=(n_rows,))
+                self._columns = np.memmap(self._columns_path, dtype=np.int64, mode='r',
+                                          shape=(n_rows, 1 + len(COLUMN_KEYS)))
+            self._mapped_size = n_rows
+        deleted_size = os.path.getsize(self._deleted_path) if os.path.exists(self._deleted_path) else 0
+        if self._alive is None or len(self._alive) != n_rows or deleted_size != self._deleted_size:
+            self._deleted_size = deleted_size
+            alive = np.ones(n_rows, dtype=bool)
+            if deleted_size:
+                deleted = np.fromfile(self._deleted_path, dtype=np.int64)
+                alive[deleted[deleted < n_rows]] = False
+            self._alive = alive  # Swapped in whole so concurrent readers never see a partial mask
+        return n_rows
+
+    def _column_mask(self, column: int, condition: Any, n_rows: int) -> np.ndarray:
+        values = self._columns[:n_rows, column]
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        mask = np.ones(n_rows, dtype=bool)
+        for op, operand in condition.items():
+            if op in ("$eq", "$ne"):
+                matched = values == value_hash(operand)
+            elif op in ("$in", "$nin"):
+                matched = np.isin(values, np.array([value_hash(value) for value in operand], dtype=np.int64))
+            else:
+                raise ValueError(f"Unsupported where operator {op}")
+            mask &= ~matched if op in ("$ne", "$nin") else matched
+        return mask
+
+    def _metadata_mask(self, where: Dict[str, Any], candidates: np.ndarray) -> np.ndarray:
+        """Match keys without a column by reading the metadata of the candidate rows."""
+        mask = np.zeros(len(candidates), dtype=bool)
+        rows = np.flatnonzero(candidates)
+        for row, record in zip(rows, self._read_rows(rows)):
+            mask[row] = matches_where(record["metadata"], where)
+        return mask
+
+    def _where_mask(self, where: Dict[str, Any], candidates: np.ndarray) -> np.ndarray:
+        mask = candidates.copy()
+        slow = {}
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._where_mask(clause, mask)
+            elif key == "$or":
+                matched = np.zeros(len(mask), dtype=bool)
+                for clause in condition:
+                    matched |= self._where_mask(clause, mask & ~matched)
+                mask &= matched
+            elif key in COLUMN_KEYS:
+                mask &= self._column_mask(1 + COLUMN_KEYS.index(key), condition, len(mask))
+            else:
+                slow[key] = condition
+        if slow:  # Last, so that only rows passing the column filters are read
+            mask &= self._metadata_mask(slow, mask)
+        return mask
+
+    def _matching_rows(self, where: Optional[Dict[str, Any]] = None,
+                       ids: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Mask of live rows matching ``where`` and ``ids``."""
+        n_rows = self._refresh()
+        mask = self._alive[:n_rows].copy() if n_rows else np.zeros(0, dtype=bool)
+        if n_rows and ids is not None:
+            mask &= self._column_mask(0, {"$in": list(ids)}, n_rows)
+        if n_rows and where:
+            mask = self._where_mask(where, mask)
+        return mask
+
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, include: Sequence[str] = ("documents", "metadatas")) -> Dict[str, List]:
+        """Live rows matching ``ids``/``where``, in the result layout of Chroma's get()."""
+        rows = np.flatnonzero(self._matching_rows(where, ids))
+        if limit is not None:
+            rows = rows[:limit]
+        records = self._read_rows(rows)
+        return {
+            "ids": [record["id"] for record in records],
+            "documents": [record["document"] for record in records],
+            "metadatas": [record["metadata"] for record in records],
+        }
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """Mark the rows matching ``ids``/``where`` as deleted."""
+        if ids is None and not where:
+            return
+        rows = np.flatnonzero(self._matching_rows(where, ids)).astype(np.int64)
+        if len(rows):
+            with open(self._deleted_path, 'ab') as f:
+                f.write(rows.tobytes())
+
+    def _read_rows(self, rows: Sequence[int]) -> List[Dict[str, Any]]:
+        records = []
+        if len(rows) == 0:
+            return records
+        with open(self._docs_path, 'rb') as f:
+            for row in rows:
+                f.seek(int(self._offsets[row]))
+                records.append(json.loads(f.readline()))
+        return records
+
+    def top_k(self, query_embeddings: np.ndarray, n_results: int,
+              where: Optional[Dict[str, Any]] = None):
+        """Return (rows, similarities) arrays of shape (queries, k), best first."""
+        mask = self._matching_rows(where)
+        n_rows = len(mask)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        k = min(n_results, int(mask.sum()))
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_sims = np.zeros((len(queries), 0), dtype=np.float32)
+        if k == 0:
+            return best_rows, best_sims
+        for start in range(0, n_rows, self.block_rows):
+            stop = min(start + self.block_rows, n_rows)
+            block = np.asarray(self._vectors[start:stop], dtype=np.float32)
+            sims = (queries @ block.T) * self._scales[start:stop]
+            sims[:, ~mask[start:stop]] = -np.inf
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, stop), sims.shape)], axis=1)
+            sims = np.concatenate([best_sims, sims], axis=1)
+            if sims.shape[1] > k:
+                keep = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                rows = np.take_along_axis(rows, keep, axis=1)
+                sims = np.take_along_axis(sims, keep, axis=1)
+            best_rows, best_sims = rows, sims
+        order = np.argsort(-best_sims, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_sims, order, axis=1)
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Sequence[str] = ("documents", "metadatas", "distances")) -> Dict[str, List]:
+        """Nearest rows by cosine similarity, in the result layout of Chroma's query().
+
+        All fields are returned whatever ``include`` lists.
+        """
+        rows, sims = self.top_k(np.asarray(query_embeddings, dtype=np.float32), n_results, where)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query_rows, query_sims in zip(rows, sims):
+            records = self._read_rows(query_rows)
+            results["ids"].append([record["id"] for record in records])
+            results["documents"].append([record["document"] for record in records])
+            results["metadatas"].append([record["metadata"] for record in records])
+            results["distances"].append([1.0 - float(sim) for sim in query_sims])
+        return results
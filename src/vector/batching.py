@@ -0,0 +1,56 @@
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def length_buckets(lengths: Sequence[int], batch_size: int,
+                   max_tokens: Optional[int] = None) -> List[np.ndarray]:
+    """Group item indices into batches of similar length.
+
+    Items are sorted by length and cut into consecutive batches of at most
+    ``batch_size`` items. With ``max_tokens`` a batch is also closed once its
+    padded size (items * longest item) would exceed that budget, so batches
+    of long texts get fewer items.
+    """
+    if batch_size < 1:
+        raise ValueError("Batch size must be at least 1")
+    order = np.argsort(np.asarray(lengths), kind="stable")
+    buckets = []
+    current = []
+    longest = 0
+    for idx in order:
+        length = lengths[idx]
+        full = len(current) >= batch_size
+        over_budget = max_tokens and max(longest, length) * (len(current) + 1) > max_tokens
+        if current and (full or over_budget):
+            buckets.append(np.array(current))
+            current = []
+            longest = 0
+        current.append(idx)
+        longest = max(longest, length)
+    if current:
+        buckets.append(np.array(current))
+    return buckets
+
+
+def iter_encoded_buckets(texts: List[str], encode: Callable[[List[str]], np.ndarray],
+                         lengths: Sequence[int], batch_size: int,
+                         max_tokens: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Encode ``texts`` bucket by bucket, yielding (indices, float32 vectors)."""
+    for bucket in length_buckets(lengths, batch_size, max_tokens):
+        vectors = np.asarray(encode([texts[i] for i in bucket]), dtype=np.float32)
+        yield bucket, vectors
+
+
+def encode_bucketed(texts: List[str], encode: Callable[[List[str]], np.ndarray],
+                    lengths: Sequence[int], batch_size: int,
+                    max_tokens: Optional[int] = None) -> np.ndarray:
+    """Encode ``texts`` in length buckets into one array in the original order."""
+    out = None
+    for bucket, vectors in iter_encoded_buckets(texts, encode, lengths, batch_size, max_tokens):
+        if out is None:
+            out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+        out[bucket] = vectors
+    if out is None:
+        return np.empty((0, 0), dtype=np.float32)
+    return out
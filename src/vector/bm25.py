@@ -0,0 +1,175 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import re
+import threading
+
+import numpy as np
+
+TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; keeps accented letters and numbers such as years."""
+    return TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """In-process inverted index with BM25 scoring.
+
+    Postings are kept in flat NumPy arrays in CSR layout: the postings of
+    term ``t`` are ``doc_ids[offsets[t]:offsets[t + 1]]`` with matching term
+    frequencies in ``tfs``. Documents added since the last search are
+    buffered and merged into the arrays on the next search. Removed
+    documents stay in the arrays but are left out of the document count,
+    document frequencies and average length.
+
+    Safe to search from several threads: adds, removes and the merges
+    triggered by a search are serialized by a lock.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.float32)
+        self._pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._pending_lengths: List[int] = []
+        self._removed = set()  # Positions of removed or replaced documents
+        self._positions: Dict[str, int] = {}
+        self._live = np.zeros(0, dtype=bool)  # Per merged position, rebuilt when documents change
+        self._live_dirty = True
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def remove(self, ids: Sequence[str]):
+        """Stop returning the documents with the given ids."""
+        with self._lock:
+            for doc_id in ids:
+                position = self._positions.pop(doc_id, None)
+                if position is not None:
+                    self._removed.add(position)
+                    self._live_dirty = True
+
+    def add(self, ids: Sequence[str], texts: Sequence[str],
+            metadatas: Optional[Sequence[Dict[str, Any]]] = None):
+        """Index documents under the given ids."""
+        with self._lock:
+            metadatas = metadatas if metadatas is not None else [{} for _ in ids]
+            self.remove(ids)  # Re-adding an id replaces the document
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                doc = len(self.ids)
+                self._positions[doc_id] = doc
+                self.ids.append(doc_id)
+                self.texts.append(text)
+                self.metadatas.append(metadata)
+                tokens = tokenize(text)
+                self._pending_lengths.append(len(tokens))
+                if not tokens:
+                    continue
+                term_ids = np.fromiter(
+                    (self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tokens),
+                    dtype=np.int64, count=len(tokens)
+                )
+                terms, counts = np.unique(term_ids, return_counts=True)
+                self._pending.append((terms, np.full(len(terms), doc, dtype=np.int32),
+                                      counts.astype(np.float32)))
+
+    def _merge(self):
+        """Fold buffered documents into the CSR posting arrays."""
+        if not self._pending_lengths:
+            return
+        n_terms = len(self.vocabulary)
+        old_terms = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        terms = np.concatenate([old_terms] + [p[0] for p in self._pending])
+        doc_ids = np.concatenate([self.doc_ids] + [p[1] for p in self._pending])
+        tfs = np.concatenate([self.tfs] + [p[2] for p in self._pending])
+        order = np.argsort(terms, kind="stable")
+        self.doc_ids = doc_ids[order]
+        self.tfs = tfs[order]
+        self.offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=n_terms), out=self.offsets[1:])
+        self.doc_lengths = np.concatenate([
+            self.doc_lengths, np.asarray(self._pending_lengths, dtype=np.float32)
+        ])
+        self._pending = []
+        self._pending_lengths = []
+        self._live_dirty = True
+
+    def _update_live(self):
+        """Recompute the live-document mask, count and average length after adds and removes."""
+        if not self._live_dirty:
+            return
+        self._live = np.ones(len(self.ids), dtype=bool)
+        if self._removed:
+            self._live[list(self._removed)] = False
+        self._n_live = int(self._live.sum())
+        lengths = self.doc_lengths[self._live]
+        self._avg_length = max(float(lengths.mean()), 1e-9) if len(lengths) else 1e-9
+        self._live_dirty = False
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for ``query``."""
+        with self._lock:
+            self._merge()
+            self._update_live()
+            scores = np.zeros(len(self.ids), dtype=np.float32)
+            n_docs = self._n_live
+            if n_docs == 0:
+                return scores
+            norms = self.k1 * (1 - self.b + self.b * self.doc_lengths / self._avg_length)
+            for term in set(tokenize(query)):
+                term_id = self.vocabulary.get(term)
+                if term_id is None:
+                    continue
+                start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+                docs = self.doc_ids[start:stop]
+                tfs = self.tfs[start:stop]
+                live = self._live[docs]
+                docs, tfs = docs[live], tfs[live]
+                if len(docs) == 0:
+                    continue
+                idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                # A term occurs once per posting list, so docs has no duplicates
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norms[docs])
+            return scores
+
+    def search(self, query: str, n_results: int = 5,
+               where: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Tuple[int, float]]:
+        """Top documents as (position, score), best first; documents scoring 0 are skipped.
+
+        where: optional predicate on a document's metadata
+        """
+        scores = self.scores(query)
+        if where is not None:
+            matching = np.flatnonzero(scores)
+            matching = matching[np.argsort(-scores[matching], kind="stable")]
+            hits = []
+            for i in matching:
+                if where(self.metadatas[i]):
+                    hits.append((int(i), float(scores[i])))
+                    if len(hits) == n_results:
+                        break
+            return hits
+        n_results = min(n_results, int(np.count_nonzero(scores)))
+        if n_results == 0:
+            return []
+        top = np.argpartition(-scores, n_results - 1)[:n_results]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)), best first."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,219 @@
+from typing import Dict, List, Optional, Tuple
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import unicodedata
+
+import numpy as np
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    """Hash of the NFC-normalized, whitespace-collapsed text."""
+    normalized = re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent embedding cache for one embedding model.
+
+    Vectors are kept in a float32 ``.npy`` matrix, and a JSON index maps the
+    hash of each normalized chunk text to its row. New vectors are appended
+    to a log (``.log.f32`` rows and ``.log.txt`` "hash<TAB>dim" lines), so
+    each encode call writes only its new rows; the log is folded into the
+    matrix by compact() once it is as large as the matrix, and on save() /
+    close(). All files are named after the model, so caches of different
+    models can share a directory.
+    """
+
+    def __init__(self, directory: str, model_name: str, min_compact_rows: int = 4096):
+        """
+        directory: where the cache files are kept
+        model_name: embedding model the vectors belong to
+        min_compact_rows: logged rows that never trigger a compaction on their own
+        """
+        self.directory = directory
+        self.model_name = model_name
+        self.min_compact_rows = min_compact_rows
+        self.stats = {"hits": 0, "misses": 0}
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.vectors_path = os.path.join(directory, f"{name}.npy")
+        self.index_path = os.path.join(directory, f"{name}.json")
+        self.log_vectors_path = os.path.join(directory, f"{name}.log.f32")
+        self.log_index_path = os.path.join(directory, f"{name}.log.txt")
+        self.index: Dict[str, int] = {}
+        self.vectors: Optional[np.ndarray] = None
+        self._pending: List[np.ndarray] = []
+        self._compacted_rows = 0  # Rows held by the .npy matrix; later rows are in the log
+        self.load()
+
+    def load(self):
+        """Load the matrix, index and log written by a previous run, if any."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            vectors = np.load(self.vectors_path)
+        except FileNotFoundError:
+            index, vectors = {}, None
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable embedding cache {self.index_path}: {e}")
+            index, vectors = {}, None
+        if index and max(index.values()) >= len(vectors):
+            logger.warning(f"Embedding cache index {self.index_path} does not match its vectors")
+            index, vectors = {}, None
+        self.index = index
+        self.vectors = vectors.astype(np.float32, copy=False) if vectors is not None else None
+        self._compacted_rows = len(index)
+        self._load_log()
+
+    def _load_log(self):
+        """Replay logged rows and cut the log back to them.
+
+        A crash can leave a vector without its hash line or a torn last
+        line; both files are truncated to the complete rows, so the next
+        append lines up each hash with its own vector again.
+        """
+        try:
+            with open(self.log_index_path, 'rb') as f:
+                raw_lines = f.read().split(b"\n")[:-1]  # The part after the last newline is torn
+        except FileNotFoundError:
+            raw_lines = []
+        try:
+            data = np.fromfile(self.log_vectors_path, dtype=np.float32)
+        except FileNotFoundError:
+            data = np.empty(0, dtype=np.float32)
+        lines = [line.decode('utf-8').split("\t") for line in raw_lines]
+        dim = int(lines[0][1]) if lines else 0
+        if dim and self.vectors is not None and self.vectors.shape[1] != dim:
+            logger.warning(f"Ignoring embedding cache log {self.log_index_path} of another dimension")
+            lines = []
+        n_rows = min(len(lines), len(data) // dim) if dim else 0
+        if n_rows:
+            rows = data[:n_rows * dim].reshape(n_rows, dim)
+            self.add([key for key, _ in lines[:n_rows]], rows)
+        self._truncate_log(sum(len(line) + 1 for line in raw_lines[:n_rows]), n_rows * dim * 4)
+
+    def _truncate_log(self, index_bytes: int, vector_bytes: int):
+        for path, size in ((self.log_index_path, index_bytes), (self.log_vectors_path, vector_bytes)):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _matrix(self) -> Optional[np.ndarray]:
+        if self._pending:
+            parts = ([self.vectors] if self.vectors is not None else []) + self._pending
+            self.vectors = np.concatenate(parts).astype(np.float32, copy=False)
+            self._pending = []
+        return self.vectors
+
+    def lookup(self, texts: List[str]) -> Tuple[List[str], Dict[int, np.ndarray], List[int]]:
+        """Return (hashes, cached vectors by position, positions to encode)."""
+        hashes = [text_hash(text) for text in texts]
+        matrix = self._matrix()
+        found = {}
+        missing = []
+        for i, key in enumerate(hashes):
+            row = self.index.get(key)
+            if row is None:
+                missing.append(i)
+            else:
+                found[i] = matrix[row]
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(missing)
+        metrics.count("embedding_cache.hits", len(found))
+        metrics.count("embedding_cache.misses", len(missing))
+        return hashes, found, missing
+
+    def add(self, hashes: List[str], vectors: np.ndarray):
+        """Append vectors for the given text hashes; call save() to persist."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        new_rows = []
+        next_row = len(self.index)
+        for key, vector in zip(hashes, vectors):
+            if key in self.index:
+                continue
+            self.index[key] = next_row
+            next_row += 1
+            new_rows.append(vector)
+        if new_rows:
+            self._pending.append(np.stack(new_rows))
+
+    def append_log(self, hashes: List[str], vectors: np.ndarray):
+        """Persist rows added since the last write by appending them to the log.
+
+        The vectors are written before their hashes, so a crash never leaves
+        a hash without its vector; an orphaned vector is cut off by the next
+        load().
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with open(self.log_vectors_path, 'ab') as f:
+            f.write(vectors.tobytes())
+        with open(self.log_index_path, 'a', encoding='utf-8') as f:
+            f.write("".join(f"{key}\t{vectors.shape[1]}\n" for key in hashes))
+        logged = len(self.index) - self._compacted_rows
+        if logged >= max(self.min_compact_rows, self._compacted_rows):
+            self.compact()
+
+    def compact(self):
+        """Atomically write the matrix and index with every row, then clear the log."""
+        matrix = self._matrix()
+        if matrix is None or len(self.index) == self._compacted_rows:
+            return
+        self._replace(self.vectors_path, lambda f: np.save(f, matrix), 'wb')
+        self._replace(self.index_path, lambda f: json.dump(self.index, f), 'w')
+        for path in (self.log_index_path, self.log_vectors_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._compacted_rows = len(self.index)
+
+    def save(self):
+        """Write everything to the matrix and index (see compact())."""
+        self.compact()
+
+    def close(self):
+        self.compact()
+
+    def _replace(self, path: str, write, mode: str):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def encode(self, texts: List[str], encoder) -> np.ndarray:
+        """Embed ``texts``, calling ``encoder`` only for texts not in the cache."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        hashes, found, missing = self.lookup(texts)
+        encoded = None
+        if missing:
+            first: Dict[str, int] = {}  # Repeated texts are encoded once
+            for i in missing:
+                first.setdefault(hashes[i], i)
+            keys = list(first)
+            row_of = {key: row for row, key in enumerate(keys)}
+            encoded = np.asarray(encoder([texts[i] for i in first.values()]), dtype=np.float32)
+            self.add(keys, encoded)
+            self.append_log(keys, encoded)
+        dim = encoded.shape[1] if encoded is not None else self.vectors.shape[1]
+        embeddings = np.empty((len(texts), dim), dtype=np.float32)
+        for i, vector in found.items():
+            embeddings[i] = vector
+        if missing:
+            embeddings[missing] = encoded[[row_of[hashes[i]] for i in missing]]
+        logger.info(f"Embedding cache ({self.model_name}): "
+                    f"{len(found)} hits, {len(missing)} misses")
+        return embeddings
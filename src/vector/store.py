@@ -1,68 +1,436 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+import hashlib
+import os
+
+import numpy as np
+
+from file.cache import file_hash
+from file.loader import batched
+from metrics import metrics
+from sml.inference import check_inference, has_onnx_export, load_with_fallback, onnx_location, quantize_int8
+from sml.registry import ModelRegistry, registry as default_registry
+
+from vector.backends import ChromaBackend, matches_where
+from vector.bm25 import BM25Index, reciprocal_rank_fusion
+from vector.batching import encode_bucketed, iter_encoded_buckets
+from vector.cache import EmbeddingCache
+
+def document_id(filename: str, chunks: Optional[List[str]] = None) -> str:
+    """Stable id of a document: the hash of the file, or of its chunks if the file is gone."""
+    if os.path.exists(filename):
+        return file_hash(filename)
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in chunks or []:
+        digest.update(chunk.encode('utf-8') + b"\0")
+    return digest.hexdigest()
+
+
+def _where(filename: Optional[str] = None, page: Optional[int] = None,
+           where: Optional[Dict] = None) -> Optional[Dict]:
+    """Build a Chroma ``where`` filter from the search arguments."""
+    clauses = [where] if where else []
+    if filename is not None:
+        clauses.append({"filename": filename})
+    if page is not None:
+        clauses.append({"page": page})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _load_embedding_model(model_name: str, device: Optional[str], inference: str = "torch",
+                          onnx_path: Optional[str] = None):
+    """Load a SentenceTransformer for the model registry.
+
+    sentence_transformers is imported here so that importing this module stays cheap.
+    The model's ``inference_mode`` attribute records the mode actually used.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    def load_optimized():
+        if inference == "int8":
+            return quantize_int8(SentenceTransformer(model_name, device="cpu"))
+        if has_onnx_export(onnx_path):
+            directory, kwargs = onnx_location(onnx_path)
+            return SentenceTransformer(directory, device="cpu", backend="onnx", model_kwargs=kwargs)
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        if onnx_path:  # Export once, reuse on the next start
+            model.save_pretrained(onnx_path)
+        return model
+
+    model, mode = load_with_fallback(
+        "store", inference, device in (None, "cpu"), load_optimized,
+        lambda: SentenceTransformer(model_name, device=device)
+    )
+    model.inference_mode = mode
+    return model
 
-from sentence_transformers import SentenceTransformer
-import chromadb
 
 class VectorStore:
     """Handles document embeddings and similarity search"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        # Use a lightweight sentence transformer model
-        self.embedding_model = SentenceTransformer(model_name)
-        self.client = chromadb.Client()
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", cache_dir: Optional[str] = None,
+                 batch_size: int = 32, max_batch_tokens: Optional[int] = None,
+                 num_threads: Optional[int] = None, device: Optional[str] = None,
+                 registry: Optional[ModelRegistry] = None, hybrid: bool = False,
+                 rrf_k: int = 60, backend=None, inference: str = "torch",
+                 onnx_path: Optional[str] = None):
+        """
+        model_name: sentence transformer used for embeddings
+        cache_dir: directory of a persistent embedding cache; unchanged chunks
+                   reuse their stored vectors instead of being re-encoded
+        batch_size: maximum number of chunks per encode call; chunks are
+                    sorted by token length so each batch pads little
+        max_batch_tokens: optional cap on padded tokens (chunks * longest) per batch
+        num_threads: torch CPU threads used for encoding (None = torch default)
+        device: torch device of the embedding model (None = auto)
+        registry: model registry sharing loaded models (default: process-wide)
+        hybrid: also keep a BM25 keyword index and fuse its ranking with the
+                dense ranking (reciprocal rank fusion), so exact names and
+                dates are found
+        rrf_k: rank offset of reciprocal rank fusion
+        backend: where embeddings are stored and searched; any object whose
+                 create_collection(name)/get_collection(name) return
+                 collections with Chroma's add/query/count API
+                 (default: in-memory ChromaBackend, see also LocalBackend)
+        inference: "torch", "int8" or "onnx" CPU inference of the embedding
+                   model, falling back to torch (see sml.inference)
+        onnx_path: local ONNX export (directory or .onnx file) for "onnx";
+                   exported there on first load when missing
+        """
+        check_inference(inference)
+        # Use a lightweight sentence transformer model, loaded on first use
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.num_threads = num_threads
+        self.device = device
+        self.inference = inference
+        self.onnx_path = onnx_path
+        self.registry = registry or default_registry
+        self._embedding_model = None
+        self._handle = None
+        self.cache_dir = cache_dir
+        self._embedding_cache = None
+        self.backend = backend or ChromaBackend()
         self.collection = None
-    
+        self.hybrid = hybrid
+        self.rrf_k = rrf_k
+        self.keyword_index = BM25Index() if hybrid else None
+
+    @classmethod
+    def registry_key(cls, model_name: str, device: Optional[str] = None,
+                     inference: str = "torch") -> Tuple[str, str, Optional[str], str]:
+        return ("embedding", model_name, device, inference)
+
+    @classmethod
+    def preload(cls, model_name: str = "all-MiniLM-L6-v2", device: Optional[str] = None,
+                registry: Optional[ModelRegistry] = None, inference: str = "torch",
+                onnx_path: Optional[str] = None):
+        """Load the embedding model in this (parent) process so forked workers share it"""
+        (registry or default_registry).preload(
+            cls.registry_key(model_name, device, inference),
+            lambda: _load_embedding_model(model_name, device, inference, onnx_path)
+        )
+
+    @property
+    def embedding_model(self):
+        """The shared SentenceTransformer, loaded on first access"""
+        if self._embedding_model is None:
+            self._handle = self.registry.acquire(
+                self.registry_key(self.model_name, self.device, self.inference),
+                lambda: _load_embedding_model(self.model_name, self.device, self.inference, self.onnx_path)
+            )
+            self._embedding_model = self._handle.value
+        return self._embedding_model
+
+    @embedding_model.setter
+    def embedding_model(self, value):
+        self._embedding_model = value
+
+    @property
+    def embedding_cache(self) -> Optional[EmbeddingCache]:
+        """The persistent embedding cache, opened on first access (None without cache_dir).
+
+        Quantized vectors differ slightly, so they are cached under the
+        inference mode actually used; for int8 / onnx that loads the model
+        first, since it may have fallen back to torch.
+        """
+        if self._embedding_cache is None and self.cache_dir:
+            mode = self.inference
+            if mode != "torch":
+                mode = getattr(self.embedding_model, "inference_mode", mode)
+            cache_model = self.model_name if mode == "torch" else f"{self.model_name}-{mode}"
+            self._embedding_cache = EmbeddingCache(self.cache_dir, cache_model)
+        return self._embedding_cache
+
+    def close(self):
+        """Release the shared embedding model and compact the embedding cache"""
+        if self._handle is not None:
+            self._handle.release()
+            self._handle = None
+        self._embedding_model = None
+        if self._embedding_cache is not None:
+            self._embedding_cache.close()
+            self._embedding_cache = None
+
     def create_collection(self, collection_name: str):
-        """Create a new ChromaDB collection.
+        """Create a new collection in the backend.
 
         Any existing collection with the same name is deleted first.
         """
-        try:
-            self.collection = self.client.delete_collection(collection_name)
-        except:
-            pass
-        self.collection = self.client.create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
+        self.collection = self.backend.create_collection(collection_name)
+        if self.hybrid:
+            self.keyword_index = BM25Index()
+
+    def open_collection(self, collection_name: str):
+        """Open a collection, creating it if needed, and keep its contents.
+
+        With a persistent backend this reopens a warm store without
+        re-embedding; in hybrid mode the keyword index is rebuilt from the
+        stored chunk texts.
+        """
+        self.collection = self.backend.get_or_create_collection(collection_name)
+        if self.hybrid:
+            self.keyword_index = BM25Index()
+            stored = self.collection.get(include=["documents", "metadatas"])
+            self.keyword_index.add(stored["ids"], stored["documents"], stored["metadatas"])
+
+    def has_document(self, doc_id: str) -> bool:
+        """Whether chunks of the document are stored in the collection."""
+        if not self.collection:
+            return False
+        return bool(self.collection.get(where={"doc_id": doc_id}, limit=1, include=[])["ids"])
+
+    def upsert_document(self, chunks: List[str], filename: str, pages: Optional[List[int]] = None,
+                        doc_id: Optional[str] = None, force: bool = False,
+                        embeddings: Optional[np.ndarray] = None) -> int:
+        """Store the chunks of one document under stable ids.
+
+        Chunk ids are ``<doc_id>:<chunk offset>``, where doc_id defaults to the
+        content hash of the file, so documents never collide. A document that
+        is already stored is skipped unless force is set, in which case its old
+        chunks are replaced. Chunks of an earlier version of the file (same
+        filename, other doc_id) are removed. pages: page index of each chunk,
+        stored for filtering.
+        embeddings: precomputed chunk embeddings, see add_documents().
+        Returns the number of chunks written.
+        """
+        if not self.collection:
+            raise ValueError("Collection not created")
+        doc_id = doc_id or document_id(filename, chunks)
+        self._delete_where({"$and": [{"filename": filename}, {"doc_id": {"$ne": doc_id}}]})
+        if self.has_document(doc_id):
+            if not force:
+                return 0
+            self.delete_document(doc_id)
+        metadata = []
+        for i in range(len(chunks)):
+            meta = {"chunk_id": i, "doc_id": doc_id, "filename": filename}
+            if pages is not None:
+                meta["page"] = pages[i]
+            metadata.append(meta)
+        self.add_documents(chunks, metadata, ids=[f"{doc_id}:{i}" for i in range(len(chunks))],
+                           embeddings=embeddings)
+        return len(chunks)
+
+    def delete_document(self, doc_id: Optional[str] = None, filename: Optional[str] = None):
+        """Remove every chunk of a document, by id or by filename."""
+        if not self.collection:
+            raise ValueError("Collection not created")
+        if doc_id is None and filename is None:
+            raise ValueError("Pass doc_id or filename")
+        self._delete_where({"doc_id": doc_id} if doc_id is not None else {"filename": filename})
+
+    def _delete_where(self, where: Dict):
+        ids = self.collection.get(where=where, include=[])["ids"]
+        if not ids:
+            return
+        if self.keyword_index is not None:
+            self.keyword_index.remove(ids)
+        self.collection.delete(ids=ids)
     
-    def add_documents(self, chunks: List[str], metadata: List[Dict] = None):
-        """Add document chunks to vector store"""
+    def add_documents(self, chunks: List[str], metadata: List[Dict] = None, start: int = 0,
+                      ids: Optional[List[str]] = None, embeddings: Optional[np.ndarray] = None):
+        """Add document chunks to vector store.
+
+        Chunks are written to the collection batch by batch as they are encoded.
+        start: index of the first chunk, used for ids when adding in batches
+        ids: explicit chunk ids (default ``chunk_<index>``)
+        embeddings: precomputed embeddings, one row per chunk; skips encoding
+        """
         if not self.collection:
             raise ValueError("Collection not created")
         
-        embeddings = self.embedding_model.encode(chunks)
-        
         if metadata is None:
-            metadata = [{"chunk_id": i} for i in range(len(chunks))]
+            metadata = [{"chunk_id": i} for i in range(start, start + len(chunks))]
+        if ids is None:
+            ids = [f"chunk_{i}" for i in range(start, start + len(chunks))]
         
-        self.collection.add(
-            embeddings=embeddings.tolist(),
-            documents=chunks,
-            metadatas=metadata,
-            ids=[f"chunk_{i}" for i in range(len(chunks))]
-        )
+        if embeddings is not None:
+            batches = ((np.arange(i, min(i + self.batch_size, len(chunks))), embeddings[i:i + self.batch_size])
+                       for i in range(0, len(chunks), self.batch_size))
+        else:
+            batches = self.encode_batches(chunks)
+        for batch, batch_embeddings in batches:
+            with metrics.span("store.collection_add", chunks=len(batch)):
+                self.collection.add(
+                    embeddings=np.asarray(batch_embeddings).tolist(),
+                    documents=[chunks[i] for i in batch],
+                    metadatas=[metadata[i] for i in batch],
+                    ids=[ids[i] for i in batch]
+                )
+        metrics.count("store.chunks_added", len(chunks))
+        if self.keyword_index is not None:
+            with metrics.span("store.bm25_add"):
+                self.keyword_index.add(ids, chunks, metadata)
+
+    def token_lengths(self, chunks: List[str]) -> List[int]:
+        """Token count of each chunk, falling back to whitespace words."""
+        tokenizer = getattr(self.embedding_model, "tokenizer", None)
+        if tokenizer is None:
+            return [len(chunk.split()) for chunk in chunks]
+        return [len(ids) for ids in tokenizer(chunks, add_special_tokens=False)["input_ids"]]
+
+    def _encode_model(self, chunks: List[str]) -> np.ndarray:
+        with metrics.span("store.encode_model", texts=len(chunks)):
+            embeddings = self.embedding_model.encode(chunks, batch_size=len(chunks), convert_to_numpy=True)
+        metrics.count("store.texts_encoded", len(chunks))
+        return embeddings
+
+    def _token_lengths(self, chunks: List[str]) -> List[int]:
+        lengths = self.token_lengths(chunks)
+        metrics.count("store.tokens", sum(lengths))
+        return lengths
+
+    def _set_threads(self):
+        if self.num_threads:
+            import torch
+            torch.set_num_threads(self.num_threads)
+
+    def encode_uncached(self, chunks: List[str]) -> np.ndarray:
+        """Embed chunks in length-sorted buckets into one array in input order."""
+        self._set_threads()
+        return encode_bucketed(chunks, self._encode_model, self._token_lengths(chunks),
+                               self.batch_size, self.max_batch_tokens)
+
+    def encode(self, chunks: List[str]) -> np.ndarray:
+        """Embed chunks, reusing cached vectors when an embedding cache is set."""
+        with metrics.span("store.encode", texts=len(chunks)):
+            if not self.cache_dir:
+                return self.encode_uncached(chunks)
+            return self.embedding_cache.encode(chunks, self.encode_uncached)
+
+    def encode_batches(self, chunks: List[str]) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (chunk indices, embeddings) batches ready to be written to the collection."""
+        if self.cache_dir:
+            embeddings = self.encode(chunks)
+            for i in range(0, len(chunks), self.batch_size):
+                yield np.arange(i, min(i + self.batch_size, len(chunks))), embeddings[i:i + self.batch_size]
+            return
+        self._set_threads()
+        yield from iter_encoded_buckets(chunks, self._encode_model, self._token_lengths(chunks),
+                                        self.batch_size, self.max_batch_tokens)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Embedding cache hit/miss counts (empty without a cache)."""
+        return dict(self._embedding_cache.stats) if self._embedding_cache else {}
+
+    def add_document_stream(self, chunks: Iterable[str], metadata: Optional[Dict] = None,
+                            batch_size: int = 256) -> int:
+        """Add chunks from an iterator in batches of ``batch_size``.
+
+        metadata: extra fields stored with every chunk next to its chunk_id
+        Returns the number of chunks added.
+        """
+        added = 0
+        for batch in batched(chunks, batch_size):
+            batch_metadata = [
+                {"chunk_id": i, **(metadata or {})}
+                for i in range(added, added + len(batch))
+            ]
+            self.add_documents(batch, batch_metadata, start=added)
+            added += len(batch)
+        return added
     
-    def search(self, query: str, n_results: int = 5) -> List[Dict]:
+    def search(self, query: str, n_results: int = 5, filename: Optional[str] = None,
+               page: Optional[int] = None, where: Optional[Dict] = None) -> List[Dict]:
         """Search for relevant document chunks"""
         if not self.collection:
             return []
+        return self.search_many([query], n_results=n_results, filename=filename,
+                                page=page, where=where)[0]
+
+    def search_many(self, queries: List[str], n_results: int = 5, filename: Optional[str] = None,
+                    page: Optional[int] = None, where: Optional[Dict] = None) -> List[List[Dict]]:
+        """Search for several queries with one encode and one collection query.
+
+        filename, page: only return chunks of this file / page index
+        where: any other Chroma metadata filter, combined with the above
+        In hybrid mode each query also runs against the BM25 index; both
+        rankings are fused and "score" is the reciprocal rank fusion score.
+        """
+        if not self.collection or not queries:
+            return [[] for _ in queries]
+        with metrics.span("store.search", queries=len(queries)):
+            return self._search_many(queries, n_results, _where(filename, page, where))
+
+    def _search_many(self, queries: List[str], n_results: int, where: Optional[Dict]) -> List[List[Dict]]:
+        metrics.count("store.queries", len(queries))
+        n_dense = max(n_results * 4, 20) if self.keyword_index is not None else n_results
+        with metrics.span("store.encode_query", texts=len(queries)):
+            query_embeddings = self.embedding_model.encode(queries)
+        query_args = {"where": where} if where else {}
+        with metrics.span("store.collection_query", n_results=n_dense):
+            results = self.collection.query(
+                query_embeddings=query_embeddings.tolist(),
+                n_results=n_dense,
+                **query_args
+            )
         
-        query_embedding = self.embedding_model.encode([query])
-        results = self.collection.query(
-            query_embeddings=query_embedding.tolist(),
-            n_results=n_results
-        )
-        
-        return [
-            {
-                "text": doc,
-                "metadata": meta,
-                "score": 1 - dist  # Convert distance to similarity
-            }
-            for doc, meta, dist in zip(
-                results["documents"][0],
-                results["metadatas"][0],
-                results["distances"][0]
+        dense = [
+            [
+                {
+                    "id": doc_id,
+                    "text": doc,
+                    "metadata": meta,
+                    "score": 1 - dist  # Convert distance to similarity
+                }
+                for doc_id, doc, meta, dist in zip(ids, docs, metas, dists)
+            ]
+            for ids, docs, metas, dists in zip(
+                results["ids"],
+                results["documents"],
+                results["metadatas"],
+                results["distances"]
             )
-        ]
\ No newline at end of file
+        ]
+        if self.keyword_index is None:
+            return dense
+        with metrics.span("store.bm25_fuse"):
+            return [self._fuse(query, hits, n_results, n_dense, where)
+                    for query, hits in zip(queries, dense)]
+
+    def _fuse(self, query: str, dense_hits: List[Dict], n_results: int, depth: int,
+              where: Optional[Dict] = None) -> List[Dict]:
+        """Fuse dense hits with BM25 hits for one query."""
+        index = self.keyword_index
+        keyword_hits = index.search(
+            query, n_results=depth,
+            where=(lambda metadata: matches_where(metadata, where)) if where else None
+        )
+        by_id = {hit["id"]: hit for hit in dense_hits}
+        for position, _ in keyword_hits:
+            doc_id = index.ids[position]
+            if doc_id not in by_id:
+                by_id[doc_id] = {
+                    "id": doc_id,
+                    "text": index.texts[position],
+                    "metadata": index.metadatas[position],
+                }
+        fused = reciprocal_rank_fusion(
+            [[hit["id"] for hit in dense_hits], [index.ids[position] for position, _ in keyword_hits]],
+            k=self.rrf_k
+        )
+        return [{**by_id[doc_id], "score": score} for doc_id, score in fused[:n_results]]
@@ -0,0 +1,132 @@
+from main import ask_question, ask_questions
+from sml.answers import AnswerCache, dedupe_chunks, normalize_question
+from sml.model import SmallLanguageModel
+from sml.registry import ModelRegistry
+
+from .test_store import CHUNKS_A, CHUNKS_B, make_store
+
+
+class CountingQA:
+    """Answers with the first word of the context and records every question answered."""
+
+    cache_tag = "counting"
+
+    def __init__(self):
+        self.asked = []
+        self.batches = []
+
+    def build_context(self, question, texts):
+        return " ".join(texts)
+
+    def answer_question(self, question, context):
+        self.asked.append(question)
+        return context.split()[0]
+
+    def answer_questions(self, questions, contexts, batch_size=None):
+        self.batches.append(list(questions))
+        self.asked.extend(questions)
+        return [context.split()[0] for context in contexts]
+
+
+class WhitespaceTokenizer:
+    """Fast-tokenizer stand-in: one token per word, with character offsets."""
+
+    model_max_length = 512
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 3 if pair else 2
+
+    def __call__(self, text, add_special_tokens=True, return_offsets_mapping=False):
+        offsets, position = [], 0
+        for word in text.split():
+            start = text.index(word, position)
+            position = start + len(word)
+            offsets.append((start, position))
+        return {"input_ids": list(range(len(offsets))), "offset_mapping": offsets}
+
+
+class CharacterTokenizer(WhitespaceTokenizer):
+    """One token per character, spaces included."""
+
+    def __call__(self, text, add_special_tokens=True, return_offsets_mapping=False):
+        return {"input_ids": list(range(len(text))), "offset_mapping": [(i, i + 1) for i in range(len(text))]}
+
+
+def test_dedupe_drops_duplicate_and_contained_chunks():
+    results = [
+        {"id": "1", "text": "Szent István király"},
+        {"id": "2", "text": "szent  istván király"},
+        {"id": "3", "text": "Géza fejedelem"},
+        {"id": "4", "text": "Géza fejedelem fia Szent István király volt"},
+        {"id": "5", "text": "Mohács"},
+    ]
+    assert [result["id"] for result in dedupe_chunks(results)] == ["4", "5"]
+
+def test_answer_cache_is_lru_on_normalized_questions():
+    cache = AnswerCache(max_size=2)
+    chunks = [{"id": "a:0", "text": "x"}, {"id": "a:1", "text": "y"}]
+    cache.put(AnswerCache.key("Ki volt király?", chunks, "m"), "István")
+    assert cache.get(AnswerCache.key("  ki volt KIRÁLY ", chunks, "m")) == "István"
+    assert cache.get(AnswerCache.key("Ki volt király?", chunks[::-1], "m")) is None
+    assert cache.get(AnswerCache.key("Ki volt király?", chunks, "other")) is None
+    changed = [{"id": "a:0", "text": "z"}, {"id": "a:1", "text": "y"}]
+    assert cache.get(AnswerCache.key("Ki volt király?", changed, "m")) is None
+    cache.put(AnswerCache.key("b", chunks, "m"), "B")
+    cache.get(AnswerCache.key("ki volt király", chunks, "m"))
+    cache.put(AnswerCache.key("c", chunks, "m"), "C")
+    assert len(cache) == 2 and cache.get(AnswerCache.key("b", chunks, "m")) is None
+    assert normalize_question(" Mikor?! ") == "mikor"
+
+def test_repeated_questions_skip_the_model(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert_document(CHUNKS_A, "a.pdf", doc_id="a")
+    store.upsert_document(CHUNKS_B, "b.pdf", doc_id="b")
+    qa, cache = CountingQA(), AnswerCache()
+
+    first = ask_question("Mohács mikor volt?", store, qa, n_results=2, cache=cache)
+    again = ask_question("mohács mikor volt", store, qa, n_results=2, cache=cache)
+    batch = ask_questions(["Géza fejedelem?", "Géza fejedelem", "Mohács mikor volt?"], store, qa,
+                          n_results=2, cache=cache)
+    assert again["answer"] == first["answer"] == batch[2]["answer"]
+    assert batch[0]["answer"] == batch[1]["answer"]
+    assert qa.asked == ["Mohács mikor volt?", "Géza fejedelem?"]
+    assert cache.stats["hits"] == 2
+
+def test_batched_questions_match_single_questions(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert_document(CHUNKS_A, "a.pdf", doc_id="a")
+    store.upsert_document(CHUNKS_B, "b.pdf", doc_id="b")
+    questions = ["Mohács mikor volt?", "Ki volt Szent István?", "Géza fejedelem"]
+    single = [ask_question(question, store, CountingQA(), n_results=2, cache=None) for question in questions]
+
+    qa, searches = CountingQA(), []
+    search_many = store.search_many
+    store.search_many = lambda queries, **kwargs: searches.append(queries) or search_many(queries, **kwargs)
+    assert ask_questions(questions, store, qa, n_results=2, cache=None) == single
+    assert searches == [questions] and qa.batches == [questions]
+
+def test_recreated_collection_does_not_reuse_answers(tmp_path):
+    store, qa, cache = make_store(tmp_path), CountingQA(), AnswerCache()
+    store.add_documents(["Alpha is here."])
+    assert ask_question("Who is here?", store, qa, n_results=1, cache=cache)["answer"] == "Alpha"
+    store.create_collection("documents")
+    store.add_documents(["Beta is here."])
+    assert ask_question("Who is here?", store, qa, n_results=1, cache=cache)["answer"] == "Beta"
+
+def test_context_is_trimmed_to_the_sequence_length():
+    registry = ModelRegistry()
+    registry.preload(SmallLanguageModel.registry_key("trim"),
+                     lambda: ("model", WhitespaceTokenizer(), lambda question, context: {}), freeze=False)
+    llm = SmallLanguageModel("trim", registry=registry, max_seq_len=10)
+    # 10 - 3 special tokens - 2 question tokens leaves 5 context tokens
+    assert llm.build_context("Ki volt?", ["egy kettő", "három négy öt hat", "hét"]) == "egy kettő három négy öt"
+    assert llm.build_context("Ki volt?", ["egy", "kettő"]) == "egy kettő"
+
+def test_context_budget_counts_the_joins():
+    registry = ModelRegistry()
+    registry.preload(SmallLanguageModel.registry_key("chars"),
+                     lambda: ("model", CharacterTokenizer(), lambda question, context: {}), freeze=False)
+    llm = SmallLanguageModel("chars", registry=registry, max_seq_len=10)
+    # 10 - 3 special tokens - 3 question characters leaves 4, and the space between the texts is one
+    assert llm.build_context("Ki?", ["ab", "cd"]) == "ab c"
+    assert llm.build_context("Ki?", ["ab", "c"]) == "ab c"
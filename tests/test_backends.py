@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from vector.backends import LocalBackend, quantize_int8
+
+def random_unit(n, dim, seed):
+    vectors = np.random.RandomState(seed).randn(n, dim).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_quantize_int8_roundtrip():
+    vectors = random_unit(50, 32, 0)
+    codes, scales = quantize_int8(vectors * 3)
+    assert codes.dtype == np.int8
+    assert np.abs(codes * scales[:, None] - vectors).max() < 0.01
+
+def test_local_collection_query_layout(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    collection = backend.create_collection("doc")
+    vectors = random_unit(6, 8, 1)
+    collection.add(embeddings=vectors[:3].tolist(), documents=["a", "b", "c"],
+                   metadatas=[{"i": 0}, {"i": 1}, {"i": 2}], ids=["c0", "c1", "c2"])
+    collection.add(embeddings=vectors[3:].tolist(), documents=["d", "e", "f"],
+                   metadatas=[{"i": 3}, {"i": 4}, {"i": 5}], ids=["c3", "c4", "c5"])
+    assert collection.count() == 6
+
+    results = collection.query(query_embeddings=vectors[[4, 1]].tolist(), n_results=2)
+    assert [ids[0] for ids in results["ids"]] == ["c4", "c1"]
+    assert [docs[0] for docs in results["documents"]] == ["e", "b"]
+    assert results["metadatas"][0][0] == {"i": 4}
+    assert results["distances"][0][0] == pytest.approx(0.0, abs=0.01)
+    assert results["distances"][0][0] <= results["distances"][0][1]
+
+def test_reader_sees_writes_and_recall(tmp_path):
+    backend = LocalBackend(str(tmp_path), block_rows=128)
+    writer = backend.create_collection("doc")
+    reader = LocalBackend(str(tmp_path)).get_collection("doc")
+    assert reader.count() == 0
+    corpus = random_unit(1000, 32, 2)
+    writer.add(embeddings=corpus, documents=[str(i) for i in range(1000)],
+               ids=[f"c{i}" for i in range(1000)])
+    queries = random_unit(20, 32, 3)
+    rows, _ = reader.top_k(queries, 10)
+    exact = np.argsort(-(queries @ corpus.T), axis=1)[:, :10]
+    recall = np.mean([len(set(r) & set(e)) / 10 for r, e in zip(rows, exact)])
+    assert recall >= 0.9
+
+def test_get_missing_collection(tmp_path):
+    with pytest.raises(ValueError):
+        LocalBackend(str(tmp_path)).get_collection("missing")
+
+def test_local_collection_delete_and_where(tmp_path):
+    from vector.backends import matches_where
+    collection = LocalBackend(str(tmp_path)).get_or_create_collection("docs")
+    vectors = random_unit(4, 8, 4)
+    collection.add(embeddings=vectors, documents=["a", "b", "c", "d"],
+                   metadatas=[{"doc_id": "x", "page": 0}, {"doc_id": "x", "page": 1},
+                              {"doc_id": "y", "page": 0}, {"doc_id": "y", "page": 1}],
+                   ids=["x:0", "x:1", "y:0", "y:1"])
+    results = collection.query(query_embeddings=vectors[[0]], n_results=4,
+                               where={"$and": [{"doc_id": "y"}, {"page": 0}]})
+    assert results["ids"] == [["y:0"]]
+    assert collection.get(where={"doc_id": "x"}, limit=1)["ids"] == ["x:0"]
+
+    collection.delete(where={"doc_id": "x"})
+    reopened = LocalBackend(str(tmp_path)).get_or_create_collection("docs")
+    assert reopened.get()["ids"] == ["y:0", "y:1"]
+    assert "x:0" not in reopened.query(query_embeddings=vectors[[0]], n_results=4)["ids"][0]
+    assert matches_where({"page": 2}, {"page": {"$in": [1, 2]}})
+    assert not matches_where({"page": 2}, {"$or": [{"page": 0}, {"page": 1}]})
+
+def test_local_collection_rejects_mismatched_rows(tmp_path):
+    collection = LocalBackend(str(tmp_path)).create_collection("doc")
+    vectors = random_unit(2, 8, 5)
+    with pytest.raises(ValueError):
+        collection.add(embeddings=vectors, documents=["a", "b"])
+    with pytest.raises(ValueError):
+        collection.add(embeddings=vectors, documents=["a", "b"], ids=["a"])
+    assert collection.count() == 0
+    collection.add(embeddings=vectors, documents=["a", "b"], ids=["a", "b"])
+    assert collection.query(query_embeddings=vectors[:1], n_results=1)["ids"] == [["a"]]
+    with pytest.raises(TypeError):
+        collection.query(query_embeddings=vectors[:1], n_results=1, wehre={"doc_id": "a"})
+
+def test_append_after_a_crash_drops_the_incomplete_rows(tmp_path):
+    collection = LocalBackend(str(tmp_path)).create_collection("doc")
+    vectors = random_unit(3, 8, 6)
+    collection.add(embeddings=vectors[:1], documents=["a"], ids=["a"])
+    collection.add(embeddings=-vectors[1:2], documents=["Z"], ids=["Z"], metadatas=[{"doc_id": "z"}])
+    vectors_file = tmp_path / "doc" / "vectors.i8"
+    with open(vectors_file, "r+b") as f:  # Crash before the vector of "Z" was written
+        f.truncate(8)
+
+    reopened = LocalBackend(str(tmp_path)).get_collection("doc")
+    reopened.add(embeddings=vectors[1:3], documents=["b", "c"], ids=["b", "c"], metadatas=[{"doc_id": "b"}, {}])
+    assert reopened.count() == 3
+    assert reopened.get()["ids"] == ["a", "b", "c"]
+    assert reopened.get(where={"doc_id": "b"})["documents"] == ["b"]
+    found = reopened.query(query_embeddings=vectors[1:2], n_results=1)
+    assert found["ids"] == [["b"]] and found["distances"][0][0] == pytest.approx(0, abs=0.02)
+
+def test_local_collection_filters_on_columns_and_metadata(tmp_path):
+    collection = LocalBackend(str(tmp_path)).create_collection("docs")
+    vectors = random_unit(4, 8, 6)
+    collection.add(embeddings=vectors, documents=["a", "b", "c", "d"],
+                   metadatas=[{"doc_id": "x", "page": 0, "lang": "hu"}, {"doc_id": "x", "page": 1},
+                              {"doc_id": "y", "page": 0, "lang": "en"}, {"doc_id": "z"}],
+                   ids=["x:0", "x:1", "y:0", "z:0"])
+    assert collection.get(where={"page": {"$ne": 0}})["ids"] == ["x:1", "z:0"]
+    assert collection.get(where={"$or": [{"doc_id": "z"}, {"page": 1}]})["ids"] == ["x:1", "z:0"]
+    assert collection.get(where={"doc_id": {"$in": ["x", "y"]}, "lang": "hu"})["ids"] == ["x:0"]
+    assert collection.get(ids=["y:0", "missing"])["ids"] == ["y:0"]
+    collection.delete(ids=["x:0"])
+    assert collection.get(where={"doc_id": {"$nin": ["z"]}})["ids"] == ["x:1", "y:0"]
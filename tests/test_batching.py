@@ -0,0 +1,25 @@
+import numpy as np
+from vector.batching import encode_bucketed, length_buckets
+
+def test_length_buckets_sort_and_cap_size():
+    lengths = [5, 1, 9, 2, 8, 1]
+    buckets = length_buckets(lengths, batch_size=2)
+    assert [b.tolist() for b in buckets] == [[1, 5], [3, 0], [4, 2]]
+
+def test_length_buckets_token_budget():
+    lengths = [10, 10, 10, 1, 1, 1]
+    buckets = length_buckets(lengths, batch_size=4, max_tokens=20)
+    assert [b.tolist() for b in buckets] == [[3, 4, 5], [0, 1], [2]]
+
+def test_encode_bucketed_keeps_input_order():
+    texts = ["hosszú szöveg itt", "a", "közepes szó"]
+    calls = []
+
+    def encode(batch):
+        calls.append(batch)
+        return [[len(t), 0.5] for t in batch]
+
+    out = encode_bucketed(texts, encode, [len(t.split()) for t in texts], batch_size=2)
+    assert out.dtype == np.float32
+    assert out[:, 0].tolist() == [len(t) for t in texts]
+    assert calls == [["a", "közepes szó"], ["hosszú szöveg itt"]]
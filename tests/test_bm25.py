@@ -0,0 +1,60 @@
+import pytest
+
+from vector.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+CHUNKS = [
+    "Szent István az utolsó magyar fejedelem és az első magyar király.",
+    "1001 január 1-én koronázták meg.",
+    "Géza fejedelem nyugat felé fordult.",
+    "István azonban német segítséggel legyőzte Koppányt.",
+]
+
+def test_tokenize_keeps_accents_and_numbers():
+    assert tokenize("Szent István, 1001!") == ["szent", "istván", "1001"]
+
+def test_exact_terms_rank_first():
+    index = BM25Index()
+    index.add([f"c{i}" for i in range(2)], CHUNKS[:2])
+    index.add([f"c{i}" for i in range(2, 4)], CHUNKS[2:])
+    assert index.search("1001")[0][0] == 1
+    ranked = [position for position, _ in index.search("Szent István")]
+    assert ranked[0] == 0 and set(ranked) == {0, 3}
+    assert index.search("ismeretlen") == []
+
+def test_incremental_add_matches_single_build():
+    single = BM25Index()
+    single.add([f"c{i}" for i in range(4)], CHUNKS)
+    incremental = BM25Index()
+    for i, chunk in enumerate(CHUNKS):
+        incremental.add([f"c{i}"], [chunk])
+        incremental.search("fejedelem")  # Forces a merge between adds
+    assert (single.scores("magyar fejedelem") == incremental.scores("magyar fejedelem")).all()
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=1)
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b"]
+
+def test_removed_documents_leave_the_statistics():
+    index = BM25Index()
+    index.add([f"c{i}" for i in range(4)], CHUNKS)
+    index.search("magyar")
+    index.remove(["c1", "c2"])
+    rebuilt = BM25Index()
+    rebuilt.add(["c0", "c3"], [CHUNKS[0], CHUNKS[3]])
+    scores = index.scores("István fejedelem")
+    assert scores[[1, 2]].tolist() == [0, 0]
+    assert scores[[0, 3]] == pytest.approx(rebuilt.scores("István fejedelem"))
+    assert BM25Index().search("magyar") == []
+
+def test_concurrent_adds_and_searches():
+    from concurrent.futures import ThreadPoolExecutor
+    index = BM25Index()
+
+    def work(i):
+        index.add([f"c{i}"], [CHUNKS[i % 4]])
+        return index.search("István", n_results=100)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(work, range(200)))
+    assert len(index) == 200
+    assert len(index.search("István", n_results=1000)) == 100
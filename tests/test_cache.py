@@ -0,0 +1,95 @@
+import os
+import pytest
+from file.cache import ExtractionCache
+from file.loader import PdfFileLoader
+
+@pytest.fixture
+def text_pdf(tmp_path):
+    import fitz
+    pdf_path = tmp_path / "text.pdf"
+    doc = fitz.open()
+    for i in range(3):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Oldal {i}. Szent István király.")
+        page.insert_link({"kind": fitz.LINK_URI, "from": fitz.Rect(72, 100, 200, 120),
+                          "uri": "https://example.com"})
+    doc.save(str(pdf_path))
+    doc.close()
+    return str(pdf_path)
+
+def test_cache_hit_skips_extraction(text_pdf, tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    first = PdfFileLoader(text_pdf, cache=cache).extract_text()
+    chunks = first.chunk_text()
+    assert cache.get_stats()["writes"] == 2
+
+    def fail(*args, **kwargs):
+        raise AssertionError("extractor called on cache hit")
+    monkeypatch.setattr(PdfFileLoader, "extract_pages_pymupdf", fail)
+    monkeypatch.setattr(PdfFileLoader, "extract_pages_pypdf2", fail)
+    second = PdfFileLoader(text_pdf, cache=cache).extract_text()
+    assert second._text == first._text
+    assert second.chunk_text() == chunks
+    assert cache.get_stats()["hits"] == 2
+
+def test_cache_streams_are_json_serializable(text_pdf, tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    streams = PdfFileLoader(text_pdf, cache=cache).parse_pdf_streams()
+    cached = PdfFileLoader(text_pdf, cache=cache).parse_pdf_streams()
+    assert cache.get_stats()["hits"] == 3
+    assert cached["text"] == streams["text"]
+    assert cached["links"] == streams["links"] and len(cached["links"]) == 3
+    assert cached["links"][0]["uri"] == "https://example.com"
+    assert [image.as_dict() for image in cached["images"]] == [image.as_dict() for image in streams["images"]]
+
+def test_empty_extractions_are_not_cached(tmp_path):
+    import fitz
+    pdf_path = str(tmp_path / "blank.pdf")
+    doc = fitz.open()
+    doc.new_page()
+    doc.save(pdf_path)
+    doc.close()
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    loader = PdfFileLoader(pdf_path, cache=cache).extract_text()
+    loader.chunk_text()
+    assert loader.parse_pdf_streams(streams=["text"])["text"][0]["blocks"] == []
+    assert cache.get_stats()["writes"] == 0
+
+def test_cache_scans_the_directory_only_when_over_budget(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=350)
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: scans.append(1) or evict())
+    for name in "abc":
+        cache.put(name, "pages", ["x" * 100])
+    assert len(scans) == 1  # The first write
+    cache.put("d", "pages", ["x" * 100])
+    assert len(scans) == 2 and cache.get_stats()["evictions"] == 1
+
+def test_cache_streams_are_cached_per_stream(text_pdf, tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    links = PdfFileLoader(text_pdf, cache=cache).parse_pdf_streams(streams=["links"])
+    streams = PdfFileLoader(text_pdf, cache=cache).parse_pdf_streams()
+    assert streams["links"] == links["links"]
+    assert cache.get_stats()["hits"] == 1  # links; text and images were parsed
+
+def test_cache_key_changes_with_content(text_pdf, tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    key = cache.key(text_pdf, "1")
+    assert cache.key(text_pdf, "2") != key
+    with open(text_pdf, "ab") as f:
+        f.write(b"\n")
+    assert cache.key(text_pdf, "1") != key
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=250)
+    cache.put("a", "pages", ["x" * 100])
+    cache.put("b", "pages", ["x" * 100])
+    os.utime(cache._path("a", "pages"), (0, 0))
+    os.utime(cache._path("b", "pages"), (1, 1))
+    cache.get("a", "pages")  # Touch a, so b is now the oldest
+    cache.put("c", "pages", ["x" * 100])
+    assert cache.get("b", "pages") is None
+    assert cache.get("a", "pages") is not None
+    assert cache.get_stats()["evictions"] == 1
+    assert not [name for name in os.listdir(cache.directory) if name.endswith(".tmp")]
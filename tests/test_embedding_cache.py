@@ -0,0 +1,66 @@
+import numpy as np
+from vector.cache import EmbeddingCache, text_hash
+
+class FakeEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), t.count("a"), 1.0] for t in texts])
+
+def test_text_hash_normalizes_whitespace():
+    assert text_hash("Szent  István\n király ") == text_hash("Szent István király")
+    assert text_hash("Szent István") != text_hash("Szent Istvan")
+
+def test_only_new_chunks_are_encoded(tmp_path):
+    encoder = FakeEncoder()
+    cache = EmbeddingCache(str(tmp_path), "model/a")
+    first = cache.encode(["alma", "banán"], encoder)
+    second = cache.encode(["banán", "körte", "alma"], encoder)
+    assert encoder.calls == [["alma", "banán"], ["körte"]]
+    assert second.dtype == np.float32
+    np.testing.assert_array_equal(second[0], first[1])
+    np.testing.assert_array_equal(second[2], first[0])
+    assert cache.stats == {"hits": 2, "misses": 3}
+
+def test_cache_persists_per_model(tmp_path):
+    encoder = FakeEncoder()
+    EmbeddingCache(str(tmp_path), "model/a").encode(["alma", "alma"], encoder)
+    reopened = EmbeddingCache(str(tmp_path), "model/a")
+    assert len(reopened) == 1
+    reopened.encode(["alma"], encoder)
+    assert encoder.calls == [["alma"]]
+    other = EmbeddingCache(str(tmp_path), "model/b")
+    other.encode(["alma"], encoder)
+    assert len(encoder.calls) == 2
+
+def test_new_rows_are_logged_and_compacted(tmp_path):
+    encoder = FakeEncoder()
+    cache = EmbeddingCache(str(tmp_path), "model", min_compact_rows=3)
+    first = cache.encode(["a", "bb"], encoder)
+    assert not (tmp_path / "model.npy").exists()  # Only the log was written
+    reopened = EmbeddingCache(str(tmp_path), "model", min_compact_rows=3)
+    np.testing.assert_array_equal(reopened.encode(["bb", "a"], encoder), first[::-1])
+    cache.encode(["ccc"], encoder)  # Three logged rows: folded into the matrix
+    assert (tmp_path / "model.npy").exists() and not (tmp_path / "model.log.txt").exists()
+    cache.encode(["dddd"], encoder)
+    cache.close()
+    reopened = EmbeddingCache(str(tmp_path), "model")
+    assert len(reopened) == 4 and not (tmp_path / "model.log.f32").exists()
+    assert encoder.calls == [["a", "bb"], ["ccc"], ["dddd"]]
+
+def test_log_is_cut_back_to_complete_rows_after_a_crash(tmp_path):
+    encoder = FakeEncoder()
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.encode(["a"], encoder)
+    with open(tmp_path / "model.log.f32", "ab") as f:  # Crash between the vector and its hash
+        f.write(np.array([9, 9, 9], dtype=np.float32).tobytes())
+    with open(tmp_path / "model.log.txt", "a") as f:  # and a torn hash line
+        f.write("deadbeef\t")
+    reopened = EmbeddingCache(str(tmp_path), "model")
+    b = reopened.encode(["b"], encoder)
+    reopened = EmbeddingCache(str(tmp_path), "model")
+    assert len(reopened) == 2
+    np.testing.assert_array_equal(reopened.encode(["b", "a"], encoder), np.vstack([b, encoder(["a"])]))
+    assert len(encoder.calls) == 3  # a, b, and the reference call above
@@ -0,0 +1,50 @@
+import json
+import fitz
+from ingest import IngestPipeline, find_pdfs
+from .test_store import make_store
+
+def write_pdf(path, sentences):
+    doc = fitz.open()
+    for sentence in sentences:
+        doc.new_page().insert_text((72, 72), sentence)
+    doc.save(str(path))
+    doc.close()
+
+def test_pipeline_ingests_directory_and_resumes(tmp_path):
+    pdf_dir = tmp_path / "pdfs"
+    (pdf_dir / "sub").mkdir(parents=True)
+    write_pdf(pdf_dir / "a.pdf", ["Szent István király volt.", "Géza fejedelem fia."])
+    write_pdf(pdf_dir / "sub" / "b.pdf", ["Mohács 1526-ban volt."])
+    (pdf_dir / "notes.txt").write_text("not a pdf")
+    paths = find_pdfs(str(pdf_dir))
+    assert [p.rsplit("/", 1)[-1] for p in paths] == ["a.pdf", "b.pdf"]
+
+    store = make_store(tmp_path / "store")
+    manifest = tmp_path / "store" / "documents.ingested.jsonl"
+    pipeline = IngestPipeline(store, workers=1, batch_size=2, queue_size=1, manifest_path=str(manifest))
+    stats = pipeline.run(paths)
+    assert stats["documents"] == 2 and stats["failed"] == []
+    assert stats["stages"]["embed"]["chunks"] == stats["stages"]["write"]["chunks"] == 3
+    assert store.collection.count() == 3
+    assert [json.loads(line)["chunks"] for line in manifest.read_text().splitlines()] == [2, 1]
+    hit = store.search("Mohács", n_results=1, filename=paths[1])[0]
+    assert hit["text"] == "Mohács 1526-ban volt." and hit["metadata"]["page"] == 0
+
+    again = IngestPipeline(store, workers=1, manifest_path=str(manifest)).run(paths)
+    assert again["documents"] == 0 and again["skipped"] == 2
+    assert store.collection.count() == 3
+
+def test_changed_file_is_ingested_again(tmp_path):
+    pdf = tmp_path / "a.pdf"
+    write_pdf(pdf, ["Szent István király volt."])
+    store = make_store(tmp_path / "store")
+    manifest = tmp_path / "documents.ingested.jsonl"
+    pipeline = IngestPipeline(store, workers=1, queue_size=1, manifest_path=str(manifest))
+    assert pipeline.run([str(pdf)])["documents"] == 1
+
+    write_pdf(pdf, ["Mohács 1526-ban volt.", "Géza fejedelem fia."])
+    stats = pipeline.run([str(pdf)])
+    assert stats["documents"] == 1 and stats["skipped"] == 0
+    assert stats["stages"]["write"]["chunks"] == 2  # Counted for this run only
+    assert sorted(store.collection.get()["documents"]) == ["Géza fejedelem fia.", "Mohács 1526-ban volt."]
+    assert pipeline.run([str(pdf)])["skipped"] == 1
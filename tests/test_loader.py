@@ -59,3 +59,137 @@ def test_parse_pdf_streams_empty_pdf(sample_pdf):
     streams = loader.parse_pdf_streams()
     assert isinstance(streams, dict)
     assert "text" in streams and "images" in streams and "links" in streams
+
+@pytest.fixture
+def multi_page_pdf(tmp_path):
+    import fitz
+    pdf_path = tmp_path / "multi.pdf"
+    doc = fitz.open()
+    for i in range(7):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Oldal {i}. Ez a {i}. mondat.")
+    doc.save(str(pdf_path))
+    doc.close()
+    return str(pdf_path)
+
+def test_extract_text_parallel_keeps_page_order(multi_page_pdf):
+    serial = PdfFileLoader(multi_page_pdf).extract_text()._text
+    parallel = PdfFileLoader(multi_page_pdf, workers=3).extract_text()._text
+    assert parallel == serial
+    assert [line for line in parallel.splitlines() if line.startswith("Oldal")] == [
+        f"Oldal {i}. Ez a {i}. mondat." for i in range(7)
+    ]
+
+def test_iter_chunks_carries_sentences_across_pages():
+    loader = PdfFileLoader("dummy.pdf")
+    pages = ["Első mondat. A második", " mondat folytatódik.\n", "Harmadik! Negyedik"]
+    loader._text = "".join(pages)
+    assert list(loader.iter_chunks(pages)) == loader.chunk_text() == [
+        "Első mondat.",
+        "A második mondat folytatódik.",
+        "Harmadik!",
+        "Negyedik",
+    ]
+
+def test_iter_chunks_caps_text_without_sentence_boundaries(monkeypatch):
+    import file.loader as loader_module
+    monkeypatch.setattr(loader_module, "MAX_CARRY_CHARS", 50)
+    pages = ["sor 1 | 2 | 3 " * 10 for _ in range(20)] + ["Vége."]
+    chunks = list(PdfFileLoader("dummy.pdf").iter_chunks(pages))
+    assert max(len(chunk) for chunk in chunks) <= 50
+    assert " ".join(chunks).split() == "".join(pages).split()
+
+    bounded = PdfFileLoader("dummy.pdf", max_chunk_chars=30)
+    assert max(len(chunk) for chunk in bounded.iter_chunks(pages)) <= 30
+
+def test_iter_chunks_matches_chunk_text(multi_page_pdf):
+    loader = PdfFileLoader(multi_page_pdf)
+    assert list(loader.iter_chunks()) == loader.extract_text().chunk_text()
+
+def test_clean_text_in_batches():
+    from file.loader import batched, iter_clean
+    texts = (f"Sor\n{i}" for i in range(5))
+    batches = list(batched(iter_clean(texts), 2))
+    assert batches == [["Sor 0", "Sor 1"], ["Sor 2", "Sor 3"], ["Sor 4"]]
+
+def test_load_in_chunks_ordered_views(sample_pdf):
+    with open(sample_pdf, "rb") as f:
+        data = f.read()
+    with PdfFileLoader(sample_pdf, chunk_size=100) as loader:
+        chunks = loader.load_in_chunks()
+        assert all(isinstance(chunk, memoryview) for chunk in chunks)
+        assert all(len(chunk) == 100 for chunk in chunks[:-1])
+        assert b"".join(chunks) == data
+
+def test_load_in_chunks_file_not_found():
+    loader = PdfFileLoader("not_a_real_file.pdf")
+    assert loader.load_in_chunks() == []
+
+def test_open_document_shares_buffer(multi_page_pdf):
+    with PdfFileLoader(multi_page_pdf) as loader:
+        loader.load_in_chunks()
+        doc = loader.open_document()
+        assert doc.page_count == 7
+        doc.close()
+
+def test_close_closes_documents_reading_the_mapping(multi_page_pdf):
+    loader = PdfFileLoader(multi_page_pdf)
+    doc = loader.open_document()
+    loader.close()
+    assert doc.is_closed
+    with PdfFileLoader(multi_page_pdf) as loader:
+        doc = loader.open_document()
+        doc[0].get_text()
+    assert doc.is_closed
+    with pytest.raises(ValueError):
+        doc[0].get_text()
+
+def test_iter_page_chunks_reports_start_page():
+    loader = PdfFileLoader("dummy.pdf")
+    pages = ["Első mondat. A második", " mondat folytatódik.\n", "\n", "Harmadik! Negyedik"]
+    assert list(loader.iter_page_chunks(pages)) == [
+        (0, "Első mondat."),
+        (0, "A második mondat folytatódik."),
+        (3, "Harmadik!"),
+        (3, "Negyedik"),
+    ]
+
+@pytest.fixture
+def image_pdf(tmp_path):
+    import fitz
+    pdf_path = tmp_path / "images.pdf"
+    pixmap = fitz.Pixmap(fitz.csRGB, 8, 8, bytes(range(192)), False)
+    png = pixmap.tobytes("png")
+    doc = fitz.open()
+    for i in range(4):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Kép oldal {i}.")
+        page.insert_image(fitz.Rect(72, 100, 136, 164), stream=png)
+        page.insert_link({"kind": fitz.LINK_URI, "from": fitz.Rect(72, 200, 200, 220),
+                          "uri": f"https://example.com/{i}"})
+    doc.save(str(pdf_path), garbage=3)  # garbage=3 stores the shared image once
+    doc.close()
+    return str(pdf_path)
+
+def test_parse_pdf_streams_lazy_deduplicated_images(image_pdf):
+    streams = PdfFileLoader(image_pdf).parse_pdf_streams()
+    [image] = streams["images"]
+    assert (image.width, image.height) == (8, 8)
+    assert [page for page, _ in image.placements] == [0, 1, 2, 3]
+    assert image.page == 0 and image.bbox == [72.0, 100.0, 136.0, 164.0]
+    assert image.extract()["ext"] == "png" and image.data
+
+    page = streams["text"][2]
+    assert page["page"] == 2 and page["blocks"][0]["text"].startswith("Kép oldal 2.")
+    assert len(page["blocks"][0]["bbox"]) == 4
+    assert [link["source_page"] for link in streams["links"]] == [0, 1, 2, 3]
+
+def test_parse_pdf_streams_parallel_and_selected_streams(image_pdf):
+    serial = PdfFileLoader(image_pdf).parse_pdf_streams()
+    parallel = PdfFileLoader(image_pdf).parse_pdf_streams(workers=3)
+    assert parallel["text"] == serial["text"] and parallel["links"] == serial["links"]
+    assert [image.as_dict() for image in parallel["images"]] == [image.as_dict() for image in serial["images"]]
+
+    assert list(PdfFileLoader(image_pdf).parse_pdf_streams(streams=["links"])) == ["links"]
+    with pytest.raises(ValueError):
+        PdfFileLoader(image_pdf).parse_pdf_streams(streams=["tables"])
@@ -0,0 +1,56 @@
+import json
+import pstats
+from metrics import Metrics, metrics
+from .test_store import make_store, CHUNKS_A
+
+def test_spans_counters_and_prometheus_export():
+    m = Metrics()
+    for _ in range(3):
+        with m.span("store.encode", texts=2):
+            pass
+    m.count("loader.pages", 7)
+    m.count("loader.pages")
+    snapshot = m.snapshot()
+    assert snapshot["spans"]["store.encode"]["count"] == 3
+    assert snapshot["counters"]["loader.pages"] == 8
+
+    text = m.to_prometheus()
+    assert 'pdf_parser_span_seconds_count{span="store.encode"} 3' in text
+    assert "pdf_parser_loader_pages_total 8" in text
+    assert all(line.startswith("#") or len(line.split()) == 2 for line in text.splitlines())
+
+def test_trace_and_memory_are_opt_in(tmp_path):
+    m = Metrics()
+    with m.span("untraced"):
+        pass
+    m.start_trace()
+    m.start_memory_tracing()
+    try:
+        with m.span("topic.fit", documents=4):
+            data = [bytearray(1 << 20)]
+    finally:
+        m.stop_memory_tracing()
+    m.write_trace(str(tmp_path / "trace.json"))
+    trace = json.loads((tmp_path / "trace.json").read_text())
+    assert [event["name"] for event in trace["traceEvents"]] == ["topic.fit"]
+    event = trace["traceEvents"][0]
+    assert event["ph"] == "X" and event["args"]["documents"] == 4
+    assert event["args"]["peak_alloc_bytes"] >= len(data[0])
+
+def test_profile_dumps_cprofile_stats(tmp_path):
+    with metrics.profile(str(tmp_path / "run.prof")):
+        sorted(range(1000), key=lambda x: -x)
+    assert pstats.Stats(str(tmp_path / "run.prof")).total_calls > 0
+    with metrics.profile(None):  # Disabled
+        pass
+
+def test_vector_store_records_stage_spans(tmp_path):
+    metrics.reset()
+    store = make_store(tmp_path, hybrid=True)
+    store.upsert_document(CHUNKS_A, "a.pdf", doc_id="a")
+    store.search("király", n_results=1)
+    spans = metrics.snapshot()["spans"]
+    for name in ("store.encode_model", "store.collection_add", "store.search",
+                 "store.encode_query", "store.collection_query", "store.bm25_fuse"):
+        assert spans[name]["count"] >= 1, name
+    assert metrics.snapshot()["counters"]["store.texts_encoded"] == len(CHUNKS_A)
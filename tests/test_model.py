@@ -0,0 +1,100 @@
+import pytest
+
+from sml import model as sml_model
+from sml.inference import has_onnx_export, load_with_fallback, onnx_location
+from sml.model import SmallLanguageModel
+from sml.registry import ModelRegistry
+
+def test_model_is_not_loaded_on_init():
+    registry = ModelRegistry()
+    llm = SmallLanguageModel("not-loaded", registry=registry)
+    assert llm._qa_pipeline is None
+    assert SmallLanguageModel.registry_key("not-loaded") not in registry
+
+def test_instances_share_one_loaded_model():
+    def qa_pipeline(question, context, **kwargs):
+        return {"answer": context.split()[0]}
+
+    registry = ModelRegistry()
+    registry.preload(SmallLanguageModel.registry_key("shared"),
+                     lambda: ("model", "tokenizer", qa_pipeline), freeze=False)
+    first = SmallLanguageModel("shared", registry=registry)
+    second = SmallLanguageModel("shared", registry=registry)
+    assert first.answer_question("Ki?", "István király") == "István"
+    assert first.qa_pipeline is second.qa_pipeline
+    assert first.model == second.model == "model"
+
+def test_failed_load_is_not_retried(monkeypatch):
+    calls = []
+
+    def failing_loader(model_path, device, *args):
+        calls.append(model_path)
+        raise OSError("no weights")
+
+    monkeypatch.setattr(sml_model, "_load_qa_model", failing_loader)
+    llm = SmallLanguageModel("missing", registry=ModelRegistry())
+    assert llm.answer_question("Ki?", "István") == "Model not loaded"
+    assert llm.answer_question("Ki?", "István") == "Model not loaded"
+    assert calls == ["missing"]
+
+def test_inference_modes_are_separate_registry_entries(monkeypatch):
+    loaded = []
+
+    def loader(model_path, device, inference="torch", onnx_path=None):
+        loaded.append(inference)
+        return "model", "tokenizer", lambda question, context, **kwargs: {"answer": inference}
+
+    monkeypatch.setattr(sml_model, "_load_qa_model", loader)
+    registry = ModelRegistry()
+    assert SmallLanguageModel("m", registry=registry).answer_question("Ki?", "x") == "torch"
+    assert SmallLanguageModel("m", registry=registry, inference="int8").answer_question("Ki?", "x") == "int8"
+    assert loaded == ["torch", "int8"]
+    with pytest.raises(ValueError):
+        SmallLanguageModel("m", inference="fp16")
+
+def test_optimized_inference_falls_back_to_torch():
+    def unavailable():
+        raise ImportError("No module named 'onnxruntime'")
+
+    assert load_with_fallback("qa", "onnx", True, unavailable, lambda: "torch model") == ("torch model", "torch")
+    assert load_with_fallback("qa", "int8", False, lambda: "int8 model", lambda: "torch model") == ("torch model", "torch")
+    assert load_with_fallback("qa", "int8", True, lambda: "int8 model", lambda: "torch model") == ("int8 model", "int8")
+
+def test_onnx_export_is_found_at_the_top_or_in_the_onnx_folder(tmp_path):
+    assert not has_onnx_export(str(tmp_path / "missing")) and not has_onnx_export(None)
+    (tmp_path / "empty").mkdir()
+    assert not has_onnx_export(str(tmp_path / "empty"))
+
+    optimum = tmp_path / "optimum"  # ORTModel.save_pretrained layout
+    optimum.mkdir()
+    (optimum / "model.onnx").write_bytes(b"")
+    assert has_onnx_export(str(optimum)) and onnx_location(str(optimum)) == (str(optimum), {})
+
+    sentence = tmp_path / "sentence"  # SentenceTransformer(backend="onnx").save_pretrained layout
+    (sentence / "onnx").mkdir(parents=True)
+    (sentence / "config.json").write_text("{}")
+    (sentence / "onnx" / "model.onnx").write_bytes(b"")
+    assert has_onnx_export(str(sentence))
+    assert onnx_location(str(sentence)) == (str(sentence), {"subfolder": "onnx", "file_name": "model.onnx"})
+    assert onnx_location(str(sentence / "onnx" / "model.onnx")) == (str(sentence / "onnx"), {"file_name": "model.onnx"})
+
+def test_answer_questions_makes_one_batched_pipeline_call():
+    calls = []
+
+    def qa_pipeline(question, context, batch_size=None, max_seq_len=None):
+        calls.append((question, context, batch_size, max_seq_len))
+        if isinstance(context, str):
+            return {"answer": context.split()[0]}
+        answers = [{"answer": c.split()[0]} for c in context]
+        return answers if len(answers) > 1 else answers[0]
+
+    registry = ModelRegistry()
+    registry.preload(SmallLanguageModel.registry_key("batched"),
+                     lambda: ("model", "tokenizer", qa_pipeline), freeze=False)
+    llm = SmallLanguageModel("batched", registry=registry, batch_size=4, max_seq_len=256)
+    assert llm.answer_questions(["Ki?", "Mikor?"], ["István király", "1526-ban"]) == ["István", "1526-ban"]
+    assert llm.answer_questions(["Ki?"], ["Géza fejedelem"], batch_size=2) == ["Géza"]
+    assert llm.answer_questions([], []) == []
+    assert llm.answer_question("Ki?", "Szent István") == "Szent"
+    assert calls == [(["Ki?", "Mikor?"], ["István király", "1526-ban"], 4, 256),
+                     (["Ki?"], ["Géza fejedelem"], 2, 256), ("Ki?", "Szent István", None, 256)]
@@ -0,0 +1,74 @@
+import threading
+import time
+from sml.registry import ModelRegistry
+
+class Loader:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"weights": self.calls}
+
+def test_acquire_shares_one_instance():
+    registry = ModelRegistry()
+    loader = Loader()
+    first = registry.acquire(("qa", "m", -1), loader)
+    second = registry.acquire(("qa", "m", -1), loader)
+    other_device = registry.acquire(("qa", "m", 0), loader)
+    assert first.value is second.value
+    assert other_device.value is not first.value
+    assert loader.calls == 2
+    assert registry.memory()[str(("qa", "m", -1))]["refcount"] == 2
+
+def test_concurrent_acquire_loads_once():
+    registry = ModelRegistry()
+    loader = Loader(delay=0.05)
+    handles = []
+    threads = [threading.Thread(target=lambda: handles.append(registry.acquire("m", loader)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loader.calls == 1
+    assert len({id(h.value) for h in handles}) == 1
+
+def test_idle_models_are_unloaded():
+    registry = ModelRegistry(idle_timeout=10, sweep_interval=3600)
+    with registry.acquire("held", Loader()):
+        assert registry.sweep(now=time.monotonic() + 60) == []
+    registry.acquire("kept", Loader())
+    assert registry.sweep(now=time.monotonic() + 60) == ["held"]
+    assert "held" not in registry and "kept" in registry
+
+def test_preloaded_models_are_pinned():
+    registry = ModelRegistry(idle_timeout=0, sweep_interval=3600)
+    loader = Loader()
+    registry.preload("m", loader, freeze=False)
+    assert registry.sweep(now=time.monotonic() + 60) == []
+    registry.acquire("m", loader).release()
+    assert loader.calls == 1
+    assert registry.memory()["m"]["pinned"] is True
+
+def test_sweep_rechecks_under_the_key_lock():
+    registry = ModelRegistry(idle_timeout=10, sweep_interval=3600)
+    loader = Loader()
+    registry.acquire("m", loader).release()
+    drop = registry._drop
+    handles = []
+
+    def acquired_meanwhile(key, idle_before=None):
+        handles.append(registry.acquire(key, loader))  # Between the sweep's scan and its drop
+        return drop(key, idle_before)
+
+    registry._drop = acquired_meanwhile
+    assert registry.sweep(now=time.monotonic() + 60) == []
+    assert handles[0].value == {"weights": 1}
+    registry._drop = drop
+    handles[0].release()
+    assert registry.sweep(now=time.monotonic() + 60) == ["m"]
+    assert "m" not in registry._key_locks
+    assert loader.calls == 1
@@ -0,0 +1,73 @@
+import pytest
+from file.loader import PdfFileLoader
+from file.segmenter import Segmenter
+
+TEXT = ("Szent István 1001. január 1-én lett király. A 20. században sok\nminden történt. "
+        "Kr. e. 400 körül kelták éltek itt. IV. Béla újjáépítette az országot! "
+        "Mi volt dr. Kovács szerint az ok? 1848. március 15-én kitört a forradalom.\x0c Vége.")
+
+def test_ordinals_dates_and_abbreviations_do_not_split():
+    assert Segmenter().sentences(TEXT) == [
+        "Szent István 1001. január 1-én lett király.",
+        "A 20. században sok minden történt.",
+        "Kr. e. 400 körül kelták éltek itt.",
+        "IV. Béla újjáépítette az országot!",
+        "Mi volt dr. Kovács szerint az ok?",
+        "1848. március 15-én kitört a forradalom.",
+        "Vége.",
+    ]
+
+def test_merging_respects_min_and_max_chars():
+    chunks = Segmenter(min_chars=60, max_chars=90).split(TEXT)
+    assert all(len(chunk) <= 90 for chunk in chunks)
+    assert all(len(chunk) >= 60 for chunk in chunks[:-1])
+    assert " ".join(chunks) == " ".join(Segmenter().sentences(TEXT))
+    assert len(chunks) < len(Segmenter().sentences(TEXT))
+
+def test_long_sentences_are_split_at_spaces():
+    chunks = Segmenter(max_chars=10).split("egy kettő három négy öt hat")
+    assert chunks == ["egy kettő", "három négy", "öt hat"]
+    with pytest.raises(ValueError):
+        Segmenter(min_chars=100, max_chars=50)
+
+def test_page_stream_matches_whole_text_and_defers_page_end_boundaries():
+    pages = ["Első mondat. A 20.\n", "században történt. Harmadik"]
+    loader = PdfFileLoader("dummy.pdf", min_chunk_chars=0)
+    loader._text = "".join(pages)
+    assert list(loader.iter_page_chunks(pages)) == [
+        (0, "Első mondat."), (0, "A 20. században történt."), (1, "Harmadik"),
+    ]
+    assert loader.chunk_text() == [chunk for _, chunk in loader.iter_page_chunks(pages)]
+
+    merged = PdfFileLoader("dummy.pdf", min_chunk_chars=30)
+    assert list(merged.iter_page_chunks(pages)) == [
+        (0, "Első mondat. A 20. században történt. Harmadik"),
+    ]
+
+def test_letters_and_numerals_end_sentences_unless_a_name_follows():
+    segmenter = Segmenter()
+    assert segmenter.sentences("World War II. The end.") == ["World War II.", "The end."]
+    assert segmenter.sentences("World War II. Germany lost.") == ["World War II.", "Germany lost."]
+    assert segmenter.sentences("vitamin C. Next one.") == ["vitamin C.", "Next one."]
+    assert segmenter.sentences("Ott a B. Az jobb.") == ["Ott a B.", "Az jobb."]
+    assert segmenter.sentences("A tatárjárás után IV. Béla újjáépítette. J. R. R. Tolkien írta.") == [
+        "A tatárjárás után IV. Béla újjáépítette.", "J. R. R. Tolkien írta.",
+    ]
+
+def test_page_stream_waits_for_the_word_after_a_boundary():
+    pages = ["Írta J. A", "ndrás. World War II. T", "he end."]
+    loader = PdfFileLoader("dummy.pdf", min_chunk_chars=0)
+    assert [chunk for _, chunk in loader.iter_page_chunks(pages)] == Segmenter().sentences("".join(pages)) == [
+        "Írta J. András.", "World War II.", "The end.",
+    ]
+
+def test_capital_letters_and_no_are_not_abbreviations():
+    segmenter = Segmenter()
+    assert segmenter.sentences("It was I. Then he left.") == ["It was I.", "Then he left."]
+    assert segmenter.sentences("He took vitamin E. Next day he felt fine.") == [
+        "He took vitamin E.", "Next day he felt fine.",
+    ]
+    assert segmenter.sentences("The answer is no. Then he left.") == ["The answer is no.", "Then he left."]
+    assert segmenter.sentences("See No. 5 above. Kr. e. 400 körül. Ez az i. sz. 5. évben volt.") == [
+        "See No. 5 above.", "Kr. e. 400 körül.", "Ez az i. sz. 5. évben volt.",
+    ]
@@ -0,0 +1,130 @@
+import asyncio
+import json
+from service import QueryService, percentile
+from .test_store import make_store, CHUNKS_A, CHUNKS_B
+
+class EchoQA:
+    """Answers with the first word of the context and remembers batch sizes."""
+
+    cache_tag = "echo"
+
+    def __init__(self):
+        self.batches = []
+
+    def build_context(self, question, texts):
+        return " ".join(texts)
+
+    def answer_questions(self, questions, contexts, batch_size=None):
+        self.batches.append(len(questions))
+        return [context.split()[0] for context in contexts]
+
+def make_service(tmp_path, **kwargs):
+    store = make_store(tmp_path)
+    store.upsert_document(CHUNKS_A, "a.pdf", doc_id="a")
+    store.upsert_document(CHUNKS_B, "b.pdf", doc_id="b")
+    return QueryService(store, EchoQA(), **kwargs)
+
+def test_percentile_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2, 4], 50) == 2
+    assert percentile(list(range(1, 101)), 99) == 99
+
+def test_concurrent_requests_are_micro_batched(tmp_path):
+    service = make_service(tmp_path, max_batch_size=4, max_wait=0.05)
+
+    async def run():
+        return await asyncio.gather(*[service.ask(f"Mohács {i}", n_results=1) for i in range(10)])
+
+    answers = asyncio.run(run())
+    service.close()
+    assert all(answer["answer"] == answer["sources"][0]["text"].split()[0] for answer in answers)
+    assert sum(service.llm.batches) == 10 and max(service.llm.batches) == 4
+    assert service.stats.as_dict()["batches"]["search"]["max_size"] == 4
+
+def test_identical_questions_in_flight_share_one_answer(tmp_path):
+    service = make_service(tmp_path, max_batch_size=1, max_wait=0)
+
+    async def run():
+        return await asyncio.gather(*[service.ask("Mohács mikor volt?", n_results=1) for _ in range(5)]
+                                    + [service.ask("Ki volt király?", n_results=1)])
+
+    answers = asyncio.run(run())
+    service.close()
+    assert all(answer == answers[0] for answer in answers[:5])
+    assert service.llm.batches == [1, 1] and not service._answering
+    assert len(service.answer_cache) == 2
+
+def test_http_round_trip(tmp_path):
+    service = make_service(tmp_path)
+
+    async def request(port, method, path, payload=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(body)
+
+    async def run():
+        server = await service.serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return [
+                await request(port, "POST", "/search", {"query": "török", "n_results": 2, "filename": "b.pdf"}),
+                await request(port, "POST", "/ask", {"question": "Ki volt király?"}),
+                await request(port, "POST", "/ask", {}),
+                await request(port, "GET", "/missing"),
+                await request(port, "GET", "/stats"),
+            ]
+
+    (status, found), (ask_status, answer), (bad, _), (missing, _), (_, stats) = asyncio.run(run())
+    service.close()
+    assert status == 200 and len(found["results"]) == 2
+    assert ask_status == 200 and answer["answer"]
+    assert bad == 400 and missing == 404
+    assert stats["requests"]["/ask"]["count"] == 2 and stats["requests"]["/ask"]["errors"] == 1
+
+def test_malformed_requests_get_400(tmp_path):
+    service = make_service(tmp_path)
+
+    async def send(port, raw):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        response = await reader.read()
+        writer.close()
+        return int(response.split()[1])
+
+    async def run():
+        server = await service.serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return [
+                await send(port, b"GARBAGE\r\n\r\n"),
+                await send(port, b"POST /ask HTTP/1.1\r\nContent-Length: abc\r\n\r\n"),
+                await send(port, b"POST /ask HTTP/1.1\r\nContent-Length: -5\r\n\r\n"),
+            ]
+
+    statuses = asyncio.run(run())
+    service.close()
+    assert statuses == [400, 400, 400]
+
+def test_invalid_fields_get_400_without_failing_the_batch(tmp_path):
+    service = make_service(tmp_path, max_wait=0.05)
+
+    async def run():
+        return await asyncio.gather(
+            service.handle("POST", "/search", json.dumps({"query": "Mohács"}).encode()),
+            service.handle("POST", "/search", json.dumps({"query": 5}).encode()),
+            *[service.handle("POST", "/search", json.dumps(dict({"query": "Mohács"}, **fields)).encode())
+              for fields in ({"n_results": 0}, {"n_results": -1}, {"n_results": "2"}, {"n_results": 1000},
+                             {"filename": 3}, {"page": -1})],
+            service.handle("POST", "/ask", json.dumps({"question": " "}).encode()),
+            service.handle("POST", "/ask", b"[1]"),
+        )
+
+    (good, found), *bad = asyncio.run(run())
+    service.close()
+    assert good == 200 and len(found["results"]) == 3
+    assert [status for status, _ in bad] == [400] * 9
@@ -0,0 +1,98 @@
+import zlib
+import numpy as np
+from vector.backends import LocalBackend
+from vector.store import VectorStore
+
+class BagOfWordsModel:
+    """Deterministic stand-in for a SentenceTransformer."""
+
+    def encode(self, texts, **kwargs):
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % 64] += 1
+        return vectors + 1e-3
+
+def make_store(path, hybrid=False):
+    store = VectorStore(backend=LocalBackend(str(path)), hybrid=hybrid, batch_size=2)
+    store.embedding_model = BagOfWordsModel()
+    store.open_collection("documents")
+    return store
+
+CHUNKS_A = ["Szent István király volt.", "1001 január 1-én koronázták meg.", "Géza fejedelem."]
+CHUNKS_B = ["Mohács 1526-ban volt.", "A török hódoltság kezdete."]
+
+def test_upsert_uses_stable_ids_and_skips_known_documents(tmp_path):
+    store = make_store(tmp_path)
+    assert store.upsert_document(CHUNKS_A, "a.pdf", pages=[0, 0, 1], doc_id="a") == 3
+    assert store.upsert_document(CHUNKS_B, "b.pdf", doc_id="b") == 2
+    assert store.upsert_document(CHUNKS_A, "a.pdf", doc_id="a") == 0
+    assert store.collection.count() == 5
+
+    reopened = make_store(tmp_path)
+    hits = reopened.search("török hódoltság", n_results=1)
+    assert hits[0]["id"] == "b:1"
+    assert hits[0]["metadata"]["filename"] == "b.pdf"
+
+def test_filter_by_filename_and_page(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert_document(CHUNKS_A, "a.pdf", pages=[0, 0, 1], doc_id="a")
+    store.upsert_document(CHUNKS_B, "b.pdf", pages=[0, 1], doc_id="b")
+    hits = store.search("volt", n_results=5, filename="a.pdf", page=0)
+    assert {hit["id"] for hit in hits} == {"a:0", "a:1"}
+
+def test_delete_and_force_replace_in_hybrid_mode(tmp_path):
+    store = make_store(tmp_path, hybrid=True)
+    store.upsert_document(CHUNKS_A, "a.pdf", doc_id="a")
+    store.upsert_document(CHUNKS_B, "b.pdf", doc_id="b")
+    store.delete_document(filename="b.pdf")
+    assert all(hit["metadata"]["doc_id"] == "a" for hit in store.search("Mohács 1526", n_results=5))
+
+    assert store.upsert_document(["Új szöveg 1000."], "a.pdf", doc_id="a", force=True) == 1
+    reopened = make_store(tmp_path, hybrid=True)
+    assert [hit["id"] for hit in reopened.search("1000", n_results=5)] == ["a:0"]
+    assert reopened.search("1000", n_results=1)[0]["text"] == "Új szöveg 1000."
+
+def test_changed_file_replaces_its_earlier_version(tmp_path):
+    store = make_store(tmp_path, hybrid=True)
+    store.upsert_document(CHUNKS_A, "a.pdf")
+    store.upsert_document(CHUNKS_B, "b.pdf")
+    assert store.upsert_document(["Szent István király lett.", "1000-ben."], "a.pdf") == 2
+    stored = store.collection.get(where={"filename": "a.pdf"})
+    assert sorted(stored["documents"]) == ["1000-ben.", "Szent István király lett."]
+    assert len({meta["doc_id"] for meta in stored["metadatas"]}) == 1
+    assert len(store.collection.get()["ids"]) == 4
+    assert all(hit["text"] != "Géza fejedelem." for hit in store.search("Géza fejedelem", n_results=5))
+
+def test_embedding_cache_is_named_after_the_mode_used(tmp_path):
+    fallen_back = BagOfWordsModel()
+    fallen_back.inference_mode = "torch"
+    store = VectorStore(cache_dir=str(tmp_path), inference="onnx")
+    store.embedding_model = fallen_back
+    store.encode(["Szent István király."])
+    store.close()
+    assert (tmp_path / "all-MiniLM-L6-v2.npy").exists()
+
+    quantized = BagOfWordsModel()
+    quantized.inference_mode = "int8"
+    store = VectorStore(cache_dir=str(tmp_path), inference="int8")
+    store.embedding_model = quantized
+    store.encode(["Szent István király."])
+    assert store.cache_stats() == {"hits": 0, "misses": 1}
+    store.close()
+    assert (tmp_path / "all-MiniLM-L6-v2-int8.npy").exists()
+
+def test_search_many_encodes_and_queries_once(tmp_path):
+    store = make_store(tmp_path, hybrid=True)
+    store.upsert_document(CHUNKS_A, "a.pdf", doc_id="a")
+    store.upsert_document(CHUNKS_B, "b.pdf", doc_id="b")
+    queries = ["Mohács 1526", "Szent István", "Géza fejedelem"]
+    expected = [store.search(query, n_results=2) for query in queries]
+
+    encoded, queried = [], []
+    encode, query = store.embedding_model.encode, store.collection.query
+    store.embedding_model.encode = lambda texts, **kwargs: encoded.append(list(texts)) or encode(texts, **kwargs)
+    store.collection.query = lambda **kwargs: queried.append(kwargs) or query(**kwargs)
+    assert store.search_many(queries, n_results=2) == expected
+    assert encoded == [queries] and len(queried) == 1
+    assert store.search_many([]) == []
@@ -0,0 +1,80 @@
+import pytest
+from file.topic import Topic
+
+DOCUMENTS = [
+    "football match goal team player score",
+    "team player coach football league season",
+    "goal score striker football team win",
+    "election vote parliament government minister",
+    "government policy minister parliament law",
+    "vote election campaign party government",
+    "river mountain valley forest lake",
+    "forest lake river hiking mountain trail",
+    "valley mountain river lake forest camping",
+    "league season coach player win match",
+]
+
+@pytest.mark.parametrize("method", ["lda", "hdp"])
+def test_fit_reports_candidates(method):
+    topic = Topic(method=method, topic_range=range(2, 6), n_jobs=1)
+    results = topic.fit(DOCUMENTS)
+    assert [r["n_components"] for r in results] == list(range(2, 2 + len(results)))
+    assert all(r["fit_time"] >= 0 and "model" not in r for r in results)
+    assert topic.n_topics in [r["n_components"] for r in results]
+    assert len(topic.get_topics(n_words=3)) == topic.n_topics
+    assert len(topic.classify(["football team"])) == 1
+
+def test_search_stops_when_score_plateaus():
+    topic = Topic(method="hdp", topic_range=range(2, 11), n_jobs=2, patience=2, wave_size=1)
+    results = topic.fit(DOCUMENTS)
+    scores = [r["score"] for r in results]
+    assert 3 <= len(results) < len(range(2, 11))
+    assert all(score >= min(scores) * 0.99 for score in scores[-2:])
+    assert topic.n_topics == results[scores.index(min(scores))]["n_components"]
+
+def test_sparse_reconstruction_error_matches_dense():
+    import numpy as np
+    from scipy import sparse
+    from file.topic import _relative_reconstruction_error
+    rng = np.random.RandomState(0)
+    X = sparse.random(20, 50, density=0.1, random_state=0, format="csr")
+    W, H = rng.rand(20, 3), rng.rand(3, 50)
+    dense = X.toarray()
+    expected = np.linalg.norm(dense - W @ H) / np.linalg.norm(dense)
+    assert _relative_reconstruction_error(X, W, H) == pytest.approx(expected)
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        Topic(method="xyz").fit(DOCUMENTS)
+
+@pytest.mark.parametrize("method,vocabulary", [("lda", "frozen"), ("lda", "hashing"), ("hdp", "hashing")])
+def test_partial_fit_streams_mini_batches(method, vocabulary):
+    topic = Topic(method=method, vocabulary=vocabulary, n_features=2 ** 12)
+    topic.partial_fit(iter(DOCUMENTS[:6]), batch_size=4, n_topics=3)
+    topic.partial_fit(DOCUMENTS[6:], batch_size=4)
+    assert topic.n_topics == 3
+    topics = topic.get_topics(n_words=3)
+    assert len(topics) == 3
+    assert all(not word.startswith("#") for words in topics for word in words)
+    assert len(topic.classify(["mountain river"])) == 1
+
+def test_partial_fit_updates_fitted_lda_and_survives_save(tmp_path):
+    topic = Topic(topic_range=range(2, 4), n_jobs=1)
+    topic.fit(DOCUMENTS[:6])
+    before = topic.model.components_.copy()
+    topic.partial_fit(DOCUMENTS[6:])
+    assert topic.model.components_.shape == before.shape
+    assert (topic.model.components_ != before).any()
+
+    path = str(tmp_path / "topic.joblib")
+    topic.save(path)
+    restored = Topic.load(path)
+    assert restored.get_topics() == topic.get_topics()
+    assert restored.classify(DOCUMENTS) == topic.classify(DOCUMENTS)
+    restored.partial_fit(["football goal"])
+
+def test_partial_fit_rejects_batch_nmf():
+    topic = Topic(method="hdp", topic_range=range(2, 3), n_jobs=1)
+    topic.fit(DOCUMENTS)
+    with pytest.raises(ValueError):
+        topic.partial_fit(DOCUMENTS)